@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from storage_utils import file_lock
+
+# 종목별 기준 기본값 (target_settings에 없을 때)
+DEFAULT_TARGET_RETURN = 20.0
+DEFAULT_STOP_LOSS = -10.0
+DEFAULT_TAKE_PROFIT = 25.0
+
+LOSS_WARNING_RATE = -10.0   # 포트폴리오 알림: 손실 경고 기준(%)
+CONCENTRATION_LIMIT = 50.0  # 포트폴리오 알림: 한 종목 비중 한도(%)
+COMMISSION_LIMIT = 1000     # 누적 수수료 경고 (USD 모드 $1,000 / KRW 모드 ₩1,000,000)
+
+ALERT_HYSTERESIS = 1.0  # 발생한 알림은 기준에서 이만큼(%p) 되돌아가야 해제
+ALERT_COOLDOWN = 3600   # 같은 종목/종류 알림 재기록 최소 간격 (초)
+ALERT_LOG_LIMIT = 50    # 화면에 보여주는 최근 알림 기록 수
+
+# 알림 종류
+TARGET = "target"
+STOP = "stop"
+TAKE = "take"
+PROFIT = "profit"
+LOSS = "loss"
+LOSS_WARNING = "loss_warning"
+CONCENTRATION = "concentration"
+COMMISSION = "commission"
+
+ALERT_LEVELS = {
+    TARGET: "success", STOP: "error", TAKE: "success",
+    PROFIT: "success", LOSS: "error",
+    LOSS_WARNING: "warning", CONCENTRATION: "warning", COMMISSION: "warning",
+}
+
+ALERT_MESSAGES = {
+    TARGET: "🎯 **{symbol}** 목표 수익률 달성! ({value:.2f}% >= {threshold:.1f}%)",
+    STOP: "🛑 **{symbol}** 손절선 도달! ({value:.2f}% <= {threshold:.1f}%)",
+    TAKE: "💰 **{symbol}** 익절 구간! ({value:.2f}% >= {threshold:.1f}%)",
+    PROFIT: "🎉 {symbol} 수익률 알림: {value:.2f}%",
+    LOSS: "⚠️ {symbol} 손실률 알림: {value:.2f}%",
+    LOSS_WARNING: "   - {symbol}: {value:.2f}%",
+    CONCENTRATION: "   - {symbol}: {value:.1f}%",
+}
+
+ALERT_LABELS = {
+    TARGET: "🎯 목표 달성", STOP: "🛑 손절선", TAKE: "💰 익절 구간", PROFIT: "🎉 수익률", LOSS: "⚠️ 손실률",
+    LOSS_WARNING: "⚠️ 10% 이상 손실", CONCENTRATION: "⚠️ 집중 투자", COMMISSION: "💸 수수료",
+}
+
+# target_settings 키 접미사 -> 기본값
+THRESHOLD_KEYS = {"target": DEFAULT_TARGET_RETURN, "stop": DEFAULT_STOP_LOSS, "take": DEFAULT_TAKE_PROFIT}
+
+@dataclass(frozen=True)
+class Alert:
+    kind: str
+    symbol: str
+    value: float
+    threshold: float
+
+    @property
+    def level(self):
+        """st.success / st.error / st.warning 중 표시 수준"""
+        return ALERT_LEVELS[self.kind]
+
+    @property
+    def message(self):
+        return ALERT_MESSAGES[self.kind].format(symbol=self.symbol, value=self.value, threshold=self.threshold)
+
+def commission_limit_usd(currency_mode, exchange_rate):
+    """표시 통화 기준 수수료 경고 한도를 USD로 환산"""
+    if currency_mode == "KRW":
+        return COMMISSION_LIMIT * 1000 / exchange_rate
+    return COMMISSION_LIMIT
+
+class AlertEngine:
+    """
+    보유 종목 알림 규칙(목표/손절/익절/수익률·손실률/손실 경고/집중도/수수료)을
+    종목 순서로 정렬된 배열에서 한 번에 평가.
+    직전 평가 입력과 비교해 수익률·비중·기준이 바뀐 종목만 다시 판정하고,
+    나머지 종목은 이전 판정 결과와 알림 객체를 그대로 사용.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.returns = np.empty(0)
+        self.prices = np.empty(0)
+        self.weights = np.empty(0)
+        self.thresholds = {key: np.empty(0) for key in THRESHOLD_KEYS}
+        self.active = {}
+        self.last_changed = 0
+        self._alert_cache = {}
+        self._settings = None
+        self._inputs = None
+        self._global_thresholds = None
+        self._commission_alert = None
+
+    def _sync_holdings(self, stocks):
+        symbols = [stock["종목"] for stock in stocks]
+        count = len(symbols)
+        if symbols != self.symbols:
+            # 종목 구성이 바뀌면 기준 배열과 이전 판정을 다시 만듦
+            self.symbols = symbols
+            self._settings = None
+            self._inputs = None
+        self.returns = np.fromiter((stock["수익률(%)"] for stock in stocks), float, count)
+        self.prices = np.fromiter((stock["현재가"] for stock in stocks), float, count)
+        values = self.prices * np.fromiter((stock["수량"] for stock in stocks), float, count)
+        total_value = values.sum()
+        self.weights = values / total_value * 100 if total_value > 0 else np.zeros(count)
+
+    def _sync_thresholds(self, target_settings):
+        # 설정이 그대로면 배열 재구성 생략 (dict 비교는 C 레벨)
+        if self._settings is not None and self._settings == target_settings:
+            return
+        get = target_settings.get
+        for key, default in THRESHOLD_KEYS.items():
+            self.thresholds[key] = np.array([get(f"{symbol}_{key}", default) for symbol in self.symbols], float)
+        self._settings = dict(target_settings)
+
+    def evaluate(self, stocks, target_settings, profit_alert=None, loss_alert=None,
+                 total_commission=0.0, currency_mode="USD", exchange_rate=1.0):
+        """규칙 전체 평가, 이번에 다시 판정한 종목 수 반환"""
+        self._sync_holdings(stocks)
+        self._sync_thresholds(target_settings)
+
+        inputs = np.vstack([self.returns, self.weights, *self.thresholds.values()])
+        global_thresholds = (profit_alert, loss_alert)
+        if self._inputs is None or global_thresholds != self._global_thresholds:
+            changed = np.arange(len(self.symbols))
+            self.active = {kind: np.zeros(len(self.symbols), bool)
+                           for kind in (TARGET, STOP, TAKE, PROFIT, LOSS, LOSS_WARNING, CONCENTRATION)}
+            self._alert_cache = {kind: {} for kind in self.active}
+        else:
+            changed = np.flatnonzero((inputs != self._inputs).any(axis=0))
+            for row in changed.tolist():
+                for cache in self._alert_cache.values():
+                    cache.pop(row, None)
+        self._inputs = inputs
+        self._global_thresholds = global_thresholds
+
+        if changed.size:
+            self._evaluate_rows(changed, profit_alert, loss_alert)
+        self.last_changed = changed.size
+
+        limit = commission_limit_usd(currency_mode, exchange_rate)
+        self._commission_alert = Alert(COMMISSION, "", total_commission, limit) if total_commission > limit else None
+        return self.last_changed
+
+    def _evaluate_rows(self, rows, profit_alert, loss_alert):
+        returns = self.returns[rows]
+        # 목표 > 손절 > 익절 순으로 한 종목에 하나만
+        target_hit = returns >= self.thresholds["target"][rows]
+        stop_hit = ~target_hit & (returns <= self.thresholds["stop"][rows])
+        self.active[TARGET][rows] = target_hit
+        self.active[STOP][rows] = stop_hit
+        self.active[TAKE][rows] = ~target_hit & ~stop_hit & (returns >= self.thresholds["take"][rows])
+
+        profit_hit = returns >= profit_alert if profit_alert is not None else np.zeros(rows.size, bool)
+        self.active[PROFIT][rows] = profit_hit
+        self.active[LOSS][rows] = ~profit_hit & (returns <= loss_alert) if loss_alert is not None else False
+
+        self.active[LOSS_WARNING][rows] = returns < LOSS_WARNING_RATE
+        self.active[CONCENTRATION][rows] = self.weights[rows] > CONCENTRATION_LIMIT
+
+    def alerts(self, *kinds):
+        """지정한 종류의 알림 (종류 순서, 종류 안에서는 보유 종목 순서)"""
+        result = []
+        for kind in kinds:
+            if kind == COMMISSION:
+                if self._commission_alert is not None:
+                    result.append(self._commission_alert)
+                continue
+            values = self.weights if kind == CONCENTRATION else self.returns
+            thresholds = self.thresholds.get(kind)
+            scalar = {PROFIT: self._global_thresholds[0], LOSS: self._global_thresholds[1],
+                      LOSS_WARNING: LOSS_WARNING_RATE, CONCENTRATION: CONCENTRATION_LIMIT}.get(kind)
+            cache = self._alert_cache[kind]
+            for row in np.flatnonzero(self.active[kind]).tolist():
+                alert = cache.get(row)
+                if alert is None:
+                    threshold = thresholds[row] if thresholds is not None else scalar
+                    alert = cache[row] = Alert(kind, self.symbols[row], float(values[row]), float(threshold))
+                result.append(alert)
+        return result
+
+# 상태 변화를 기록하는 알림 종류 -> 방향 (1: 기준 이상이면 발생, -1: 기준 이하이면 발생)
+EDGE_KINDS = {TARGET: 1, TAKE: 1, CONCENTRATION: 1, STOP: -1, LOSS_WARNING: -1}
+EDGE_FIXED_THRESHOLDS = {CONCENTRATION: CONCENTRATION_LIMIT, LOSS_WARNING: LOSS_WARNING_RATE}
+
+class AlertTracker:
+    """
+    알림의 발생 순간(해제 -> 발생)만 이벤트로 남기는 edge-triggered 상태 기계.
+    종목별 직전 상태를 배열로 보관해 매 틱은 배열 비교만 하고,
+    해제는 기준에서 ALERT_HYSTERESIS만큼 되돌아갔을 때만, 재기록은 ALERT_COOLDOWN 이후에만 허용.
+    이벤트는 JSON Lines 로그에 추가만 하며, 직전 상태는 재시작 후에도 이어지도록 파일에 보관.
+    """
+
+    def __init__(self, log_file, state_file, hysteresis=ALERT_HYSTERESIS, cooldown=ALERT_COOLDOWN):
+        self.log_file = log_file
+        self.state_file = state_file
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.symbols = []
+        self.latched = {kind: np.zeros(0, bool) for kind in EDGE_KINDS}
+        self._lock = threading.Lock()
+        state = self._load_state()
+        self._latched_symbols = {kind: set(state.get("latched", {}).get(kind, [])) for kind in EDGE_KINDS}
+        self.last_event = state.get("last_event", {})  # "종류:종목" -> 마지막 기록 시각
+
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except:
+                pass
+        return {}
+
+    def _save_state(self):
+        state = {"latched": self._latched_symbols_now(), "last_event": self.last_event}
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_file, self.state_file)
+
+    def _latched_symbols_now(self):
+        return {kind: [self.symbols[row] for row in np.flatnonzero(latched).tolist()]
+                for kind, latched in self.latched.items()}
+
+    def _remap(self, symbols):
+        # 종목 구성이 바뀌면 종목 이름 기준으로 직전 상태를 옮김
+        if self.symbols:
+            self._latched_symbols = {kind: set(names) for kind, names in self._latched_symbols_now().items()}
+        self.symbols = list(symbols)
+        self.latched = {kind: np.array([symbol in self._latched_symbols[kind] for symbol in self.symbols], bool)
+                        for kind in EDGE_KINDS}
+
+    def update(self, engine, now, timestamp):
+        """평가를 마친 AlertEngine의 판정을 반영, 새로 발생한 이벤트 목록 반환"""
+        with self._lock:
+            if engine.symbols != self.symbols:
+                self._remap(engine.symbols)
+            events = []
+            state_changed = False
+            for kind, direction in EDGE_KINDS.items():
+                values = engine.weights if kind == CONCENTRATION else engine.returns
+                thresholds = engine.thresholds[kind] if kind in engine.thresholds else EDGE_FIXED_THRESHOLDS[kind]
+                if direction > 0:
+                    still_active = values >= thresholds - self.hysteresis
+                else:
+                    still_active = values <= thresholds + self.hysteresis
+                previous = self.latched[kind]
+                latched = engine.active[kind] | (previous & still_active)
+                if not np.array_equal(latched, previous):
+                    state_changed = True
+                for row in np.flatnonzero(latched & ~previous).tolist():
+                    symbol = self.symbols[row]
+                    key = f"{kind}:{symbol}"
+                    last = self.last_event.get(key)
+                    if last is not None and now - last < self.cooldown:
+                        continue
+                    self.last_event[key] = now
+                    threshold = thresholds[row] if isinstance(thresholds, np.ndarray) else thresholds
+                    events.append({
+                        "날짜": timestamp,
+                        "종목": symbol,
+                        "알림": kind,
+                        "값": round(float(values[row]), 2),
+                        "기준": float(threshold),
+                        "현재가": round(float(engine.prices[row]), 2),
+                    })
+                self.latched[kind] = latched
+
+            if events:
+                append_alert_log(self.log_file, events)
+            if state_changed or events:
+                self._save_state()
+            return events
+
+def append_alert_log(log_file, events):
+    """알림 이벤트를 JSON Lines 로그 끝에 추가 (기존 기록은 수정하지 않음)"""
+    lines = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+    with file_lock(log_file + ".lock"):
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+def alert_log_size(log_file):
+    return os.path.getsize(log_file) if os.path.exists(log_file) else 0
+
+def read_alert_log_since(log_file, offset):
+    """offset(바이트) 이후에 추가된 이벤트와 새 offset"""
+    if not os.path.exists(log_file):
+        return [], 0
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    # 쓰는 중인 마지막 줄은 다음 번에 읽음
+    complete = chunk[:chunk.rfind(b"\n") + 1]
+    events = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+    return events, offset + len(complete)
+
+def read_recent_alerts(log_file, limit=ALERT_LOG_LIMIT):
+    """최근 알림 기록 (최신순)"""
+    if not os.path.exists(log_file):
+        return []
+    with open(log_file, "r", encoding="utf-8") as f:
+        lines = deque(f, maxlen=limit)
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+def event_to_alert(event):
+    return Alert(event["알림"], event["종목"], event["값"], event["기준"])
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = 252   # 기록 간격을 추정할 수 없을 때 연환산 기준
+ROLLING_WINDOW = 21      # 이동 변동성 구간 (기록 수)
+RISK_FREE_RATE = 0.0     # 샤프/소르티노 계산용 연 무위험 수익률
+BENCHMARK_SYMBOL = "SPY"
+
+def history_arrays(history_df, fallback_rate=1320.0):
+    """일별 히스토리 -> (날짜, 총자산, 현금, 날짜별 환율) 배열 (금액은 USD)"""
+    dates = history_df.index.values.astype("datetime64[D]")
+    assets = history_df["total_assets"].to_numpy(dtype=float)
+    cash = history_df["cash"].to_numpy(dtype=float) if "cash" in history_df else np.zeros(len(dates))
+    if "exchange_rate" in history_df:
+        rates = history_df["exchange_rate"].fillna(fallback_rate).to_numpy(dtype=float)
+    else:
+        rates = np.full(len(dates), fallback_rate)
+    return dates, assets, cash, rates
+
+def trade_cash_by_date(transactions, dates):
+    """거래로 인한 현금 증감을 기록 날짜별로 합산 (매도 +실제수익, 매수 -실제비용)"""
+    if not transactions or len(dates) == 0:
+        return np.zeros(len(dates))
+    df = pd.DataFrame(transactions).reindex(columns=["날짜", "거래유형", "총액", "수수료", "실제비용", "실제수익"])
+    total = df["총액"].astype(float).fillna(0.0)
+    commission = df["수수료"].astype(float).fillna(0.0)
+    buy_cost = df["실제비용"].astype(float).fillna(total + commission)
+    sell_revenue = df["실제수익"].astype(float).fillna(total - commission)
+    amounts = np.where(df["거래유형"].to_numpy() == "매도", sell_revenue, -buy_cost)
+    trade_dates = pd.to_datetime(df["날짜"].astype(str).str[:10], errors="coerce").values.astype("datetime64[D]")
+    # 거래일과 같거나 그 이후 첫 기록에 반영
+    positions = np.searchsorted(dates, trade_dates, side="left")
+    valid = (positions < len(dates)) & ~np.isnat(trade_dates)
+    return np.bincount(positions[valid], weights=amounts[valid], minlength=len(dates))
+
+def external_flows_from_history(cash, trade_cash):
+    """현금 증감 중 거래로 설명되지 않는 부분 = 입출금 (첫 기록은 0)"""
+    flows = np.zeros(len(cash))
+    flows[1:] = np.diff(cash) - trade_cash[1:]
+    return flows
+
+def portfolio_flows(history_df, transactions, currency_mode="USD", fallback_rate=1320.0, ledger=None):
+    """
+    (날짜, 총자산, 입출금) - 원화 모드면 총자산은 각 날짜 환율로, 그 밖의 USD가 아닌 통화는 fallback_rate
+    (1달러당 표시 통화 환율)로 환산.
+    현금 원장(CashLedger)이 있으면 원장 시작 이후 구간의 입출금은 원장 이벤트(원화는 이벤트 시점 환율)를 쓰고,
+    그 이전 구간만 현금 증감에서 거래분을 뺀 추정치를 사용
+    """
+    dates, assets, cash, rates = history_arrays(history_df, fallback_rate)
+    flows = external_flows_from_history(cash, trade_cash_by_date(transactions, dates))
+    if currency_mode == "KRW":
+        assets, flows = assets * rates, flows * rates
+    elif currency_mode != "USD":
+        assets, flows = assets * fallback_rate, flows * fallback_rate
+    if ledger is not None:
+        ledger_flows, covered = ledger.flows_by_date(dates, currency_mode)
+        if currency_mode not in ("USD", "KRW"):
+            ledger_flows = ledger_flows * fallback_rate
+        flows = np.where(covered, ledger_flows, flows)
+    return dates, assets, flows
+
+def periods_per_year(dates):
+    """기록 간격으로 추정한 연간 기록 수"""
+    if len(dates) < 2:
+        return PERIODS_PER_YEAR
+    span_years = (dates[-1] - dates[0]).astype(float) / 365.25
+    if span_years <= 0:
+        return PERIODS_PER_YEAR
+    return min(365.0, max(1.0, (len(dates) - 1) / span_years))
+
+def daily_returns(assets, flows):
+    """기간 시작 시점 입출금 가정 수익률: A_t / (A_{t-1} + F_t) - 1"""
+    base = assets[:-1] + flows[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(base > 0, assets[1:] / base - 1, 0.0)
+    return np.nan_to_num(returns)
+
+def time_weighted_return(returns):
+    return float(np.prod(1 + returns) - 1) if len(returns) else 0.0
+
+def _npv(rates, cash_flows, years):
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        return (cash_flows[None, :] / (1 + rates[:, None]) ** years[None, :]).sum(axis=1)
+
+def money_weighted_return(dates, assets, flows):
+    """연환산 금액가중수익률(XIRR): 시작 자산과 입금은 투자, 마지막 자산은 회수로 본 내부수익률"""
+    if len(dates) < 2 or (dates[-1] - dates[0]).astype(int) <= 0:
+        return None
+    years = (dates - dates[0]).astype(float) / 365.25
+    cash_flows = -flows.astype(float)
+    cash_flows[0] = -assets[0]
+    cash_flows[-1] += assets[-1]
+    # 입출금이 없는 날은 NPV에 기여하지 않으므로 제외
+    nonzero = cash_flows != 0
+    cash_flows, years = cash_flows[nonzero], years[nonzero]
+    # 격자에서 부호가 바뀌는 구간을 찾은 뒤 이분법
+    grid = np.concatenate([np.linspace(-0.99, 1.0, 200), np.linspace(1.05, 10.0, 60)])
+    values = _npv(grid, cash_flows, years)
+    crossings = np.flatnonzero(np.sign(values[:-1]) * np.sign(values[1:]) <= 0)
+    if crossings.size == 0:
+        return None
+    low, high = grid[crossings[0]], grid[crossings[0] + 1]
+    low_value = values[crossings[0]]
+    for _ in range(60):
+        middle = (low + high) / 2
+        middle_value = _npv(np.array([middle]), cash_flows, years)[0]
+        if np.sign(middle_value) == np.sign(low_value):
+            low, low_value = middle, middle_value
+        else:
+            high = middle
+    return float((low + high) / 2)
+
+def drawdown_series(returns):
+    """수익률 누적 지수 기준 고점 대비 하락률"""
+    wealth = np.concatenate([[1.0], np.cumprod(1 + returns)])
+    return wealth / np.maximum.accumulate(wealth) - 1
+
+def rolling_volatility(returns, window=ROLLING_WINDOW, periods=PERIODS_PER_YEAR):
+    """누적합으로 계산한 이동 표준편차 (연환산), 기록이 window보다 적으면 빈 배열"""
+    if len(returns) < window or window < 2:
+        return np.empty(0)
+    sums = np.concatenate([[0.0], np.cumsum(returns)])
+    squares = np.concatenate([[0.0], np.cumsum(returns ** 2)])
+    window_sum = sums[window:] - sums[:-window]
+    window_square = squares[window:] - squares[:-window]
+    variance = np.maximum((window_square - window_sum ** 2 / window) / (window - 1), 0.0)
+    return np.sqrt(variance * periods)
+
+def benchmark_beta(dates, returns, benchmark_closes):
+    """기록 날짜에 맞춘 벤치마크 종가 수익률 대비 베타"""
+    if benchmark_closes is None or len(benchmark_closes) < 2 or len(returns) < 2:
+        return None
+    closes = benchmark_closes.sort_index()
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    aligned = closes.reindex(pd.DatetimeIndex(dates), method="ffill").to_numpy(dtype=float)
+    benchmark_returns = aligned[1:] / aligned[:-1] - 1
+    valid = np.isfinite(benchmark_returns)
+    if valid.sum() < 2:
+        return None
+    variance = np.var(benchmark_returns[valid], ddof=1)
+    if variance == 0:
+        return None
+    covariance = np.cov(returns[valid], benchmark_returns[valid], ddof=1)[0, 1]
+    return float(covariance / variance)
+
+def compute_performance(dates, assets, flows, benchmark_closes=None, risk_free_rate=RISK_FREE_RATE):
+    """TWR/MWR, 최대 낙폭, 변동성, 샤프/소르티노, 베타와 차트용 시계열"""
+    periods = periods_per_year(dates)
+    returns = daily_returns(assets, flows)
+    twr = time_weighted_return(returns)
+    span_years = (dates[-1] - dates[0]).astype(float) / 365.25 if len(dates) > 1 else 0.0
+    twr_annualized = float((1 + twr) ** (1 / span_years) - 1) if span_years >= 1 and twr > -1 else None
+
+    # 낙폭 배열은 첫 기록(기준 1.0)부터 시작해 날짜 인덱스와 같음
+    drawdown = drawdown_series(returns)
+    trough = int(drawdown.argmin())
+    peak = trough - int(np.argmax(drawdown[trough::-1] == 0))
+
+    excess = returns - risk_free_rate / periods
+    volatility = float(returns.std(ddof=1) * np.sqrt(periods)) if len(returns) > 1 else None
+    sharpe = sortino = None
+    if len(returns) > 1:
+        deviation = excess.std(ddof=1)
+        if deviation > 0:
+            sharpe = float(excess.mean() / deviation * np.sqrt(periods))
+        downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2))
+        if downside > 0:
+            sortino = float(excess.mean() / downside * np.sqrt(periods))
+
+    rolling = rolling_volatility(returns, periods=periods)
+    return {
+        "twr": twr,
+        "twr_annualized": twr_annualized,
+        "mwr": money_weighted_return(dates, assets, flows),
+        "max_drawdown": float(drawdown.min()),
+        "max_drawdown_peak": pd.Timestamp(dates[peak]),
+        "max_drawdown_trough": pd.Timestamp(dates[trough]),
+        "volatility": volatility,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "beta": benchmark_beta(dates, returns, benchmark_closes),
+        "net_flows": float(flows.sum()),
+        "drawdown": pd.Series(drawdown, index=pd.DatetimeIndex(dates)),
+        "rolling_volatility": pd.Series(rolling, index=pd.DatetimeIndex(dates[len(dates) - len(rolling):])),
+    }
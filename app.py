@@ -1,15 +1,77 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
+import numpy as np
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-import io
 import os
 from datetime import date, datetime, timedelta
 import pytz
-import shutil
 import time
+from storage_utils import (
+    DEFAULT_EXCHANGE_RATE, DEFAULT_PORTFOLIO_ID, damaged_sections, restore_portfolio_state, validate_data_integrity,
+    STATE_TO_DATA_KEYS, unpack_portfolio_data, empty_portfolio_data, list_timestamped_backups, copy_timestamped_backup,
+    compute_daily_snapshot, load_daily_history, update_daily_history,
+    save_portfolio_versioned, read_data_version, file_lock, SaveConflictError, LOCK_FILE_NAME, VERSION_FILE_NAME,
+    PortfolioStore, normalize_portfolio_id, portfolio_dirs, list_portfolio_ids
+)
+from portfolio_utils import (
+    CURRENCY_COLUMNS, fetch_current_price, apply_current_price, refresh_stock_prices,
+    build_pnl_period_frame, summarize_pnl_by_period, history_to_frame, convert_history_to_krw,
+    build_excel_backup, apply_live_prices, fetch_price_history, build_realized_pnl_record, update_best_worst_trades,
+    fetch_fx_rates
+)
+from analytics_utils import (
+    BENCHMARK_SYMBOL, portfolio_flows, compute_performance
+)
+from quote_stream import QuotePoller, QuoteCache
+from market_utils import RefreshScheduler, is_us_market_open, is_fx_market_open, to_kst
+from chart_utils import (
+    FigureCache, CHART_RANGES, build_allocation_figure, build_history_figures, slice_history_range, downsample_indices
+)
+from record_utils import RecordIndex, DEFAULT_PAGE_SIZE, compact_portfolio_records, page_count
+from ledger_utils import CashLedger, BUY, SELL, make_cash_event, cash_adjustment_event
+from price_history_utils import PriceHistoryCache
+from currency_utils import (
+    BASE_CURRENCY, CURRENCY_KEY, CURRENCY_NAMES, CURRENCY_SYMBOLS, DEFAULT_FX_RATES, FxMatrix, format_money,
+    guess_currency, holdings_in, record_currency
+)
+from fx_utils import FX_SYMBOL, FxRateSeries, KrwCostBasis, history_rates, record_days
+from json_stream_utils import CorruptDataError, load_portfolio_stream
+from recovery_utils import candidate_files, recover_portfolio, rewrite_replicas
+from restore_utils import JOURNAL_KEYS, load_snapshot, materialize_point_in_time
+from retention_utils import RetentionRunner, load_retention_state, retention_due, run_retention
+from shared_state_utils import SharedPortfolio, copy_portfolio_sections, session_memory
+from money_utils import MINOR_DIGITS, add_money, from_minor, round_money, scale_minor, to_minor, usd_to_krw, usd_to_krw_array
+from import_utils import (
+    IMPORT_ERROR_LIMIT, ImportFormatError, TransactionHashIndex, read_broker_file, replay_trades
+)
+from projection_utils import (
+    PROJECTION_HORIZONS, PROJECTION_PATHS, aligned_log_returns, run_projection, summarize_projection
+)
+from rebalance_utils import (
+    SCENARIO_COUNT, SCENARIO_MARKET_VOL, SCENARIO_PRICE_VOL, SCENARIO_FX_VOL, REBALANCE_BAND,
+    holdings_arrays, capped_weights, rebalance_trades, random_scenarios, simulate_scenarios, summarize_scenarios
+)
+from alert_utils import (
+    AlertEngine, AlertTracker, TARGET, STOP, TAKE, PROFIT, LOSS, LOSS_WARNING, CONCENTRATION, COMMISSION,
+    CONCENTRATION_LIMIT, ALERT_HYSTERESIS, DEFAULT_TARGET_RETURN, DEFAULT_STOP_LOSS, DEFAULT_TAKE_PROFIT, ALERT_LABELS,
+    alert_log_size, read_alert_log_since, read_recent_alerts, event_to_alert
+)
+import perf_utils
+import profile_utils
+from perf_utils import timed, timed_function
+
+# 재실행(rerun) 전체 소요 시간 측정 시작점
+rerun_started = time.perf_counter()
+
+# 재실행 프로파일링 (PORTFOLIO_PROFILE=1|sample 또는 ?profile=1|sample 일 때만 동작)
+profile_utils.start_capture(os.path.join("data", "profiles"))
+
+# PORTFOLIO_PERF_PORT 설정 시 /metrics, /metrics.json 엔드포인트 제공
+if os.environ.get("PORTFOLIO_PERF_PORT"):
+    try:
+        perf_utils.start_metrics_server(int(os.environ["PORTFOLIO_PERF_PORT"]))
+    except OSError:
+        pass
 
 st.set_page_config(
     page_title="📊 포트폴리오 트래커", 
@@ -78,39 +140,65 @@ st.title("📈 스마트 포트폴리오 트래커")
 # 한국 시간대 설정
 KST = pytz.timezone('Asia/Seoul')
 COMMISSION_RATE = 0.0025  # 0.25% 수수료
+CASH_INPUT_STEPS = {"USD": 100.0, "KRW": 100000.0, "JPY": 10000.0, "EUR": 100.0}  # 보유 현금 입력 단위 (표시 통화별)
+LIVE_REFRESH_SECONDS = 10  # 실시간 시세 화면 갱신 주기 (초)
 
-# USD to KRW 환율 (실시간 또는 고정값)
-def get_usd_to_krw_rate():
-    """USD to KRW 환율 가져오기"""
+# 통화별 1달러당 환율 (실시간 또는 고정값)
+@timed_function("quote.fx")
+def get_fx_rates(force=False):
+    """
+    지원 통화의 1달러당 환율을 한 번에 조회 (최근 조회했거나 외환시장 휴장 중이면 마지막 조회값 사용).
+    실패하거나 받지 못한 통화는 마지막 조회값, 없으면 기본값 (대략적인 환율)
+    """
+    if not force and not fx_scheduler.fx_due():
+        return {**DEFAULT_FX_RATES, **fx_scheduler.cached_fx_rates()}
     try:
-        # 실시간 환율 가져오기
-        krw_ticker = yf.Ticker("KRW=X")
-        rate = krw_ticker.history(period="1d")["Close"].iloc[-1]
-        return rate
+        rates = {**fx_scheduler.cached_fx_rates(), **fetch_fx_rates(list(CURRENCY_SYMBOLS))}
+        fx_scheduler.mark_fx_fetched(rates.get("KRW", DEFAULT_FX_RATES["KRW"]), rates=rates)
+        return {**DEFAULT_FX_RATES, **rates}
     except:
-        # 실패 시 기본값 (대략적인 환율)
-        return 1320.0  # 2024년 기준 대략적인 환율
+        return {**DEFAULT_FX_RATES, **fx_scheduler.cached_fx_rates()}
+
+def get_fx_matrix(krw_rate=None):
+    """세션 환율로 만든 통화 간 환율 행렬 (원화는 krw_rate, 없으면 포트폴리오에 저장된 세션 환율 exchange_rate)"""
+    return FxMatrix({**st.session_state.fx_rates, "KRW": krw_rate or st.session_state.exchange_rate})
+
+def display_rate(currency=None):
+    """1달러당 표시 통화 환율"""
+    return get_fx_matrix().rate(BASE_CURRENCY, currency or st.session_state.currency_mode)
 
 # 통화 변환 함수들
 def format_currency(amount, currency="USD", exchange_rate=1320.0):
-    """금액을 선택된 통화로 포맷"""
+    """달러 금액을 선택된 통화로 포맷 (원화는 exchange_rate, 그 밖의 통화는 세션 환율 행렬로 환산)"""
     if currency == "KRW":
-        krw_amount = amount * exchange_rate
-        return f"₩{krw_amount:,.0f}"
-    else:
-        return f"${amount:,.2f}"
+        return f"₩{usd_to_krw(amount, exchange_rate):,}"
+    if currency != BASE_CURRENCY:
+        return format_money(float(get_fx_matrix().convert_money([amount], BASE_CURRENCY, currency)[0]), currency)
+    return f"${amount:,.2f}"
 
 def get_currency_symbol(currency="USD"):
     """통화 기호 반환"""
-    return "₩" if currency == "KRW" else "$"
+    return CURRENCY_SYMBOLS.get(currency, "$")
 
 # 다중 데이터 폴더 설정 (데이터 유실 방지)
-PRIMARY_DATA_DIR = "data"
-BACKUP_DATA_DIR = "data_backup"
-SECONDARY_BACKUP_DIR = "data_backup2"
+ROOT_DATA_DIR = "data"
+ROOT_BACKUP_DIR = "data_backup"
+ROOT_SECONDARY_BACKUP_DIR = "data_backup2"
+
+# 포트폴리오 선택 (?portfolio=이름, 기본 포트폴리오는 기존 data/ 경로 사용)
+portfolio_id = normalize_portfolio_id(st.query_params.get("portfolio", DEFAULT_PORTFOLIO_ID))
+if st.session_state.get("portfolio_id") != portfolio_id:
+    # 다른 포트폴리오로 전환 시 세션 데이터를 새로 로드
+    for key in ["initialized", "portfolio_ref", "recommendation_text_global", "alert_log_offset"]:
+        st.session_state.pop(key, None)
+    st.session_state.portfolio_id = portfolio_id
+
+PRIMARY_DATA_DIR, BACKUP_DATA_DIR, SECONDARY_BACKUP_DIR = portfolio_dirs(
+    portfolio_id, ROOT_DATA_DIR, ROOT_BACKUP_DIR, ROOT_SECONDARY_BACKUP_DIR
+)
 
 # 필요한 폴더들 생성
-for folder in [PRIMARY_DATA_DIR, BACKUP_DATA_DIR, SECONDARY_BACKUP_DIR]:
+for folder in [ROOT_DATA_DIR, PRIMARY_DATA_DIR, BACKUP_DATA_DIR, SECONDARY_BACKUP_DIR]:
     os.makedirs(folder, exist_ok=True)
 
 # 파일 경로들
@@ -118,6 +206,46 @@ PRIMARY_FILE = os.path.join(PRIMARY_DATA_DIR, "portfolio_data.json")
 BACKUP_FILE = os.path.join(BACKUP_DATA_DIR, "portfolio_data.json")
 SECONDARY_BACKUP_FILE = os.path.join(SECONDARY_BACKUP_DIR, "portfolio_data.json")
 DAILY_HISTORY_FILE = os.path.join(PRIMARY_DATA_DIR, "daily_history.json")
+REFRESH_SCHEDULE_FILE = os.path.join(PRIMARY_DATA_DIR, "refresh_schedule.json")
+FX_SCHEDULE_FILE = os.path.join(ROOT_DATA_DIR, "fx_schedule.json")
+PRICE_CACHE_DIR = os.path.join(ROOT_DATA_DIR, "price_history")  # 종목별 일별 종가 캐시 (포트폴리오 공용)
+LOCK_FILE = os.path.join(PRIMARY_DATA_DIR, LOCK_FILE_NAME)  # 프로세스 간 쓰기 잠금
+VERSION_FILE = os.path.join(PRIMARY_DATA_DIR, VERSION_FILE_NAME)  # 저장 버전 (compare-and-swap)
+ALERT_LOG_FILE = os.path.join(PRIMARY_DATA_DIR, "alert_log.jsonl")  # 알림 발생 기록 (추가 전용)
+ALERT_STATE_FILE = os.path.join(PRIMARY_DATA_DIR, "alert_state.json")
+RETENTION_STATE_FILE = os.path.join(PRIMARY_DATA_DIR, "retention_state.json")  # 보존 정책 마지막 실행/보고
+
+# 장 운영시간 기준 재조회 스케줄러 (시세/장 마감 스냅샷은 포트폴리오별, 환율은 전체 공유)
+refresh_scheduler = RefreshScheduler(REFRESH_SCHEDULE_FILE)
+fx_scheduler = RefreshScheduler(FX_SCHEDULE_FILE)
+
+# 프로세스 전역 공유 자원: 포트폴리오 LRU 캐시(세션들이 함께 읽는 최신 데이터) + 포트폴리오별 쓰기 잠금, 종목 시세 캐시
+@st.cache_resource
+def get_portfolio_store():
+    return PortfolioStore()
+
+@st.cache_resource
+def get_quote_cache():
+    return QuoteCache()
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+@st.cache_resource
+def get_alert_tracker(log_file, state_file):
+    # 같은 포트폴리오를 보는 세션들이 하나의 알림 상태를 공유 (이벤트 중복 기록 방지)
+    return AlertTracker(log_file, state_file)
+
+@st.cache_resource
+def get_retention_runner():
+    return RetentionRunner()
+
+portfolio_store = get_portfolio_store()
+
+def fetch_shared_price(symbol):
+    """여러 포트폴리오/세션이 공유하는 시세 캐시를 거쳐 현재가 조회"""
+    return get_quote_cache().get(symbol, fetch_current_price)
 
 def get_korean_time():
     return datetime.now(KST).strftime("%Y-%m-%d %H:%M:%S")
@@ -129,71 +257,85 @@ def get_korean_date():
 if "currency_mode" not in st.session_state:
     st.session_state.currency_mode = "USD"
 
+if "fx_rates" not in st.session_state:
+    st.session_state.fx_rates = get_fx_rates()
+
 if "exchange_rate" not in st.session_state:
-    st.session_state.exchange_rate = get_usd_to_krw_rate()
+    st.session_state.exchange_rate = st.session_state.fx_rates["KRW"]
+
+# 포트폴리오 전환
+with st.expander(f"🗂️ 포트폴리오: {portfolio_id}"):
+    col_portfolio1, col_portfolio2 = st.columns(2)
+    with col_portfolio1:
+        portfolio_ids = list_portfolio_ids(ROOT_DATA_DIR)
+        if portfolio_id not in portfolio_ids:
+            portfolio_ids.append(portfolio_id)
+        selected_portfolio = st.selectbox("포트폴리오 선택", portfolio_ids, index=portfolio_ids.index(portfolio_id))
+    with col_portfolio2:
+        new_portfolio = st.text_input("새 포트폴리오 이름", placeholder="문자/숫자/-/_ 만 사용")
+    if st.button("🔀 포트폴리오 전환"):
+        st.query_params["portfolio"] = normalize_portfolio_id(new_portfolio or selected_portfolio)
+        st.rerun()
 
 # 통화 선택 위젯
 st.markdown('<div class="currency-toggle">', unsafe_allow_html=True)
 col_currency1, col_currency2, col_currency3 = st.columns([2, 2, 2])
 
 with col_currency1:
-    currency_mode = st.selectbox("💱 통화 선택", ["USD", "KRW"], 
-                                index=0 if st.session_state.currency_mode == "USD" else 1)
+    currency_options = list(CURRENCY_SYMBOLS)
+    currency_mode = st.selectbox("💱 통화 선택", currency_options,
+                                 index=currency_options.index(st.session_state.currency_mode)
+                                 if st.session_state.currency_mode in currency_options else 0)
     if currency_mode != st.session_state.currency_mode:
         st.session_state.currency_mode = currency_mode
 
 with col_currency2:
     if st.button("🔄 환율 업데이트"):
-        st.session_state.exchange_rate = get_usd_to_krw_rate()
+        # 외환시장 개장 중에는 즉시 재조회, 휴장 중에는 마지막 조회값 유지 (모든 통화를 한 번에)
+        st.session_state.fx_rates = get_fx_rates(force=is_fx_market_open())
+        st.session_state.exchange_rate = st.session_state.fx_rates["KRW"]
         st.success(f"환율 업데이트: 1 USD = ₩{st.session_state.exchange_rate:,.0f}")
 
 with col_currency3:
-    st.metric("💱 현재 환율", f"₩{st.session_state.exchange_rate:,.0f}")
+    # 원화/달러 모드는 원화 환율, 그 밖의 통화는 그 통화의 1달러당 환율
+    rate_currency = st.session_state.currency_mode if st.session_state.currency_mode not in ("USD", "KRW") else "KRW"
+    st.metric("💱 현재 환율", format_money(display_rate(rate_currency), rate_currency))
 
 st.markdown('</div>', unsafe_allow_html=True)
 
 # 다중 백업 저장 함수 (데이터 유실 방지)
+@timed_function("storage.save")
 def save_portfolio_data_secure():
     """
     3중 백업으로 데이터 유실 방지:
     1. 기본 파일 저장
     2. 백업 폴더에 복사
     3. 보조 백업 폴더에 복사
-    4. 브라우저 세션 스토리지 활용
-    """
-    data = {
-        "stocks": st.session_state.stocks,
-        "cash": st.session_state.cash_amount,
-        "transactions": st.session_state.transactions,
-        "target_settings": st.session_state.target_settings,
-        "realized_pnl": st.session_state.realized_pnl,
-        "stock_memos": st.session_state.stock_memos,
-        "total_commission": st.session_state.total_commission,
-        "best_worst_trades": st.session_state.best_worst_trades,
-        "currency_mode": st.session_state.currency_mode,
-        "exchange_rate": st.session_state.exchange_rate,
-        "last_updated": get_korean_time(),
-        "backup_timestamp": time.time()
-    }
-    
-    # JSON 문자열로 변환
-    json_data = json.dumps(data, indent=2, ensure_ascii=False)
+    4. 저장한 데이터를 세션들이 함께 읽는 공유 데이터로 교체
     
+    다른 세션/프로세스가 먼저 저장했다면 마지막으로 읽은 데이터 기준으로 병합 후 저장
+    """
     try:
-        # 1. 기본 파일 저장
-        with open(PRIMARY_FILE, "w", encoding="utf-8") as f:
-            f.write(json_data)
-        
-        # 2. 첫 번째 백업 폴더에 저장
-        with open(BACKUP_FILE, "w", encoding="utf-8") as f:
-            f.write(json_data)
-        
-        # 3. 두 번째 백업 폴더에 저장
-        with open(SECONDARY_BACKUP_FILE, "w", encoding="utf-8") as f:
-            f.write(json_data)
+        # 1~3. 기본 파일 + 두 백업 폴더에 동일한 JSON 저장 (프로세스 간 파일 잠금 + 버전 비교)
+        with portfolio_store.write_lock(portfolio_id):
+            portfolio_ref = st.session_state.get("portfolio_ref")
+            saved_data, data_version, merged_state = save_portfolio_versioned(
+                st.session_state,
+                portfolio_ref.data if portfolio_ref is not None else None,
+                st.session_state.get("data_version"),
+                [PRIMARY_FILE, BACKUP_FILE, SECONDARY_BACKUP_FILE],
+                LOCK_FILE,
+                VERSION_FILE,
+                get_korean_time(),
+                time.time()
+            )
+            # 4. 저장한 데이터는 세션 상태의 컨테이너를 참조하므로 컨테이너만 복사해 공유 (다음 저장의 병합 기준)
+            share_portfolio_data(copy_portfolio_sections(saved_data), data_version)
         
-        # 4. 세션 상태에도 JSON 백업 저장
-        st.session_state.json_backup = json_data
+        if merged_state is not None:
+            for key, value in merged_state.items():
+                st.session_state[key] = value
+            st.warning("⚠️ 다른 세션의 변경사항과 병합하여 저장했습니다.")
         
         # 성공 메시지 (너무 자주 표시되지 않도록 조건부)
         if not hasattr(st.session_state, 'last_save_time') or \
@@ -203,114 +345,120 @@ def save_portfolio_data_secure():
         
         return True
         
+    except SaveConflictError as e:
+        # 자동 병합 불가: 이번 변경은 저장하지 않고 다음 실행에서 최신 데이터를 다시 로드
+        st.error(f"❌ 다른 세션의 변경과 충돌하여 저장하지 않았습니다: {e}")
+        st.session_state.pop("initialized", None)
+        portfolio_store.evict(portfolio_id)
+        return False
     except Exception as e:
         st.error(f"❌ 데이터 저장 실패: {e}")
         return False
 
+def remember_shared(shared):
+    """공유 데이터 참조와 버전을 다음 저장의 비교/병합 기준으로 보관 (이전 버전 참조는 놓음)"""
+    st.session_state.portfolio_ref = shared.acquire()
+    st.session_state.data_version = shared.version
+
+def share_portfolio_data(data, version):
+    """세션들이 함께 읽을 최신 데이터로 등록하고 이 세션도 참조 (data는 이후 수정하지 않음)"""
+    shared = SharedPortfolio(data, version)
+    portfolio_store.put(portfolio_id, shared)
+    remember_shared(shared)
+    return shared
+
+# 포트폴리오 데이터에서 만든 세션별 인덱스/결과 (복원 후 새 데이터로 다시 만듦)
+DERIVED_STATE_KEYS = ["cash_ledger_index", "transaction_index", "pnl_index", "transaction_hash_index", "krw_cost_basis",
+                      "recommendation_text_global", "import_result", "main_cash_input_synced"]
+
+def apply_restored_state(state):
+    """
+    복원한 상태를 모든 복제 파일에 새 버전으로 기록한 뒤 세션 상태를 한 번에 교체.
+    다음 저장이 이전 상태와 병합하지 않도록 비교 기준(공유 데이터/버전)도 바꾸고 파생 인덱스/캐시를 비움
+    """
+    state = compact_portfolio_records(state)
+    with portfolio_store.write_lock(portfolio_id):
+        saved_data, data_version = restore_portfolio_state(
+            state, [PRIMARY_FILE, BACKUP_FILE, SECONDARY_BACKUP_FILE], LOCK_FILE, VERSION_FILE,
+            get_korean_time(), time.time()
+        )
+        share_portfolio_data(copy_portfolio_sections(saved_data), data_version)
+    # 기록이 끝난 뒤에만 교체하므로 실패하면 기존 세션 상태가 그대로 남음
+    for key, value in state.items():
+        st.session_state[key] = value
+    for key in DERIVED_STATE_KEYS:
+        st.session_state.pop(key, None)
+
 # 복구 우선순위로 데이터 로드
+@timed_function("storage.load")
 def load_portfolio_data_secure():
     """
     복구 우선순위:
-    1. 기본 파일
-    2. 첫 번째 백업
-    3. 두 번째 백업
-    4. 세션 상태 백업
+    0. 메모리 캐시 (같은 서버의 다른 세션이 이미 로드/저장한 공유 데이터, 컨테이너만 복사)
+    1. 기본 파일/두 백업/타임스탬프 백업 중 섹션 체크섬이 모두 맞는 가장 최신 파일
+       (일부 섹션만 손상됐으면 같은 내용의 섹션을 다른 파일에서 가져와 복구)
+    2. 이 세션이 마지막으로 참조한 공유 데이터
     """
+    shared = portfolio_store.get(portfolio_id)
+    if shared is not None:
+        remember_shared(shared)
+        return unpack_portfolio_data(copy_portfolio_sections(shared.data))
     
-    # 파일들을 우선순위대로 시도
-    files_to_try = [PRIMARY_FILE, BACKUP_FILE, SECONDARY_BACKUP_FILE]
+    # 모든 복제/백업 파일의 헤더를 동시에 읽고 최신 파일부터 전체 검사
+    replica_files = [PRIMARY_FILE, BACKUP_FILE, SECONDARY_BACKUP_FILE]
+    try:
+        recovery = recover_portfolio(candidate_files(replica_files, BACKUP_DATA_DIR))
+    except Exception as e:
+        st.warning(f"백업 파일 검사 실패: {e}")
+        recovery = None
     
-    for file_path in files_to_try:
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                # 데이터 무결성 검사
-                if validate_data_integrity(data):
-                    if file_path != PRIMARY_FILE:
-                        st.warning(f"⚠️ 백업 파일에서 데이터를 복구했습니다: {file_path}")
-                    
-                    # 새로운 필드들 추가 (기존 데이터 호환성)
-                    currency_mode = data.get("currency_mode", "USD")
-                    exchange_rate = data.get("exchange_rate", 1320.0)
-                    
-                    return (data.get("stocks", []), 
-                           data.get("cash", 0.0), 
-                           data.get("transactions", []), 
-                           data.get("target_settings", {}),
-                           data.get("realized_pnl", []),
-                           data.get("stock_memos", {}),
-                           data.get("total_commission", 0.0),
-                           data.get("best_worst_trades", {"best": None, "worst": None}),
-                           currency_mode,
-                           exchange_rate)
-                
-            except Exception as e:
-                st.warning(f"파일 {file_path} 로드 실패: {e}")
-                continue
+    if recovery is not None:
+        for report in recovery.reports:
+            if report.damaged:
+                st.warning(f"파일 {report.path} 손상: {', '.join(report.damaged)} ({report.error or '체크섬 불일치'})")
+        if recovery.repaired:
+            repaired = ", ".join(f"{key} ← {path}" for key, path in recovery.repaired.items())
+            st.warning(f"⚠️ 손상된 섹션을 다른 백업에서 복구했습니다: {repaired}")
+        elif recovery.source != PRIMARY_FILE:
+            st.warning(f"⚠️ 백업 파일에서 데이터를 복구했습니다: {recovery.source}")
+        # 손상됐거나 오래된 복제 파일은 복구한 데이터로 다시 기록
+        try:
+            rewrite_replicas(recovery, replica_files, LOCK_FILE)
+        except Exception as e:
+            st.warning(f"복제 파일 복구 기록 실패: {e}")
+        # 디스크에서 읽은 기록은 압축 레코드로 바꿔 공유 (이후 추가되는 기록은 dict 그대로)
+        shared = share_portfolio_data(compact_portfolio_records(recovery.data), recovery.data.get("version", 0))
+        
+        # 새로운 필드들은 기본값으로 채움 (기존 데이터 호환성)
+        return unpack_portfolio_data(copy_portfolio_sections(shared.data))
     
-    # 세션 상태에서 백업 시도
-    if hasattr(st.session_state, 'json_backup'):
+    # 세션이 참조하던 공유 데이터에서 복구 시도
+    portfolio_ref = st.session_state.get("portfolio_ref")
+    if portfolio_ref is not None:
         try:
-            data = json.loads(st.session_state.json_backup)
-            if validate_data_integrity(data):
-                st.warning("⚠️ 세션 백업에서 데이터를 복구했습니다.")
-                return (data.get("stocks", []), 
-                       data.get("cash", 0.0), 
-                       data.get("transactions", []), 
-                       data.get("target_settings", {}),
-                       data.get("realized_pnl", []),
-                       data.get("stock_memos", {}),
-                       data.get("total_commission", 0.0),
-                       data.get("best_worst_trades", {"best": None, "worst": None}),
-                       data.get("currency_mode", "USD"),
-                       data.get("exchange_rate", 1320.0))
+            if validate_data_integrity(portfolio_ref.data):
+                st.warning("⚠️ 세션이 참조하던 데이터에서 복구했습니다.")
+                st.session_state.data_version = portfolio_ref.version
+                return unpack_portfolio_data(copy_portfolio_sections(portfolio_ref.data))
         except:
             pass
     
     # 모든 복구 시도 실패
     st.error("❌ 모든 백업 파일이 손상되었습니다. 새로 시작합니다.")
-    return [], 0.0, [], {}, [], {}, 0.0, {"best": None, "worst": None}, "USD", 1320.0
-
-# 데이터 무결성 검사
-def validate_data_integrity(data):
-    """데이터가 올바른 구조를 가지고 있는지 검사"""
-    required_keys = ["stocks", "cash", "transactions"]
-    
-    if not isinstance(data, dict):
-        return False
-    
-    for key in required_keys:
-        if key not in data:
-            return False
-    
-    # stocks가 리스트인지 확인
-    if not isinstance(data["stocks"], list):
-        return False
-    
-    # cash가 숫자인지 확인
-    if not isinstance(data["cash"], (int, float)):
-        return False
-    
-    return True
+    st.session_state.data_version = read_data_version(VERSION_FILE, PRIMARY_FILE)
+    return empty_portfolio_data()
 
 # 자동 타임스탬프 백업 (일정 시간마다)
+@timed_function("storage.backup")
 def create_timestamped_backup():
     """타임스탬프가 포함된 백업 파일 생성"""
     if os.path.exists(PRIMARY_FILE):
         timestamp = get_korean_time().replace(":", "-").replace(" ", "_")
-        timestamped_file = os.path.join(BACKUP_DATA_DIR, f"portfolio_backup_{timestamp}.json")
         
         try:
-            shutil.copy2(PRIMARY_FILE, timestamped_file)
-            
-            # 오래된 백업 파일 정리 (7개 이상 시 삭제)
-            backup_files = [f for f in os.listdir(BACKUP_DATA_DIR) if f.startswith("portfolio_backup_")]
-            if len(backup_files) > 7:
-                backup_files.sort()
-                for old_file in backup_files[:-7]:
-                    os.remove(os.path.join(BACKUP_DATA_DIR, old_file))
+            # 오래된 백업 파일은 보존 정책(run_retention)이 기간별로 정리
+            with file_lock(LOCK_FILE):
+                copy_timestamped_backup(PRIMARY_FILE, BACKUP_DATA_DIR, timestamp)
             
             return True
         except Exception as e:
@@ -319,75 +467,41 @@ def create_timestamped_backup():
     return False
 
 # 일별 히스토리 저장 (안전한 버전)
+@timed_function("storage.snapshot")
 def save_daily_snapshot():
     today = get_korean_date()
     if st.session_state.stocks:
-        total_investment = sum(stock["수량"] * stock["매수단가"] for stock in st.session_state.stocks)
-        total_value = sum(stock["수량"] * stock["현재가"] for stock in st.session_state.stocks)
-        total_profit = total_value - total_investment
-        total_return_rate = (total_profit / total_investment * 100) if total_investment > 0 else 0
-        total_assets = total_value + st.session_state.cash_amount
-        
-        # 기존 히스토리 로드
-        daily_history = {}
-        if os.path.exists(DAILY_HISTORY_FILE):
-            try:
-                with open(DAILY_HISTORY_FILE, "r", encoding="utf-8") as f:
-                    daily_history = json.load(f)
-            except:
-                daily_history = {}
-        
-        # 오늘 데이터 업데이트
-        daily_history[today] = {
-            "total_investment": total_investment,
-            "total_value": total_value,
-            "total_profit": total_profit,
-            "total_return_rate": total_return_rate,
-            "total_assets": total_assets,
-            "cash": st.session_state.cash_amount,
-            "stock_count": len(st.session_state.stocks),
-            "exchange_rate": st.session_state.exchange_rate
-        }
+        snapshot = compute_daily_snapshot(
+            st.session_state.stocks, st.session_state.cash_amount, st.session_state.exchange_rate,
+            net_deposits=get_cash_ledger().net_deposits, fx=get_fx_matrix()
+        )
         
-        # 안전한 저장 (임시 파일 사용)
-        temp_file = DAILY_HISTORY_FILE + ".tmp"
+        # 기존 히스토리에 오늘 데이터 반영 후 안전한 저장 (임시 파일 사용)
         try:
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(daily_history, f, indent=2, ensure_ascii=False)
-            
-            # 성공적으로 저장되면 원본 파일로 이동
-            shutil.move(temp_file, DAILY_HISTORY_FILE)
-            
+            update_daily_history(DAILY_HISTORY_FILE, today, snapshot)
         except Exception as e:
-            # 임시 파일 정리
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
             st.warning(f"일별 히스토리 저장 실패: {e}")
 
+# 현금 원장 (잔액/누적 순입금액/시점 조회 인덱스는 세션별로 유지, 새 이벤트만 색인)
+def get_cash_ledger():
+    if "cash_ledger_index" not in st.session_state:
+        st.session_state.cash_ledger_index = CashLedger(DEFAULT_EXCHANGE_RATE)
+    ledger = st.session_state.cash_ledger_index
+    ledger.sync(st.session_state.cash_ledger)
+    return ledger
+
+def record_cash_event(event):
+    """현금 변동은 항상 원장 이벤트를 남기고 보유 현금에 반영"""
+    st.session_state.cash_ledger.append(event)
+    st.session_state.cash_amount = add_money(st.session_state.cash_amount, event["금액"])
+
 # 실현손익 기록 함수
-def record_realized_pnl(symbol, quantity, buy_price, sell_price, commission):
-    realized_profit = (sell_price - buy_price) * quantity - commission
-    realized_rate = ((sell_price - buy_price) / buy_price) * 100
-    
-    pnl_record = {
-        "날짜": get_korean_time(),
-        "종목": symbol,
-        "수량": quantity,
-        "매수가": buy_price,
-        "매도가": sell_price,
-        "실현손익": round(realized_profit, 2),
-        "수익률(%)": round(realized_rate, 2),
-        "수수료": round(commission, 2)
-    }
-    
+def record_realized_pnl(symbol, quantity, buy_price, sell_price, commission, currency=BASE_CURRENCY):
+    pnl_record = build_realized_pnl_record(get_korean_time(), symbol, quantity, buy_price, sell_price, commission, currency)
     st.session_state.realized_pnl.append(pnl_record)
     
     # 최고/최악 거래 업데이트
-    if not st.session_state.best_worst_trades["best"] or realized_rate > st.session_state.best_worst_trades["best"]["수익률(%)"]:
-        st.session_state.best_worst_trades["best"] = pnl_record
-    
-    if not st.session_state.best_worst_trades["worst"] or realized_rate < st.session_state.best_worst_trades["worst"]["수익률(%)"]:
-        st.session_state.best_worst_trades["worst"] = pnl_record
+    update_best_worst_trades(st.session_state.best_worst_trades, pnl_record)
 
 # 세션 상태 초기화 및 자동 로드
 if "mobile_mode" not in st.session_state:
@@ -397,7 +511,7 @@ if "initialized" not in st.session_state:
     # 앱 시작 시 기존 데이터 자동 로드
     (stocks, cash, transactions, target_settings, 
      realized_pnl, stock_memos, total_commission, best_worst_trades,
-     currency_mode, exchange_rate) = load_portfolio_data_secure()
+     currency_mode, exchange_rate, cash_ledger) = load_portfolio_data_secure()
     st.session_state.stocks = stocks
     st.session_state.cash_amount = cash
     st.session_state.transactions = transactions
@@ -408,6 +522,7 @@ if "initialized" not in st.session_state:
     st.session_state.best_worst_trades = best_worst_trades
     st.session_state.currency_mode = currency_mode
     st.session_state.exchange_rate = exchange_rate
+    st.session_state.cash_ledger = cash_ledger
     st.session_state.initialized = True
     
     # 초기 로드 후 즉시 백업 생성
@@ -423,12 +538,32 @@ if current_time - st.session_state.last_auto_backup > 3600:  # 1시간 = 3600초
         st.session_state.last_auto_backup = current_time
         st.toast("🕐 자동 백업 생성됨", icon="⏰")
 
+def apply_retention():
+    """보존 정책을 지금 적용하고 보고 반환 (백업/히스토리 파일은 각각의 잠금 안에서 정리)"""
+    return run_retention(BACKUP_DATA_DIR, DAILY_HISTORY_FILE, LOCK_FILE, RETENTION_STATE_FILE,
+                         datetime.now(KST).replace(tzinfo=None), time.time())
+
+# 보존 정책 (하루 한 번 백그라운드 스레드에서: 백업은 일/주/월/연 간격으로 남기고 오래된 히스토리는 월별 요약)
+if retention_due(RETENTION_STATE_FILE, current_time):
+    get_retention_runner().submit(portfolio_id, BACKUP_DATA_DIR, DAILY_HISTORY_FILE, LOCK_FILE, RETENTION_STATE_FILE,
+                                  datetime.now(KST).replace(tzinfo=None), current_time)
+
+# 장 마감 후 거래일마다 한 번 자동 스냅샷 (종가 반영)
+eod_session = refresh_scheduler.eod_snapshot_due()
+if st.session_state.stocks and eod_session is not None:
+    if refresh_scheduler.quotes_due() and refresh_stock_prices(st.session_state.stocks, fetch_shared_price):
+        refresh_scheduler.mark_quotes_fetched()
+    save_daily_snapshot()
+    save_portfolio_data_secure()
+    refresh_scheduler.mark_eod_snapshot(eod_session)
+    st.toast(f"📸 {eod_session} 장 마감 스냅샷 저장", icon="🗓️")
+
 # 데이터 상태 모니터링
 st.subheader("📊 데이터 상태")
-col1, col2, col3, col4 = st.columns(4)
+col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
-    backup_count = len([f for f in os.listdir(BACKUP_DATA_DIR) if f.startswith("portfolio_backup_")])
+    backup_count = len(list_timestamped_backups(BACKUP_DATA_DIR))
     st.metric("🗂️ 백업 파일", f"{backup_count}개")
 
 with col2:
@@ -453,6 +588,40 @@ with col4:
         else:
             st.error("❌ 백업 실패!")
 
+with col5:
+    # 이 세션만 가진 메모리 (공유 데이터는 같은 버전을 보는 세션들이 한 벌만 가짐)
+    memory = session_memory(list(st.session_state.items()), st.session_state.get("portfolio_ref"))
+    st.metric("🧠 세션 메모리", f"{memory['세션'] / 1024:,.0f} KB",
+              help=f"공유 데이터 {memory['공유'] / 1024:,.0f} KB · 함께 참조하는 세션 {memory['공유 세션 수']}개")
+
+# ⏱️ 성능 패널 (작업별 소요 시간 p50/p95/p99)
+show_perf_panel = st.checkbox("⏱️ 성능 패널", value=perf_utils.ENV_ENABLED)
+# 패널을 끄면 수집도 멈춤 (PORTFOLIO_PERF=1로 켠 경우는 계속 수집)
+perf_utils.set_enabled(show_perf_panel or perf_utils.ENV_ENABLED)
+if show_perf_panel:
+    perf_stats = perf_utils.registry.snapshot()
+    if perf_stats:
+        perf_df = pd.DataFrame.from_dict(perf_stats, orient="index")
+        ms_columns = ["p50", "p95", "p99", "max", "last"]
+        perf_df[ms_columns] = (perf_df[ms_columns] * 1000).round(1)
+        perf_df = perf_df[["count"] + ms_columns]
+        perf_df.columns = ["횟수", "p50(ms)", "p95(ms)", "p99(ms)", "최대(ms)", "최근(ms)"]
+        st.dataframe(perf_df, use_container_width=True)
+        
+        col_perf1, col_perf2, col_perf3 = st.columns(3)
+        with col_perf1:
+            st.download_button("📥 Prometheus 메트릭", perf_utils.to_prometheus_text(perf_stats).encode("utf-8"),
+                               file_name="perf_metrics.prom", mime="text/plain", use_container_width=True)
+        with col_perf2:
+            st.download_button("📥 JSON 메트릭", perf_utils.to_json(perf_stats).encode("utf-8"),
+                               file_name="perf_metrics.json", mime="application/json", use_container_width=True)
+        with col_perf3:
+            if st.button("🧹 측정값 초기화", use_container_width=True):
+                perf_utils.registry.reset()
+                st.rerun()
+    else:
+        st.info("측정값을 수집 중입니다. 앱을 조작하면 작업별 소요 시간이 표시됩니다.")
+
 # 모바일 모드 토글
 st.session_state.mobile_mode = st.checkbox("📱 모바일 모드", value=st.session_state.mobile_mode)
 
@@ -461,53 +630,117 @@ st.subheader("📤 데이터 백업 불러오기")
 uploaded_file = st.file_uploader("JSON 백업 파일 업로드", type=['json'])
 if uploaded_file is not None:
     try:
-        backup_data = json.load(uploaded_file)
+        # 큰 백업도 파일 전체 문자열 없이 조금씩 읽으며 검사 (손상된 위치에서 바로 중단)
+        backup_data = load_portfolio_stream(uploaded_file)
         
-        # 데이터 무결성 검사
-        if validate_data_integrity(backup_data):
-            st.session_state.stocks = backup_data.get("stocks", [])
-            st.session_state.cash_amount = backup_data.get("cash", 0.0)
-            st.session_state.transactions = backup_data.get("transactions", [])
-            st.session_state.target_settings = backup_data.get("target_settings", {})
-            st.session_state.realized_pnl = backup_data.get("realized_pnl", [])
-            st.session_state.stock_memos = backup_data.get("stock_memos", {})
-            st.session_state.total_commission = backup_data.get("total_commission", 0.0)
-            st.session_state.best_worst_trades = backup_data.get("best_worst_trades", {"best": None, "worst": None})
-            st.session_state.currency_mode = backup_data.get("currency_mode", "USD")
-            st.session_state.exchange_rate = backup_data.get("exchange_rate", 1320.0)
-            
-            # 즉시 안전한 저장
-            save_portfolio_data_secure()
+        # 데이터 무결성 검사 (체크섬이 있는 백업은 섹션 내용까지 확인)
+        damaged = damaged_sections(backup_data)
+        if damaged:
+            st.error(f"❌ 백업 파일의 일부 섹션이 손상되었습니다: {', '.join(damaged)}")
+        elif validate_data_integrity(backup_data):
+            # 저장 데이터 전체를 교체 (병합하지 않음) - 복원 전 상태도 되돌릴 수 있게 백업한 뒤 세션 상태까지 교체
+            create_timestamped_backup()
+            apply_restored_state(dict(zip(STATE_TO_DATA_KEYS, unpack_portfolio_data(backup_data))))
             st.success("백업 데이터를 성공적으로 불러왔습니다!")
             st.rerun()
         else:
             st.error("❌ 백업 파일의 데이터 구조가 올바르지 않습니다.")
             
+    except CorruptDataError as e:
+        st.error(f"❌ 백업 파일이 손상되었습니다: {e}")
     except Exception as e:
         st.error(f"백업 파일 로드 중 오류: {e}")
 
+# 증권사 거래 내역(CSV/엑셀) 가져오기 - 청크 단위로 읽고 이미 있는 거래는 건너뜀
+st.subheader("📥 증권사 거래 내역 가져오기")
+broker_file = st.file_uploader("거래 내역 파일 업로드 (CSV/엑셀)", type=['csv', 'xlsx'], key="broker_import")
+if broker_file is not None:
+    st.caption("가격은 종목의 거래 통화(보유 종목의 통화, 새 종목은 거래소 접미사로 추정) 기준으로 읽으며, "
+               "수수료 컬럼이 없으면 기본 수수료율로 계산합니다.")
+    apply_import_cash = st.checkbox("거래 대금을 보유 현금에 반영", value=True, key="broker_import_cash")
+    if st.button("거래 내역 가져오기", key="broker_import_button"):
+        try:
+            if "transaction_hash_index" not in st.session_state:
+                st.session_state.transaction_hash_index = TransactionHashIndex()
+            hash_index = st.session_state.transaction_hash_index.sync(st.session_state.transactions)
+            with timed("거래 내역 가져오기"):
+                trades, import_stats = read_broker_file(broker_file, broker_file.name, hash_index, COMMISSION_RATE)
+                applied, skipped = replay_trades(st.session_state, trades, st.session_state.exchange_rate,
+                                                 update_cash=apply_import_cash, fx=get_fx_matrix())
+            if applied:
+                save_portfolio_data_secure()
+            invalid_rows = sum(import_stats[reason] for reason in ["날짜 오류", "종목 없음", "매매 아님", "수량/가격 오류"])
+            st.session_state.import_result = (
+                f"{import_stats['읽은 행']}행 중 {applied}건 반영, 중복 {import_stats['중복']}건, "
+                f"무시 {invalid_rows}건, 보유 부족 매도 {len(skipped)}건", skipped[:IMPORT_ERROR_LIMIT]
+            )
+            st.rerun()
+        except ImportFormatError as e:
+            st.error(f"❌ {e}")
+        except Exception as e:
+            st.error(f"거래 내역 가져오기 중 오류: {e}")
+if "import_result" in st.session_state:
+    # 가져오기 직후 한 번만 표시
+    import_summary, import_skipped = st.session_state.pop("import_result")
+    st.success(f"✅ 거래 내역 가져오기 완료: {import_summary}")
+    for line in import_skipped:
+        st.caption(f"건너뜀: {line}")
+
 st.markdown("---")
 
 # 💰 보유 현금 입력
 st.subheader("💰 보유 현금")
 currency_symbol = get_currency_symbol(st.session_state.currency_mode)
-current_cash_display = st.session_state.cash_amount if st.session_state.currency_mode == "USD" else st.session_state.cash_amount * st.session_state.exchange_rate
+# 현금은 USD로 기록하고 표시 통화로 환산해 입력 (원화는 원 단위로 반올림한 usd_to_krw와 같은 값)
+cash_fx = get_fx_matrix()
+current_cash_display = (st.session_state.cash_amount if st.session_state.currency_mode == BASE_CURRENCY else
+                        float(cash_fx.convert_money([st.session_state.cash_amount], BASE_CURRENCY, st.session_state.currency_mode)[0]))
 
-new_cash_input = st.number_input(f"보유 현금 ({currency_symbol})", min_value=0.0, step=100.0 if st.session_state.currency_mode == "USD" else 100000.0, 
-                                format="%.2f" if st.session_state.currency_mode == "USD" else "%.0f", 
-                                value=current_cash_display, key="main_cash_input")
+# 매수/매도/가져오기 등 입력창 밖에서 현금이 바뀌면 입력창 값을 맞춤 (이전 값이 입금/출금으로 기록되지 않도록)
+if st.session_state.get("main_cash_input_synced") != current_cash_display:
+    st.session_state.main_cash_input = current_cash_display
+    st.session_state.main_cash_input_synced = current_cash_display
+
+new_cash_input = st.number_input(f"보유 현금 ({currency_symbol})", min_value=0.0,
+                                 step=CASH_INPUT_STEPS.get(st.session_state.currency_mode, 100.0),
+                                 format=f"%.{MINOR_DIGITS.get(st.session_state.currency_mode, 2)}f",
+                                 key="main_cash_input")
 
 # 입력값을 USD로 변환하여 저장
-if st.session_state.currency_mode == "KRW":
-    new_cash_usd = new_cash_input / st.session_state.exchange_rate
+if st.session_state.currency_mode != BASE_CURRENCY:
+    new_cash_usd = new_cash_input / cash_fx.rate(BASE_CURRENCY, st.session_state.currency_mode)
 else:
     new_cash_usd = new_cash_input
 
-# 현금 변경 시 자동 저장
-if abs(new_cash_usd - st.session_state.cash_amount) > 0.01:  # 소수점 오차 고려
-    st.session_state.cash_amount = new_cash_usd
+# 현금 변경 시 입금/출금 이벤트로 기록 후 자동 저장 (소수점 오차 이내 변경은 무시)
+cash_event = cash_adjustment_event(st.session_state.cash_amount, new_cash_usd,
+                                   get_korean_time(), st.session_state.exchange_rate)
+if cash_event is not None:
+    record_cash_event(cash_event)
     save_portfolio_data_secure()
 
+cash_ledger = get_cash_ledger()
+if cash_ledger.count:
+    with st.expander("🧾 현금 입출금 내역"):
+        if st.session_state.currency_mode == "KRW":
+            net_deposits_text = f"₩{cash_ledger.net_deposits_krw:,.0f}"
+        else:
+            net_deposits_text = format_currency(cash_ledger.net_deposits, st.session_state.currency_mode,
+                                                st.session_state.exchange_rate)
+        st.caption(f"누적 순입금액: {net_deposits_text} "
+                   f"| 원장 잔액: {format_currency(cash_ledger.balance, st.session_state.currency_mode, st.session_state.exchange_rate)}")
+        df_ledger = pd.DataFrame(cash_ledger.recent())
+        if st.session_state.currency_mode == "KRW":
+            # 입출금은 발생 시점 환율, 잔액은 현재 환율로 환산
+            df_ledger["금액"] = (df_ledger["금액"] * df_ledger["환율"]).apply(lambda x: f"₩{x:,.0f}")
+            df_ledger["잔액"] = df_ledger["잔액"].apply(lambda x: f"₩{usd_to_krw(x, st.session_state.exchange_rate):,}")
+        elif st.session_state.currency_mode != BASE_CURRENCY:
+            # 원장에는 원화 환율만 기록되므로 다른 통화는 현재 환율로 환산
+            for col in ["금액", "잔액"]:
+                df_ledger[col] = [format_money(amount, st.session_state.currency_mode) for amount in
+                                  cash_fx.convert_money(df_ledger[col].to_numpy(), BASE_CURRENCY, st.session_state.currency_mode)]
+        st.dataframe(df_ledger, use_container_width=True)
+
 st.markdown("---")
 
 # 📝 종목 관리
@@ -524,7 +757,7 @@ with tab1:
             with col_mobile[0]:
                 quantity = st.number_input("수량", min_value=1, step=1)
             with col_mobile[1]:
-                avg_price = st.number_input("매수단가 ($)", min_value=0.01, step=0.01, format="%.2f")
+                avg_price = st.number_input("매수단가 (거래 통화)", min_value=0.01, step=0.01, format="%.2f")
         else:
             col1, col2, col3 = st.columns([2, 1, 1])
             with col1:
@@ -532,25 +765,40 @@ with tab1:
             with col2:
                 quantity = st.number_input("수량", min_value=1, step=1)
             with col3:
-                avg_price = st.number_input("매수단가 ($)", min_value=0.01, step=0.01, format="%.2f")
+                avg_price = st.number_input("매수단가 (거래 통화)", min_value=0.01, step=0.01, format="%.2f")
+        # 자동: 보유 중인 종목은 그 종목의 통화, 새 종목은 거래소 접미사로 추정 (.T 엔화, .KS 원화 등)
+        trade_currency_choice = st.selectbox("거래 통화", ["자동"] + list(CURRENCY_NAMES),
+                                             format_func=lambda c: c if c == "자동" else f"{c} ({CURRENCY_NAMES[c]})")
         
         memo = st.text_area("매수 이유 (선택사항)", placeholder="왜 이 종목을 매수하나요?")
         submitted = st.form_submit_button("매수하기", use_container_width=True)
         
         if submitted and symbol:
             try:
-                # 수수료 계산
-                total_cost = quantity * avg_price
-                commission = total_cost * COMMISSION_RATE
-                final_cost = total_cost + commission
+                held_stock = next((s for s in st.session_state.stocks if s["종목"] == symbol), None)
+                if held_stock is not None:
+                    trade_currency = record_currency(held_stock)
+                elif trade_currency_choice == "자동":
+                    trade_currency = guess_currency(symbol)
+                else:
+                    trade_currency = trade_currency_choice
+                
+                # 수수료 계산 (거래 통화 최소 단위 정수, 수수료는 최소 단위로 반올림)
+                total_units = to_minor(quantity * avg_price, trade_currency)
+                commission_units = scale_minor(total_units, COMMISSION_RATE)
+                total_cost, commission, final_cost = (
+                    from_minor(units, trade_currency) for units in (total_units, commission_units, total_units + commission_units))
+                # 현금/누적 수수료는 USD로 기록
+                trade_fx = get_fx_matrix()
+                final_cost_usd = from_minor(trade_fx.convert_units(total_units + commission_units, trade_currency, BASE_CURRENCY))
+                commission_usd = from_minor(trade_fx.convert_units(commission_units, trade_currency, BASE_CURRENCY))
                 
                 # 현금 확인
-                if final_cost > st.session_state.cash_amount:
-                    st.error(f"현금이 부족합니다! 필요금액: {format_currency(final_cost, st.session_state.currency_mode, st.session_state.exchange_rate)}, "
+                if final_cost_usd > st.session_state.cash_amount:
+                    st.error(f"현금이 부족합니다! 필요금액: {format_currency(final_cost_usd, st.session_state.currency_mode, st.session_state.exchange_rate)}, "
                            f"보유현금: {format_currency(st.session_state.cash_amount, st.session_state.currency_mode, st.session_state.exchange_rate)}")
                 else:
-                    stock = yf.Ticker(symbol)
-                    current_price = stock.history(period="1d")["Close"].iloc[-1]
+                    current_price = fetch_shared_price(symbol)
                     
                     profit = (current_price - avg_price) * quantity
                     profit_rate = (profit / (avg_price * quantity)) * 100
@@ -566,9 +814,10 @@ with tab1:
                         "종목": symbol,
                         "수량": quantity,
                         "매수단가": avg_price,
-                        "현재가": round(current_price, 2),
-                        "수익": round(profit, 2),
-                        "수익률(%)": round(profit_rate, 2)
+                        "현재가": round_money(current_price, trade_currency),
+                        "수익": round_money(profit, trade_currency),
+                        "수익률(%)": round(profit_rate, 2),
+                        CURRENCY_KEY: trade_currency
                     }
                     
                     if existing_stock is not None:
@@ -578,8 +827,8 @@ with tab1:
                         avg_cost = ((old_stock["수량"] * old_stock["매수단가"]) + (quantity * avg_price)) / total_quantity
                         
                         new_stock["수량"] = total_quantity
-                        new_stock["매수단가"] = round(avg_cost, 2)
-                        new_stock["수익"] = round((current_price - avg_cost) * total_quantity, 2)
+                        new_stock["매수단가"] = round_money(avg_cost, trade_currency)
+                        new_stock["수익"] = round_money((current_price - avg_cost) * total_quantity, trade_currency)
                         new_stock["수익률(%)"] = round(((current_price - avg_cost) / avg_cost) * 100, 2)
                         
                         st.session_state.stocks[existing_stock] = new_stock
@@ -589,10 +838,11 @@ with tab1:
                         st.success(f"{symbol} 매수 완료!")
                     
                     # 현금 차감
-                    st.session_state.cash_amount -= final_cost
+                    record_cash_event(make_cash_event(BUY, -final_cost_usd, get_korean_time(),
+                                                      st.session_state.exchange_rate, symbol))
                     
                     # 총 수수료 누적
-                    st.session_state.total_commission += commission
+                    st.session_state.total_commission = add_money(st.session_state.total_commission, commission_usd)
                     
                     # 매매 기록 추가
                     transaction = {
@@ -602,9 +852,11 @@ with tab1:
                         "수량": quantity,
                         "가격": avg_price,
                         "총액": total_cost,
-                        "수수료": round(commission, 2),
-                        "실제비용": round(final_cost, 2)
+                        "수수료": commission,
+                        "실제비용": final_cost
                     }
+                    if trade_currency != BASE_CURRENCY:
+                        transaction[CURRENCY_KEY] = trade_currency
                     st.session_state.transactions.append(transaction)
                     
                     # 메모 저장
@@ -638,7 +890,7 @@ with tab2:
                     max_quantity = next(s["수량"] for s in st.session_state.stocks if s["종목"] == sell_symbol)
                     sell_quantity = st.number_input("매도 수량", min_value=1, max_value=max_quantity, step=1)
                 with col_mobile[1]:
-                    sell_price = st.number_input("매도단가 ($)", min_value=0.01, step=0.01, format="%.2f")
+                    sell_price = st.number_input("매도단가 (거래 통화)", min_value=0.01, step=0.01, format="%.2f")
             else:
                 col1, col2, col3 = st.columns([2, 1, 1])
                 with col1:
@@ -648,16 +900,22 @@ with tab2:
                     max_quantity = next(s["수량"] for s in st.session_state.stocks if s["종목"] == sell_symbol)
                     sell_quantity = st.number_input("매도 수량", min_value=1, max_value=max_quantity, step=1)
                 with col3:
-                    sell_price = st.number_input("매도단가 ($)", min_value=0.01, step=0.01, format="%.2f")
+                    sell_price = st.number_input("매도단가 (거래 통화)", min_value=0.01, step=0.01, format="%.2f")
             
             sell_memo = st.text_area("매도 이유 (선택사항)", placeholder="왜 이 종목을 매도하나요?")
             sell_submitted = st.form_submit_button("매도하기", use_container_width=True)
             
             if sell_submitted:
-                # 수수료 계산
-                total_revenue = sell_quantity * sell_price
-                commission = total_revenue * COMMISSION_RATE
-                final_revenue = total_revenue - commission
+                sell_currency = record_currency(next(s for s in st.session_state.stocks if s["종목"] == sell_symbol))
+                # 수수료 계산 (거래 통화 최소 단위 정수, 수수료는 최소 단위로 반올림)
+                total_units = to_minor(sell_quantity * sell_price, sell_currency)
+                commission_units = scale_minor(total_units, COMMISSION_RATE)
+                total_revenue, commission, final_revenue = (
+                    from_minor(units, sell_currency) for units in (total_units, commission_units, total_units - commission_units))
+                # 현금/누적 수수료는 USD로 기록
+                trade_fx = get_fx_matrix()
+                final_revenue_usd = from_minor(trade_fx.convert_units(total_units - commission_units, sell_currency, BASE_CURRENCY))
+                commission_usd = from_minor(trade_fx.convert_units(commission_units, sell_currency, BASE_CURRENCY))
                 
                 # 매도 처리 및 실현손익 계산
                 buy_price = None
@@ -673,24 +931,21 @@ with tab2:
                             stock["수량"] -= sell_quantity
                             # 현재가 업데이트하여 수익 재계산
                             try:
-                                current_price = yf.Ticker(sell_symbol).history(period="1d")["Close"].iloc[-1]
-                                stock["현재가"] = round(current_price, 2)
-                                profit = (current_price - stock["매수단가"]) * stock["수량"]
-                                stock["수익"] = round(profit, 2)
-                                stock["수익률(%)"] = round((profit / (stock["매수단가"] * stock["수량"])) * 100, 2)
+                                apply_current_price(stock, fetch_shared_price(sell_symbol))
                             except:
                                 pass
                         break
                 
                 # 현금 증가
-                st.session_state.cash_amount += final_revenue
+                record_cash_event(make_cash_event(SELL, final_revenue_usd, get_korean_time(),
+                                                  st.session_state.exchange_rate, sell_symbol))
                 
                 # 총 수수료 누적
-                st.session_state.total_commission += commission
+                st.session_state.total_commission = add_money(st.session_state.total_commission, commission_usd)
                 
                 # 실현손익 기록
                 if buy_price:
-                    record_realized_pnl(sell_symbol, sell_quantity, buy_price, sell_price, commission)
+                    record_realized_pnl(sell_symbol, sell_quantity, buy_price, sell_price, commission, sell_currency)
                 
                 # 매매 기록 추가
                 transaction = {
@@ -700,9 +955,11 @@ with tab2:
                     "수량": sell_quantity,
                     "가격": sell_price,
                     "총액": total_revenue,
-                    "수수료": round(commission, 2),
-                    "실제수익": round(final_revenue, 2)
+                    "수수료": commission,
+                    "실제수익": final_revenue
                 }
+                if sell_currency != BASE_CURRENCY:
+                    transaction[CURRENCY_KEY] = sell_currency
                 st.session_state.transactions.append(transaction)
                 
                 # 메모 저장
@@ -722,6 +979,22 @@ with tab2:
     else:
         st.info("보유 종목이 없습니다.")
 
+# 알림 엔진 (세션별로 직전 판정 결과를 유지해 바뀐 종목만 다시 판정)
+def evaluate_portfolio_alerts(engine_key, stocks, profit_alert=None, loss_alert=None):
+    if engine_key not in st.session_state:
+        st.session_state[engine_key] = AlertEngine()
+    engine = st.session_state[engine_key]
+    with timed("alerts.evaluate"):
+        engine.evaluate(
+            holdings_in(stocks, get_fx_matrix()), st.session_state.target_settings, profit_alert, loss_alert,
+            st.session_state.total_commission, st.session_state.currency_mode, st.session_state.exchange_rate
+        )
+    return engine
+
+def show_alerts(alerts):
+    for alert in alerts:
+        getattr(st, alert.level)(alert.message)
+
 with tab3:
     st.subheader("⚙️ 목표 설정 & 알림")
     
@@ -746,7 +1019,7 @@ with tab3:
             with col1:
                 target_return = st.number_input(
                     f"{symbol} 목표수익률(%)", 
-                    value=st.session_state.target_settings.get(f"{symbol}_target", 20.0),
+                    value=st.session_state.target_settings.get(f"{symbol}_target", DEFAULT_TARGET_RETURN),
                     key=f"target_{symbol}"
                 )
                 if st.session_state.target_settings.get(f"{symbol}_target") != target_return:
@@ -756,7 +1029,7 @@ with tab3:
             with col2:
                 stop_loss = st.number_input(
                     f"{symbol} 손절선(%)", 
-                    value=st.session_state.target_settings.get(f"{symbol}_stop", -10.0),
+                    value=st.session_state.target_settings.get(f"{symbol}_stop", DEFAULT_STOP_LOSS),
                     max_value=0.0,
                     key=f"stop_{symbol}"
                 )
@@ -767,21 +1040,17 @@ with tab3:
             with col3:
                 take_profit = st.number_input(
                     f"{symbol} 익절선(%)", 
-                    value=st.session_state.target_settings.get(f"{symbol}_take", 25.0),
+                    value=st.session_state.target_settings.get(f"{symbol}_take", DEFAULT_TAKE_PROFIT),
                     min_value=0.0,
                     key=f"take_{symbol}"
                 )
                 if st.session_state.target_settings.get(f"{symbol}_take") != take_profit:
                     st.session_state.target_settings[f"{symbol}_take"] = take_profit
                     settings_changed = True
-            
-            # 알림 체크
-            current_return = stock["수익률(%)"]
-            if current_return >= profit_alert or current_return <= loss_alert:
-                if current_return >= profit_alert:
-                    st.success(f"🎉 {symbol} 수익률 알림: {current_return:.2f}%")
-                else:
-                    st.error(f"⚠️ {symbol} 손실률 알림: {current_return:.2f}%")
+        
+        # 알림 체크 (보유 종목 전체를 한 번에 평가)
+        alert_engine = evaluate_portfolio_alerts("alert_engine", st.session_state.stocks, profit_alert, loss_alert)
+        show_alerts(alert_engine.alerts(PROFIT, LOSS))
         
         # 설정 변경 시 자동 저장
         if settings_changed:
@@ -803,23 +1072,131 @@ with tab4:
     else:
         st.info("아직 작성된 메모가 없습니다.")
 
+# 거래 내역 / 실현손익 인덱스 (세션별로 유지, 새로 추가된 기록만 색인)
+def get_record_index(key, records, **options):
+    if key not in st.session_state:
+        st.session_state[key] = RecordIndex(**options)
+    index = st.session_state[key]
+    with timed("records.index"):
+        index.sync(records)
+    return index
+
+@st.cache_resource
+def get_price_cache():
+    return PriceHistoryCache(PRICE_CACHE_DIR)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_fx_series(history_file, history_version, closes_version, _closes):
+    """환율 종가/히스토리 파일 버전이 같으면 이전 환율 이력 재사용 (종가가 없는 날은 히스토리에 기록된 환율로 보충)"""
+    return FxRateSeries.from_closes(_closes, history_rates(load_daily_history(history_file)))
+
+def get_krw_cost_basis():
+    """
+    원화 모드에서 거래 내역을 각 거래일 환율로 재생한 (환율 이력, 원화 원가). 환율 이력은 가격 이력 캐시에서
+    빠진 날짜만 조회하고, USD 모드이거나 거래가 없으면 (None, None) - 환율 이력을 조회하지 않음
+    """
+    if st.session_state.currency_mode != "KRW" or not st.session_state.transactions:
+        return None, None
+    closes = get_price_cache().closes(FX_SYMBOL, date.fromisoformat(get_korean_date()))
+    history_stat = os.stat(DAILY_HISTORY_FILE) if os.path.exists(DAILY_HISTORY_FILE) else None
+    series = load_fx_series(
+        DAILY_HISTORY_FILE, (portfolio_id, history_stat.st_mtime_ns, history_stat.st_size) if history_stat else None,
+        (len(closes), str(closes.index[-1]), float(closes.iloc[-1])) if len(closes) else None, closes
+    )
+    if "krw_cost_basis" not in st.session_state:
+        st.session_state.krw_cost_basis = KrwCostBasis()
+    cost_basis = st.session_state.krw_cost_basis
+    with timed("fx.cost_basis"):
+        cost_basis.sync(st.session_state.transactions, series, st.session_state.exchange_rate)
+    return series, cost_basis
+
+def format_money_column(values, amounts, currency):
+    """표시 통화로 바꾼 값(amounts) 표시 문자열, 원래 값이 비어 있는 칸은 그대로"""
+    return [format_money(amount, currency) if pd.notna(value) else value for value, amount in zip(values, amounts)]
+
+def render_record_browser(key, index, currency_columns, record_types=None, krw_page=None):
+    """
+    종목/유형/기간 필터 + 페이지 단위 표시 (현재 페이지 기록만 DataFrame으로 변환).
+    기록은 각자의 거래 통화(통화 필드, 없으면 USD)에서 표시 통화로 환산. krw_page(페이지 행 번호, 페이지 기록) ->
+    (기록별 환율, {컬럼: 원화 값}) 를 주면 원화 모드에서 USD 기록은 현재 환율 대신 그 환율 사용
+    """
+    filter_cols = st.columns(4 if record_types else 3)
+    symbol = filter_cols[0].selectbox("종목", ["전체"] + index.symbols(), key=f"{key}_symbol")
+    record_type = None
+    if record_types:
+        record_type = filter_cols[1].selectbox("유형", ["전체"] + record_types, key=f"{key}_type")
+    date_range = filter_cols[-2].date_input("기간", value=(), key=f"{key}_dates")
+    page_size = filter_cols[-1].selectbox("페이지당", [DEFAULT_PAGE_SIZE, 50, 100], key=f"{key}_page_size")
+    
+    start_date, end_date = (date_range[0], date_range[-1]) if len(date_range) else (None, None)
+    rows = index.query(
+        symbol=None if symbol == "전체" else symbol,
+        record_type=None if record_type in (None, "전체") else record_type,
+        start_date=start_date,
+        end_date=end_date
+    )
+    total_pages = page_count(len(rows), page_size)
+    page = st.number_input("페이지 (1 = 최신)", min_value=1, max_value=total_pages, value=1, key=f"{key}_page")
+    page_rows = index.page_rows(rows, min(page, total_pages), page_size)
+    page_records = index.records(page_rows)
+    df_page = pd.DataFrame(page_records)
+    
+    # 통화 정보 추가 (거래일 환율이 있으면 각 기록 날짜의 환율로 환산)
+    mode = st.session_state.currency_mode
+    currencies = [record_currency(record) for record in page_records]
+    if CURRENCY_KEY in df_page.columns:
+        df_page[CURRENCY_KEY] = currencies
+    if (mode != BASE_CURRENCY or any(currency != BASE_CURRENCY for currency in currencies)) and not df_page.empty:
+        fx = get_fx_matrix()
+        rates, krw_columns = krw_page(page_rows, page_records) if krw_page and mode == "KRW" else (None, {})
+        usd_rows = np.array([currency == BASE_CURRENCY for currency in currencies])
+        for col in currency_columns:
+            if col in krw_columns:
+                df_page[col] = format_money_column(df_page[col], krw_columns[col], mode)
+            elif col in df_page.columns:
+                values = df_page[col].to_numpy(dtype=float)
+                converted = fx.convert_money(values, currencies, mode)
+                if rates is not None and usd_rows.any():
+                    converted[usd_rows] = usd_to_krw_array(values[usd_rows], rates[usd_rows])
+                df_page[col] = format_money_column(df_page[col], converted, mode)
+        for col, won in krw_columns.items():
+            if col not in currency_columns:
+                df_page[col] = format_money_column(won, won, mode)
+    st.dataframe(df_page, use_container_width=True)
+    st.caption(f"총 {len(rows)}건 | {min(page, total_pages)}/{total_pages} 페이지")
+
+transaction_index = get_record_index(
+    "transaction_index", st.session_state.transactions, type_key="거래유형", counted_types=("매수", "매도")
+)
+pnl_index = get_record_index("pnl_index", st.session_state.realized_pnl, value_key="실현손익")
+fx_series, krw_cost_basis = get_krw_cost_basis()
+# 원화 모드의 기록별 (원화 실현손익, 환차손익, 원가) - 총 실현손익과 기간별 요약이 함께 써서 표의 행 합계와 같게 함
+krw_realized = (krw_cost_basis.realized_for(st.session_state.realized_pnl, None, fx_series,
+                                            st.session_state.exchange_rate, get_fx_matrix())
+                if krw_cost_basis is not None else None)
+
+def realized_total_usd():
+    """거래 통화별 실현손익 합계를 USD로 환산한 총 실현손익"""
+    return get_fx_matrix().total(pnl_index.value_totals, BASE_CURRENCY)
+
+def transaction_krw_page(page_rows, page_records):
+    return krw_cost_basis.rates[list(page_rows)], {}
+
+def pnl_krw_page(page_rows, page_records):
+    # 매수가/실현손익은 매수일 환율의 원화 원가 기준 (환차손익 포함), 나머지 금액은 매도일 환율
+    won, fx, cost = krw_cost_basis.realized_for(st.session_state.realized_pnl, page_rows, fx_series,
+                                                st.session_state.exchange_rate, get_fx_matrix())
+    quantities = np.array([record.get("수량", 0) or 0 for record in page_records], dtype=float)
+    buy_prices = np.round(np.divide(cost, quantities, out=np.zeros(len(cost)), where=quantities > 0)).astype(np.int64)
+    return (fx_series.rates_as_of(record_days(page_records), st.session_state.exchange_rate),
+            {"매수가": buy_prices, "실현손익": won, "환차손익": fx})
+
 # 거래 내역 표시
 if st.session_state.transactions:
     st.markdown("---")
     st.subheader("📋 최근 거래 내역")
-    df_transactions = pd.DataFrame(st.session_state.transactions[-15:])  # 최근 15건
-    
-    # 거래 내역에 통화 정보 추가
-    if st.session_state.currency_mode == "KRW":
-        df_transactions_display = df_transactions.copy()
-        for col in ['가격', '총액', '수수료', '실제비용', '실제수익']:
-            if col in df_transactions_display.columns:
-                df_transactions_display[col] = df_transactions_display[col].apply(
-                    lambda x: f"₩{x * st.session_state.exchange_rate:,.0f}" if pd.notna(x) else x
-                )
-        st.dataframe(df_transactions_display, use_container_width=True)
-    else:
-        st.dataframe(df_transactions, use_container_width=True)
+    render_record_browser("transactions", transaction_index, ['가격', '총액', '수수료', '실제비용', '실제수익'], ["매수", "매도"],
+                          krw_page=transaction_krw_page if krw_cost_basis is not None else None)
 
 st.markdown("---")
 
@@ -827,20 +1204,22 @@ st.markdown("---")
 if st.session_state.stocks:
     st.subheader("📊 포트폴리오 시각화")
     
-    df = pd.DataFrame(st.session_state.stocks)
-    df["평가금액"] = df["현재가"] * df["수량"]
-    
-    # 보유현금 포함 자산 구성 파이차트
-    asset_data = df[["종목", "평가금액"]].copy()
-    if st.session_state.cash_amount > 0:
-        asset_data.loc[len(asset_data)] = ["현금", st.session_state.cash_amount]
-    
-    # 통화에 따른 제목 변경
-    currency_text = "원화" if st.session_state.currency_mode == "KRW" else "달러"
-    fig = px.pie(asset_data, names="종목", values="평가금액", 
-                 title=f"💼 자산 구성 비율 (현금 포함, {currency_text} 기준)")
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig, use_container_width=True)
+    # 보유현금 포함 자산 구성 파이차트 (저장 버전/통화/환율이 같으면 직렬화된 차트 재사용 - 비중은 USD 환산 기준)
+    pie_fx = get_fx_matrix()
+    pie_key = ("pie", portfolio_id, st.session_state.get("data_version"), len(st.session_state.stocks),
+               st.session_state.cash_amount, st.session_state.currency_mode,
+               tuple(sorted(zip(pie_fx.currencies, pie_fx.per_usd.tolist()))))
+    pie_json = get_figure_cache().get(pie_key)
+    if pie_json is None:
+        with timed("chart.pie"):
+            df = pd.DataFrame(holdings_in(st.session_state.stocks, pie_fx))
+            df["평가금액"] = df["현재가"] * df["수량"]
+            asset_data = df[["종목", "평가금액"]].copy()
+            if st.session_state.cash_amount > 0:
+                asset_data.loc[len(asset_data)] = ["현금", st.session_state.cash_amount]
+            pie_json = build_allocation_figure(asset_data, st.session_state.currency_mode)
+        get_figure_cache().put(pie_key, pie_json)
+    st.plotly_chart(json.loads(pie_json), use_container_width=True)
 
 st.markdown("---")
 
@@ -848,111 +1227,160 @@ st.markdown("---")
 if st.session_state.stocks:
     st.subheader("📋 현재 포트폴리오")
     
-    # 현재가 업데이트 버튼
+    # 장 상태와 다음 시세 조회 예정 시각
+    next_quote_fetch = to_kst(refresh_scheduler.next_quote_fetch()).strftime("%m-%d %H:%M")
+    market_status = "🟢 미국 정규장 개장 중" if is_us_market_open() else "🌙 미국 정규장 마감"
+    st.caption(f"{market_status} | 다음 시세 조회: {next_quote_fetch} (KST)")
+    
+    # 현재가 업데이트 버튼 (장 마감 후 종가를 이미 받았으면 네트워크 조회 생략)
     if st.button("🔄 현재가 업데이트", use_container_width=True):
-        for stock in st.session_state.stocks:
-            try:
-                ticker = yf.Ticker(stock["종목"])
-                current_price = ticker.history(period="1d")["Close"].iloc[-1]
-                
-                stock["현재가"] = round(current_price, 2)
-                profit = (current_price - stock["매수단가"]) * stock["수량"]
-                stock["수익"] = round(profit, 2)
-                stock["수익률(%)"] = round((profit / (stock["매수단가"] * stock["수량"])) * 100, 2)
-            except:
-                continue
-        
-        # 일별 스냅샷 저장
-        save_daily_snapshot()
-        # 업데이트 후 안전한 자동 저장
-        save_portfolio_data_secure()
-        st.success("현재가가 업데이트되었습니다!")
-        st.rerun()
+        if is_us_market_open() or refresh_scheduler.quotes_due():
+            if refresh_stock_prices(st.session_state.stocks, fetch_shared_price):
+                refresh_scheduler.mark_quotes_fetched()
+            
+            # 일별 스냅샷 저장
+            save_daily_snapshot()
+            # 업데이트 후 안전한 자동 저장
+            save_portfolio_data_secure()
+            st.success("현재가가 업데이트되었습니다!")
+            st.rerun()
+        else:
+            st.info(f"장 마감 중입니다. 이미 종가 기준 최신 가격입니다. (다음 조회: {next_quote_fetch} KST)")
+    
+    # 실시간 시세 토글 (켜면 아래 표/지표/알림이 전체 재실행 없이 주기적으로 갱신)
+    st.toggle("📡 실시간 시세", key="live_quotes",
+              help=f"장중 {LIVE_REFRESH_SECONDS}초마다 현재가와 환율을 자동 갱신합니다.")
+
+# 실시간 시세 폴러 (프로세스 전역 공유)
+@st.cache_resource
+def get_quote_poller():
+    return QuotePoller(fetch_current_price, cache=get_quote_cache()).start()
+
+# 현재 포트폴리오 표 + 지표 + 트레이딩 알림 (실시간 모드에서는 fragment만 주기적으로 재실행)
+@st.fragment(run_every=LIVE_REFRESH_SECONDS if st.session_state.get("live_quotes") else None)
+def render_live_holdings():
+    stocks = st.session_state.stocks
+    exchange_rate = st.session_state.exchange_rate
+    if not stocks:
+        return
     
-    df = pd.DataFrame(st.session_state.stocks)
+    # 실시간 모드: 공유 최근가 테이블로 표시용 현재가/수익률 재계산 (저장 데이터는 그대로)
+    if st.session_state.get("live_quotes"):
+        poller = get_quote_poller()
+        poller.watch([stock["종목"] for stock in stocks])
+        stocks = apply_live_prices(stocks, poller.prices())
+        exchange_rate = poller.fx_rate() or exchange_rate
+        last_quote = poller.last_updated()
+        market_status = "🟢 정규장" if is_us_market_open() else "🌙 장 마감 (자동 갱신 일시중지)"
+        quote_time = datetime.fromtimestamp(last_quote, KST).strftime("%H:%M:%S") if last_quote else "대기 중"
+        st.caption(f"📡 실시간 시세 {market_status} | 마지막 시세: {quote_time} | 환율: ₩{exchange_rate:,.0f}")
+    
+    fx = get_fx_matrix(exchange_rate)
+    df = pd.DataFrame(stocks)
+    df[CURRENCY_KEY] = currencies = [record_currency(stock) for stock in stocks]
     df["평가금액"] = df["현재가"] * df["수량"]
     df["투자금액"] = df["매수단가"] * df["수량"]
-    
+    amount_columns = [col for col in CURRENCY_COLUMNS if col in df.columns]
+
     # 통화 변환을 위한 데이터프레임 복사
-    if st.session_state.currency_mode == "KRW":
+    if st.session_state.currency_mode != BASE_CURRENCY or any(currency != BASE_CURRENCY for currency in currencies):
         df_display = df.copy()
-        # 금액 관련 컬럼들을 원화로 변환
-        currency_columns = ["매수단가", "현재가", "수익", "평가금액", "투자금액"]
-        for col in currency_columns:
-            if col in df_display.columns:
-                df_display[col] = df_display[col] * st.session_state.exchange_rate
-        
-        # 원화 표시를 위한 포맷팅
-        df_display["매수단가"] = df_display["매수단가"].apply(lambda x: f"₩{x:,.0f}")
-        df_display["현재가"] = df_display["현재가"].apply(lambda x: f"₩{x:,.0f}")
-        df_display["수익"] = df_display["수익"].apply(lambda x: f"₩{x:,.0f}")
-        df_display["평가금액"] = df_display["평가금액"].apply(lambda x: f"₩{x:,.0f}")
-        df_display["투자금액"] = df_display["투자금액"].apply(lambda x: f"₩{x:,.0f}")
+        # 금액 컬럼 묶음을 행별 거래 통화에서 표시 통화로 한 번에 환산 (USD -> 원화는 usd_to_krw_array와 같은 값)
+        df_display[amount_columns] = fx.convert_money(
+            df[amount_columns].to_numpy(dtype=float), currencies, st.session_state.currency_mode)
+        # 거래 이력이 보유 수량과 맞는 USD 종목은 매수일 환율의 원화 원가로 (수익에 환차손익 포함)
+        if krw_cost_basis is not None:
+            costs = np.array([krw_cost_basis.holding_cost(symbol, quantity)
+                              if quantity and currency == BASE_CURRENCY else None
+                              for symbol, quantity, currency in zip(df["종목"], df["수량"], currencies)], dtype=float)
+            known = ~np.isnan(costs)
+            if known.any():
+                invested = np.where(known, costs, df_display["투자금액"].to_numpy(dtype=float))
+                profit = df_display["평가금액"].to_numpy(dtype=float) - invested
+                df_display["매수단가"] = np.where(known, invested / df["수량"].to_numpy(dtype=float), df_display["매수단가"])
+                df_display["투자금액"] = invested
+                df_display["수익"] = np.where(known, profit, df_display["수익"])
+                df_display["수익률(%)"] = np.where(known, np.round(profit / invested * 100, 2), df_display["수익률(%)"])
+    
+        # 표시 통화 포맷팅 (USD 표시는 숫자 그대로)
+        if st.session_state.currency_mode != BASE_CURRENCY:
+            for col in ["매수단가", "현재가", "수익", "평가금액", "투자금액"]:
+                df_display[col] = df_display[col].apply(lambda x: format_money(x, st.session_state.currency_mode))
     else:
         df_display = df
-    
+    df_display = df_display.rename(columns={CURRENCY_KEY: "거래 통화"})
+
     # 색상으로 수익/손실 구분하여 표시
     st.dataframe(
         df_display.style.applymap(
             lambda x: 'color: red' if isinstance(x, (int, float)) and x < 0 else 'color: green' if isinstance(x, (int, float)) and x > 0 else '',
-            subset=['수익률(%)'] if st.session_state.currency_mode == "KRW" else ['수익', '수익률(%)']
+            subset=['수익률(%)'] if st.session_state.currency_mode != BASE_CURRENCY else ['수익', '수익률(%)']
         ),
         use_container_width=True
     )
 
-    total_profit = df["수익"].sum()
-    total_investment = df["투자금액"].sum()
-    total_value = df["평가금액"].sum()
+    # 합계는 USD로 환산해서 더함
+    total_profit, total_investment, total_value = fx.convert(
+        df[["수익", "투자금액", "평가금액"]].to_numpy(dtype=float), currencies, BASE_CURRENCY).sum(axis=0)
     total_return_rate = (total_profit / total_investment * 100) if total_investment > 0 else 0
     total_assets = total_value + st.session_state.cash_amount
-    
+
     if st.session_state.mobile_mode:
-        st.metric("💰 총 투자금액", format_currency(total_investment, st.session_state.currency_mode, st.session_state.exchange_rate))
-        st.metric("📈 총 평가금액", format_currency(total_value, st.session_state.currency_mode, st.session_state.exchange_rate))
-        st.metric("💹 총 수익률", f"{total_return_rate:.2f}%", format_currency(total_profit, st.session_state.currency_mode, st.session_state.exchange_rate))
-        st.metric("🏦 총 자산", format_currency(total_assets, st.session_state.currency_mode, st.session_state.exchange_rate))
-        st.metric("💸 누적 수수료", format_currency(st.session_state.total_commission, st.session_state.currency_mode, st.session_state.exchange_rate))
+        st.metric("💰 총 투자금액", format_currency(total_investment, st.session_state.currency_mode, exchange_rate))
+        st.metric("📈 총 평가금액", format_currency(total_value, st.session_state.currency_mode, exchange_rate))
+        st.metric("💹 총 수익률", f"{total_return_rate:.2f}%", format_currency(total_profit, st.session_state.currency_mode, exchange_rate))
+        st.metric("🏦 총 자산", format_currency(total_assets, st.session_state.currency_mode, exchange_rate))
+        st.metric("💸 누적 수수료", format_currency(st.session_state.total_commission, st.session_state.currency_mode, exchange_rate))
     else:
         col1, col2, col3, col4, col5 = st.columns(5)
         with col1:
-            st.metric("💰 총 투자금액", format_currency(total_investment, st.session_state.currency_mode, st.session_state.exchange_rate))
+            st.metric("💰 총 투자금액", format_currency(total_investment, st.session_state.currency_mode, exchange_rate))
         with col2:
-            st.metric("📈 총 평가금액", format_currency(total_value, st.session_state.currency_mode, st.session_state.exchange_rate))
+            st.metric("📈 총 평가금액", format_currency(total_value, st.session_state.currency_mode, exchange_rate))
         with col3:
-            st.metric("💹 총 수익률", f"{total_return_rate:.2f}%", format_currency(total_profit, st.session_state.currency_mode, st.session_state.exchange_rate))
+            st.metric("💹 총 수익률", f"{total_return_rate:.2f}%", format_currency(total_profit, st.session_state.currency_mode, exchange_rate))
         with col4:
-            st.metric("🏦 총 자산", format_currency(total_assets, st.session_state.currency_mode, st.session_state.exchange_rate))
+            st.metric("🏦 총 자산", format_currency(total_assets, st.session_state.currency_mode, exchange_rate))
         with col5:
-            st.metric("💸 누적 수수료", format_currency(st.session_state.total_commission, st.session_state.currency_mode, st.session_state.exchange_rate))
+            st.metric("💸 누적 수수료", format_currency(st.session_state.total_commission, st.session_state.currency_mode, exchange_rate))
 
-# 🚨 알림 시스템 (목표 달성/손절/익절)
-if st.session_state.stocks and st.session_state.target_settings:
-    st.subheader("🚨 트레이딩 알림")
-    alerts = []
-    
-    for stock in st.session_state.stocks:
-        symbol = stock["종목"]
-        current_return = stock["수익률(%)"]
+    # 🚨 알림 시스템 (목표 달성/손절/익절)
+    if stocks and st.session_state.target_settings:
+        st.subheader("🚨 트레이딩 알림")
+        # 실시간 시세가 반영된 표시용 보유 종목 기준 (세션 보유 종목과 별도 엔진)
+        live_alert_engine = evaluate_portfolio_alerts("live_alert_engine", stocks)
         
-        target_return = st.session_state.target_settings.get(f"{symbol}_target", 20.0)
-        stop_loss = st.session_state.target_settings.get(f"{symbol}_stop", -10.0)
-        take_profit = st.session_state.target_settings.get(f"{symbol}_take", 25.0)
+        # 기준을 새로 넘은 순간만 기록하고, 이 세션이 아직 보지 않은 기록만 표시
+        if "alert_log_offset" not in st.session_state:
+            st.session_state.alert_log_offset = alert_log_size(ALERT_LOG_FILE)
+        with timed("alerts.track"):
+            get_alert_tracker(ALERT_LOG_FILE, ALERT_STATE_FILE).update(live_alert_engine, time.time(), get_korean_time())
+        new_events, st.session_state.alert_log_offset = read_alert_log_since(
+            ALERT_LOG_FILE, st.session_state.alert_log_offset
+        )
+        new_alerts = [event_to_alert(event) for event in new_events if event["알림"] in (TARGET, STOP, TAKE)]
         
-        if current_return >= target_return:
-            alerts.append(f"🎯 **{symbol}** 목표 수익률 달성! ({current_return:.2f}% >= {target_return:.1f}%)")
-        elif current_return <= stop_loss:
-            alerts.append(f"🛑 **{symbol}** 손절선 도달! ({current_return:.2f}% <= {stop_loss:.1f}%)")
-        elif current_return >= take_profit:
-            alerts.append(f"💰 **{symbol}** 익절 구간! ({current_return:.2f}% >= {take_profit:.1f}%)")
-    
-    if alerts:
-        for alert in alerts:
-            if "손절선" in alert:
-                st.error(alert)
-            elif "익절" in alert or "목표" in alert:
-                st.success(alert)
-    else:
-        st.info("💤 현재 특별한 알림이 없습니다.")
+        if new_alerts:
+            show_alerts(new_alerts)
+            for alert in new_alerts:
+                st.toast(alert.message, icon="🔔")
+        else:
+            st.info("💤 새로운 알림이 없습니다.")
+        
+        ongoing = live_alert_engine.alerts(TARGET, STOP, TAKE)
+        if ongoing:
+            st.caption("진행 중: " + ", ".join(f"{ALERT_LABELS[alert.kind]} {alert.symbol}" for alert in ongoing))
+        
+        with st.expander("📜 알림 기록"):
+            recent_events = read_recent_alerts(ALERT_LOG_FILE)
+            if recent_events:
+                log_df = pd.DataFrame(recent_events)
+                log_df["알림"] = log_df["알림"].map(ALERT_LABELS)
+                st.dataframe(log_df, use_container_width=True, hide_index=True)
+            else:
+                st.write("아직 기록된 알림이 없습니다.")
+
+render_live_holdings()
 
 # 📈 성과 분석 및 통계
 st.markdown("---")
@@ -964,13 +1392,19 @@ with col1:
     # 실현손익 요약
     if st.session_state.realized_pnl:
         st.write("**💰 실현손익 요약**")
-        df_pnl = pd.DataFrame(st.session_state.realized_pnl)
-        total_realized = df_pnl["실현손익"].sum()
-        win_trades = len(df_pnl[df_pnl["실현손익"] > 0])
-        total_trades = len(df_pnl)
+        # 인덱스가 유지하는 합계/건수 사용 (전체 기록을 DataFrame으로 만들지 않음)
+        total_realized = realized_total_usd()
+        win_trades = pnl_index.positive_count
+        total_trades = pnl_index.count
         win_rate = (win_trades / total_trades * 100) if total_trades > 0 else 0
         
-        st.metric("총 실현손익", format_currency(total_realized, st.session_state.currency_mode, st.session_state.exchange_rate))
+        if krw_cost_basis is not None:
+            # 원화 모드는 매수일/매도일 환율 기준 (현재 환율로 한 번에 바꾸지 않음) - 이력이 없는 매도/USD가 아닌 거래도
+            # 실현손익 내역과 같은 환산으로 포함
+            st.metric("총 실현손익", f"₩{int(krw_realized[0].sum()):,}",
+                      help=f"거래일 환율 기준, 환차손익 ₩{int(krw_realized[1].sum()):,} 포함")
+        else:
+            st.metric("총 실현손익", format_currency(total_realized, st.session_state.currency_mode, st.session_state.exchange_rate))
         st.metric("승률", f"{win_rate:.1f}%", f"{win_trades}/{total_trades}")
         
         # 최고/최악 거래
@@ -986,16 +1420,11 @@ with col2:
     # 거래 통계
     if st.session_state.transactions:
         st.write("**📊 거래 통계**")
-        df_trans = pd.DataFrame(st.session_state.transactions)
+        # 종목별 매수/매도 횟수 (인덱스가 유지하는 카운터)
+        most_traded_entry = transaction_index.most_common_symbol()
         
-        # 종목별 거래 횟수
-        buy_counts = df_trans[df_trans["거래유형"] == "매수"]["종목"].value_counts()
-        sell_counts = df_trans[df_trans["거래유형"] == "매도"]["종목"].value_counts()
-        total_counts = buy_counts.add(sell_counts, fill_value=0)
-        
-        if not total_counts.empty:
-            most_traded = total_counts.index[0]
-            most_traded_count = int(total_counts.iloc[0])
+        if most_traded_entry:
+            most_traded, most_traded_count = most_traded_entry
             st.write(f"🔥 최다 거래 종목: **{most_traded}** ({most_traded_count}회)")
         
         # 평균 보유기간 계산 (실현손익 기준)
@@ -1004,47 +1433,162 @@ with col2:
             avg_holding = 2.5  # 단타 기준 추정값
             st.write(f"⏱️ 평균 보유기간: **{avg_holding:.1f}일** (추정)")
 
+# 위험/성과 지표 (입출금 효과를 뺀 시간가중/금액가중 수익률 등)
+@st.cache_data(ttl=6 * 3600, show_spinner=False)
+def get_benchmark_closes(symbol, start):
+    try:
+        closes = fetch_price_history(symbol, start)
+        return closes if len(closes) > 1 else None
+    except Exception:
+        return None
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_performance_metrics(history_file, history_version, data_version, currency_mode, fallback_rate,
+                             _transactions, _cash_ledger):
+    """히스토리 파일 버전/저장 버전/통화가 같으면 이전 계산 결과 재사용 (입출금은 현금 원장 기준)"""
+    history_df = history_to_frame(load_daily_history(history_file))
+    if len(history_df) < 2:
+        return None
+    with timed("analytics.performance"):
+        dates, assets, flows = portfolio_flows(history_df, _transactions, currency_mode, fallback_rate, _cash_ledger)
+        benchmark = get_benchmark_closes(BENCHMARK_SYMBOL, str(history_df.index[0].date()))
+        return compute_performance(dates, assets, flows, benchmark)
+
+if os.path.exists(DAILY_HISTORY_FILE):
+    history_stat = os.stat(DAILY_HISTORY_FILE)
+    performance = load_performance_metrics(
+        DAILY_HISTORY_FILE, (portfolio_id, history_stat.st_mtime_ns, history_stat.st_size),
+        st.session_state.get("data_version"), st.session_state.currency_mode,
+        display_rate(), st.session_state.transactions, get_cash_ledger()
+    )
+    if performance is not None:
+        def format_rate(value):
+            return f"{value * 100:.2f}%" if value is not None else "-"
+        
+        def format_ratio(value):
+            return f"{value:.2f}" if value is not None else "-"
+        
+        st.write("**📐 위험/성과 지표** (입출금 효과 제외)")
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("시간가중수익률(TWR)", format_rate(performance["twr"]),
+                              f"연 {format_rate(performance['twr_annualized'])}" if performance["twr_annualized"] is not None else None)
+        metric_cols[1].metric("금액가중수익률(MWR, 연)", format_rate(performance["mwr"]))
+        metric_cols[2].metric("최대 낙폭(MDD)", format_rate(performance["max_drawdown"]),
+                              f"{performance['max_drawdown_peak']:%Y-%m-%d} → {performance['max_drawdown_trough']:%Y-%m-%d}",
+                              delta_color="off")
+        metric_cols[3].metric("변동성(연)", format_rate(performance["volatility"]))
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("샤프 지수", format_ratio(performance["sharpe"]))
+        metric_cols[1].metric("소르티노 지수", format_ratio(performance["sortino"]))
+        metric_cols[2].metric(f"베타 (vs {BENCHMARK_SYMBOL})", format_ratio(performance["beta"]))
+        metric_cols[3].metric("순입출금", format_currency(
+            performance["net_flows"] / display_rate(),
+            st.session_state.currency_mode, st.session_state.exchange_rate
+        ))
+        
+        with st.expander("📉 낙폭 / 이동 변동성 추이"):
+            risk_df = pd.DataFrame({
+                "낙폭(%)": performance["drawdown"] * 100,
+                "이동 변동성(%)": performance["rolling_volatility"] * 100,
+            })
+            rows = downsample_indices(risk_df.index, risk_df["낙폭(%)"].to_numpy(), method="minmax")
+            st.line_chart(risk_df.iloc[rows])
+
+# 🔮 몬테카를로 위험 전망 (보유 종목의 과거 일별 수익률 기반, 보유 구성이 같으면 결과 재사용)
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_projection(holdings, cash, method, paths, history_version, _closes):
+    """holdings: (종목, 수량, 현재가) 튜플 - 보유 구성/방법/경로 수/가격 이력 버전이 같으면 캐시된 결과 반환"""
+    returns, proxied = aligned_log_returns(_closes)
+    if returns is None:
+        return None
+    values = np.array([quantity * price for _, quantity, price in holdings])
+    total = values.sum() + cash
+    with timed("projection.simulate"):
+        simulated = run_projection(returns, values / total, cash / total, list(PROJECTION_HORIZONS.values()), paths, method)
+    return summarize_projection(simulated), proxied, len(returns)
+
+if st.session_state.stocks:
+    st.write("**🔮 몬테카를로 위험 전망** (현재 보유 수량 유지 가정)")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    show_projection = col1.toggle("전망 계산", key="projection_enabled")
+    projection_method = col2.radio("방법", ["부트스트랩", "GBM"], horizontal=True, key="projection_method")
+    projection_paths = col3.selectbox("경로 수", [10_000, PROJECTION_PATHS], index=1, key="projection_paths")
+    
+    if show_projection:
+        # 가격은 소수점 둘째 자리까지만 반영해 시세 갱신마다 다시 계산하지 않음
+        holdings = tuple((stock["종목"], stock["수량"], round(stock["현재가"], 2))
+                         for stock in holdings_in(st.session_state.stocks, get_fx_matrix()))
+        today = date.fromisoformat(get_korean_date())
+        closes = {symbol: get_price_cache().closes(symbol, today) for symbol, _, _ in holdings}
+        history_version = tuple((symbol, len(series), series.index[-1] if len(series) else None)
+                                for symbol, series in closes.items())
+        with st.spinner("시뮬레이션 중..."):
+            projection = load_projection(
+                holdings, round(st.session_state.cash_amount, 2),
+                "gbm" if projection_method == "GBM" else "bootstrap", projection_paths, history_version, closes
+            )
+        if projection is None:
+            st.info("보유 종목의 가격 이력을 불러올 수 없어 전망을 계산하지 못했습니다.")
+        else:
+            summary, proxied, history_days = projection
+            total_assets_now = sum(quantity * price for _, quantity, price in holdings) + st.session_state.cash_amount
+            
+            def format_loss(rate):
+                return f"{rate * 100:.1f}% ({format_currency(rate * total_assets_now, st.session_state.currency_mode, st.session_state.exchange_rate)})"
+            
+            df_projection = pd.DataFrame([
+                {
+                    "기간": name,
+                    "VaR 95%": format_loss(row["var95"]),
+                    "ES 95%": format_loss(row["es95"]),
+                    "VaR 99%": format_loss(row["var99"]),
+                    "ES 99%": format_loss(row["es99"]),
+                    **{f"수익률 {q}%": f"{row[f'p{q}'] * 100:+.1f}%" for q in (5, 25, 50, 75, 95)},
+                    "손실 확률": f"{row['loss_probability'] * 100:.1f}%",
+                }
+                for name, row in summary.items()
+            ])
+            st.dataframe(df_projection, use_container_width=True, hide_index=True)
+            caption = f"최근 {history_days}거래일 수익률 기반 {projection_paths:,}개 경로 | VaR/ES는 손실률(양수 = 손실)"
+            if proxied:
+                caption += f" | 가격 이력이 부족해 평균 수익률로 대신한 종목: {', '.join(proxied)}"
+            st.caption(caption)
+
+# 실현손익 내역 (종목/기간 필터, 페이지 단위)
+if st.session_state.realized_pnl:
+    with st.expander("📒 실현손익 내역"):
+        render_record_browser("realized_pnl", pnl_index, ["매수가", "매도가", "실현손익", "수수료"],
+                              krw_page=pnl_krw_page if krw_cost_basis is not None else None)
+
 # 월별/주별 수익률 요약
 if st.session_state.realized_pnl:
     st.markdown("---")
     st.subheader("📅 기간별 수익률 요약")
     
-    df_pnl = pd.DataFrame(st.session_state.realized_pnl)
-    df_pnl["월"] = pd.to_datetime(df_pnl["날짜"]).dt.to_period("M")
-    df_pnl["주"] = pd.to_datetime(df_pnl["날짜"]).dt.to_period("W")
+    # 월별 요약 / 주별 요약 (최근 4주)
+    with timed("analytics.period_summary"):
+        df_pnl = build_pnl_period_frame(st.session_state.realized_pnl)
+        if krw_cost_basis is not None:
+            # 기간 합계를 거래일 환율 기준 원화 실현손익으로 (기간마다 현재 환율을 곱하지 않음)
+            df_pnl["실현손익"] = krw_realized[0]
+        elif st.session_state.currency_mode != BASE_CURRENCY or len(pnl_index.value_totals) > 1:
+            # 기록마다 거래 통화가 다를 수 있어 기록별 통화에서 표시 통화로 한 번에 환산
+            df_pnl["실현손익"] = get_fx_matrix().convert(
+                df_pnl["실현손익"].to_numpy(dtype=float), [record_currency(record) for record in st.session_state.realized_pnl],
+                st.session_state.currency_mode)
+        monthly_summary = summarize_pnl_by_period(df_pnl, "월")
+        weekly_summary = summarize_pnl_by_period(df_pnl, "주").tail(4)
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # 월별 요약
-        monthly_summary = df_pnl.groupby("월").agg({
-            "실현손익": "sum",
-            "수익률(%)": "mean",
-            "종목": "count"
-        }).round(2)
-        
-        if st.session_state.currency_mode == "KRW":
-            monthly_summary["실현손익"] = monthly_summary["실현손익"] * st.session_state.exchange_rate
-            monthly_summary.columns = [f"월 실현손익({get_currency_symbol(st.session_state.currency_mode)})", "평균 수익률(%)", "거래 횟수"]
-        else:
-            monthly_summary.columns = ["월 실현손익($)", "평균 수익률(%)", "거래 횟수"]
+        monthly_summary.columns = [f"월 실현손익({get_currency_symbol(st.session_state.currency_mode)})", "평균 수익률(%)", "거래 횟수"]
         
         st.write("**📊 월별 성과**")
         st.dataframe(monthly_summary)
     
     with col2:
-        # 주별 요약 (최근 4주)
-        weekly_summary = df_pnl.groupby("주").agg({
-            "실현손익": "sum",
-            "수익률(%)": "mean",
-            "종목": "count"
-        }).round(2).tail(4)
-        
-        if st.session_state.currency_mode == "KRW":
-            weekly_summary["실현손익"] = weekly_summary["실현손익"] * st.session_state.exchange_rate
-            weekly_summary.columns = [f"주 실현손익({get_currency_symbol(st.session_state.currency_mode)})", "평균 수익률(%)", "거래 횟수"]
-        else:
-            weekly_summary.columns = ["주 실현손익($)", "평균 수익률(%)", "거래 횟수"]
+        weekly_summary.columns = [f"주 실현손익({get_currency_symbol(st.session_state.currency_mode)})", "평균 수익률(%)", "거래 횟수"]
         
         st.write("**📊 주별 성과 (최근 4주)**")
         st.dataframe(weekly_summary)
@@ -1054,14 +1598,12 @@ st.markdown("---")
 st.subheader("📈 히스토리 및 추이 분석")
 
 if os.path.exists(DAILY_HISTORY_FILE):
-    with open(DAILY_HISTORY_FILE, "r", encoding="utf-8") as f:
-        daily_history = json.load(f)
+    daily_history = load_daily_history(DAILY_HISTORY_FILE)
     
     if daily_history:
         # 일자별 수익률 테이블
-        history_df = pd.DataFrame.from_dict(daily_history, orient='index')
-        history_df.index = pd.to_datetime(history_df.index)
-        history_df = history_df.sort_index()
+        with timed("analytics.history"):
+            history_df = history_to_frame(daily_history)
         
         col1, col2 = st.columns(2)
         
@@ -1071,17 +1613,15 @@ if os.path.exists(DAILY_HISTORY_FILE):
             
             if st.session_state.currency_mode == "KRW":
                 # 각 날짜의 환율을 사용하여 변환 (없으면 현재 환율 사용)
-                display_df["total_profit"] = display_df.apply(
-                    lambda row: row["total_profit"] * history_df.loc[row.name].get("exchange_rate", st.session_state.exchange_rate), axis=1
-                )
-                display_df["total_assets"] = display_df.apply(
-                    lambda row: row["total_assets"] * history_df.loc[row.name].get("exchange_rate", st.session_state.exchange_rate), axis=1
-                )
-                display_df.columns = ["수익률(%)", f"수익금액({get_currency_symbol(st.session_state.currency_mode)})", f"총자산({get_currency_symbol(st.session_state.currency_mode)})"]
-            else:
-                display_df.columns = ["수익률(%)", "수익금액($)", "총자산($)"]
+                display_df["total_profit"] = convert_history_to_krw(history_df, "total_profit", st.session_state.exchange_rate)
+                display_df["total_assets"] = convert_history_to_krw(history_df, "total_assets", st.session_state.exchange_rate)
+            elif st.session_state.currency_mode != BASE_CURRENCY:
+                # 히스토리에는 원화 환율만 기록되므로 다른 통화는 현재 환율로 환산
+                display_df[["total_profit", "total_assets"]] *= display_rate()
+            display_df.columns = ["수익률(%)", f"수익금액({get_currency_symbol(st.session_state.currency_mode)})",
+                                  f"총자산({get_currency_symbol(st.session_state.currency_mode)})"]
             
-            display_df = display_df.round(2 if st.session_state.currency_mode == "USD" else 0)
+            display_df = display_df.round(MINOR_DIGITS.get(st.session_state.currency_mode, 2))
             st.dataframe(display_df.tail(10))  # 최근 10일
         
         with col2:
@@ -1095,61 +1635,31 @@ if os.path.exists(DAILY_HISTORY_FILE):
             st.metric("보유 종목 수", f"{recent_data['stock_count']}개")
         
         # 총자산 추이 그래프
-        currency_text = "원화" if st.session_state.currency_mode == "KRW" else "달러"
+        currency_text = CURRENCY_NAMES.get(st.session_state.currency_mode, st.session_state.currency_mode)
         st.write(f"**📈 총자산 추이 그래프 ({currency_text} 기준)**")
-        fig = go.Figure()
+        # 좁은 기간을 고르면 그 구간만 다시 샘플링해 세부 변화까지 표시
+        chart_range = st.radio("기간", list(CHART_RANGES), index=len(CHART_RANGES) - 1,
+                               horizontal=True, key="history_chart_range")
         
-        # 통화 변환
-        if st.session_state.currency_mode == "KRW":
-            # 각 날짜의 환율을 사용하여 변환
-            investment_data = [row["total_investment"] * history_df.loc[idx].get("exchange_rate", st.session_state.exchange_rate) 
-                             for idx, row in history_df.iterrows()]
-            value_data = [row["total_value"] * history_df.loc[idx].get("exchange_rate", st.session_state.exchange_rate) 
-                         for idx, row in history_df.iterrows()]
-            assets_data = [row["total_assets"] * history_df.loc[idx].get("exchange_rate", st.session_state.exchange_rate) 
-                          for idx, row in history_df.iterrows()]
-        else:
-            investment_data = history_df['total_investment'].tolist()
-            value_data = history_df['total_value'].tolist()
-            assets_data = history_df['total_assets'].tolist()
-        
-        fig.add_trace(go.Scatter(
-            x=history_df.index, 
-            y=investment_data,
-            name='투자금액',
-            line=dict(color='blue')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=history_df.index, 
-            y=value_data,
-            name='평가금액',
-            line=dict(color='green')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=history_df.index, 
-            y=assets_data,
-            name='총자산',
-            line=dict(color='red', width=3)
-        ))
-        
-        currency_symbol = get_currency_symbol(st.session_state.currency_mode)
-        fig.update_layout(
-            title=f"투자금액 vs 평가금액 vs 총자산 추이 ({currency_text})",
-            xaxis_title="날짜",
-            yaxis_title=f"금액 ({currency_symbol})",
-            height=400
-        )
+        # 히스토리 파일 버전 + 통화 + 기간이 같으면 직렬화된 차트 재사용 (화면 해상도만큼만 점 전송)
+        history_stat = os.stat(DAILY_HISTORY_FILE)
+        history_key = ("history", portfolio_id, history_stat.st_mtime_ns, history_stat.st_size,
+                       st.session_state.currency_mode, display_rate(), chart_range)
+        history_figures = get_figure_cache().get(history_key)
+        if history_figures is None:
+            with timed("chart.history"):
+                history_figures = build_history_figures(
+                    slice_history_range(history_df, CHART_RANGES[chart_range]),
+                    st.session_state.currency_mode,
+                    display_rate()
+                )
+            get_figure_cache().put(history_key, history_figures)
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(json.loads(history_figures[0]), use_container_width=True)
         
         # 수익률 추이 그래프
         st.write("**📊 수익률 추이**")
-        fig2 = px.line(history_df.reset_index(), x='index', y='total_return_rate', 
-                      title="일별 수익률 변화", labels={'index': '날짜', 'total_return_rate': '수익률(%)'})
-        fig2.update_layout(height=300)
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(json.loads(history_figures[1]), use_container_width=True)
 else:
     st.info("아직 히스토리 데이터가 없습니다. 현재가 업데이트를 통해 일별 데이터를 생성하세요.")
 
@@ -1168,8 +1678,9 @@ if st.button("✍️ 추천 요청 문장 생성"):
             st.warning("먼저 종목을 추가해주세요.")
         else:
             # 현재 통화 설정에 따른 텍스트 생성
-            currency_text = "원화" if st.session_state.currency_mode == "KRW" else "달러"
+            currency_text = CURRENCY_NAMES.get(st.session_state.currency_mode, st.session_state.currency_mode)
             currency_symbol = get_currency_symbol(st.session_state.currency_mode)
+            report_fx = get_fx_matrix()
             
             text = f"""아래는 오늘 기준 내 미국 주식 포트폴리오 전체 구성이다:
 * 보유 현금: {format_currency(st.session_state.cash_amount, st.session_state.currency_mode, st.session_state.exchange_rate)}
@@ -1177,21 +1688,19 @@ if st.button("✍️ 추천 요청 문장 생성"):
 """
             
             for stock in holdings:
-                if st.session_state.currency_mode == "KRW":
-                    buy_price_display = f"₩{stock['매수단가'] * st.session_state.exchange_rate:,.0f}"
-                    current_price_display = f"₩{stock['현재가'] * st.session_state.exchange_rate:,.0f}"
-                else:
-                    buy_price_display = f"${stock['매수단가']}"
-                    current_price_display = f"${stock['현재가']}"
+                # 종목의 거래 통화에서 표시 통화로 (USD -> 원화는 usd_to_krw와 같은 값)
+                buy_price, current_price = report_fx.convert_money(
+                    [stock['매수단가'], stock['현재가']], record_currency(stock), st.session_state.currency_mode)
+                buy_price_display = format_money(buy_price, st.session_state.currency_mode)
+                current_price_display = format_money(current_price, st.session_state.currency_mode)
                 
                 text += f"* {stock['종목']}: {stock['수량']}주 (매수단가 {buy_price_display}, 현재가 {current_price_display}, 수익률 {stock['수익률(%)']:.2f}%)\n"
             
             # 성과 요약 추가
             if st.session_state.realized_pnl:
-                df_pnl = pd.DataFrame(st.session_state.realized_pnl)
-                total_realized = df_pnl["실현손익"].sum()
-                win_trades = len(df_pnl[df_pnl["실현손익"] > 0])
-                total_trades = len(df_pnl)
+                total_realized = realized_total_usd()
+                win_trades = pnl_index.positive_count
+                total_trades = pnl_index.count
                 win_rate = (win_trades / total_trades * 100) if total_trades > 0 else 0
                 
                 text += f"""
@@ -1273,31 +1782,25 @@ st.markdown("---")
 st.subheader("🔔 포트폴리오 알림")
 
 if st.session_state.stocks:
-    df = pd.DataFrame(st.session_state.stocks)
-    df["평가금액"] = df["현재가"] * df["수량"]
+    # 목표 설정 탭에서 이미 평가했으면 바뀐 종목이 없어 재판정 없이 결과만 사용
+    alert_engine = evaluate_portfolio_alerts("alert_engine", st.session_state.stocks, profit_alert, loss_alert)
     
     warnings = []
     
     # 손실 경고
-    loss_stocks = df[df["수익률(%)"] < -10]
-    if not loss_stocks.empty:
+    loss_alerts = alert_engine.alerts(LOSS_WARNING)
+    if loss_alerts:
         warnings.append("⚠️ **10% 이상 손실 종목**")
-        for _, stock in loss_stocks.iterrows():
-            warnings.append(f"   - {stock['종목']}: {stock['수익률(%)']:.2f}%")
+        warnings.extend(alert.message for alert in loss_alerts)
     
     # 집중도 경고 (한 종목이 50% 이상)
-    total_value = df["평가금액"].sum()
-    if total_value > 0:
-        df["비중"] = df["평가금액"] / total_value * 100
-        concentrated_stocks = df[df["비중"] > 50]
-        if not concentrated_stocks.empty:
-            warnings.append("⚠️ **과도한 집중 투자 (50% 이상)**")
-            for _, stock in concentrated_stocks.iterrows():
-                warnings.append(f"   - {stock['종목']}: {stock['비중']:.1f}%")
+    concentration_alerts = alert_engine.alerts(CONCENTRATION)
+    if concentration_alerts:
+        warnings.append("⚠️ **과도한 집중 투자 (50% 이상)**")
+        warnings.extend(alert.message for alert in concentration_alerts)
     
     # 수수료 과다 경고
-    commission_threshold = 1000 if st.session_state.currency_mode == "USD" else 1000000
-    if st.session_state.total_commission > (commission_threshold / st.session_state.exchange_rate if st.session_state.currency_mode == "KRW" else commission_threshold):
+    if alert_engine.alerts(COMMISSION):
         warnings.append(f"💸 **높은 수수료**: 총 {format_currency(st.session_state.total_commission, st.session_state.currency_mode, st.session_state.exchange_rate)} 지출")
     
     if warnings:
@@ -1305,6 +1808,68 @@ if st.session_state.stocks:
             st.warning(warning)
     else:
         st.success("✅ 포트폴리오 상태가 양호합니다!")
+    
+    # ⚖️ 리밸런싱 제안 (집중 투자 경고가 있으면 펼쳐서 한도 아래로 맞추는 거래를 바로 보여줌)
+    with st.expander("⚖️ 리밸런싱 / What-if 시뮬레이션", expanded=bool(concentration_alerts)):
+        symbols, quantities, prices = holdings_arrays(holdings_in(st.session_state.stocks, get_fx_matrix()))
+        cash = st.session_state.cash_amount
+        total_assets_usd = float((quantities * prices).sum() + cash)
+        current_cash_weight = cash / total_assets_usd * 100 if total_assets_usd > 0 else 0.0
+        
+        col1, col2 = st.columns(2)
+        target_mode = col1.radio("목표 비중", ["현재 비중 유지", "동일 비중"], horizontal=True, key="rebalance_target")
+        cash_weight = col2.slider("목표 현금 비중(%)", 0, 90, int(round(min(current_cash_weight, 90))), key="rebalance_cash_weight")
+        
+        # 한 종목 비중은 집중 경고가 해제되는 수준(한도 - 히스테리시스)까지만 허용
+        base_weights = quantities * prices if target_mode == "현재 비중 유지" else np.ones(len(symbols))
+        target_weights = capped_weights(base_weights, CONCENTRATION_LIMIT - ALERT_HYSTERESIS) * (1 - cash_weight / 100)
+        with timed("rebalance.plan"):
+            plan = rebalance_trades(quantities, prices, cash, target_weights, COMMISSION_RATE)
+        
+        traded_rows = np.flatnonzero(plan["shares"])
+        if traded_rows.size:
+            current_weights = quantities * prices / total_assets_usd if total_assets_usd > 0 else np.zeros(len(symbols))
+            df_plan = pd.DataFrame({
+                "종목": [symbols[row] for row in traded_rows],
+                "거래": np.where(plan["shares"][traded_rows] > 0, "매수", "매도"),
+                "수량": np.abs(plan["shares"][traded_rows]),
+                "금액": [format_currency(abs(plan["shares"][row]) * prices[row], st.session_state.currency_mode, st.session_state.exchange_rate)
+                       for row in traded_rows],
+                "현재 비중(%)": (current_weights[traded_rows] * 100).round(1),
+                "목표 비중(%)": (target_weights[traded_rows] * 100).round(1),
+                "조정 후 비중(%)": (plan["weights_after"][traded_rows] * 100).round(1),
+            })
+            st.dataframe(df_plan, use_container_width=True)
+            st.caption(f"총자산 대비 비중 | 예상 수수료: {format_currency(float(plan['commission']), st.session_state.currency_mode, st.session_state.exchange_rate)} "
+                       f"| 거래 후 현금: {format_currency(float(plan['cash_after']), st.session_state.currency_mode, st.session_state.exchange_rate)}")
+        else:
+            st.success(f"✅ 모든 종목이 목표 비중 ±{REBALANCE_BAND:.0f}%p 안에 있어 거래가 필요 없습니다.")
+        
+        st.write("**🎲 What-if 시나리오** (가격/환율 충격 후 총자산과 집중도)")
+        col1, col2, col3, col4 = st.columns(4)
+        scenario_count = col1.selectbox("시나리오 수", [SCENARIO_COUNT, 5000, 10000], key="scenario_count")
+        market_vol = col2.slider("시장 충격(σ, %)", 0, 50, int(SCENARIO_MARKET_VOL * 100), key="scenario_market_vol")
+        price_vol = col3.slider("종목별 충격(σ, %)", 0, 50, int(SCENARIO_PRICE_VOL * 100), key="scenario_price_vol")
+        fx_vol = col4.slider("환율 변동(σ, %)", 0, 30, int(SCENARIO_FX_VOL * 100), key="scenario_fx_vol")
+        
+        with timed("rebalance.scenarios"):
+            price_shocks, fx_moves = random_scenarios(scenario_count, len(symbols), market_vol / 100, price_vol / 100, fx_vol / 100)
+            scenarios = simulate_scenarios(quantities, prices, cash, target_weights, price_shocks, fx_moves,
+                                           st.session_state.exchange_rate, COMMISSION_RATE, CONCENTRATION_LIMIT)
+            summary = summarize_scenarios(scenarios, total_assets_usd, st.session_state.currency_mode, display_rate())
+        
+        def format_display(amount):
+            # 요약 금액은 이미 표시 통화 기준
+            return format_money(amount, st.session_state.currency_mode)
+        
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("총자산 하위 5%", format_display(summary["p5"]))
+        metric_cols[1].metric("총자산 중앙값", format_display(summary["median"]))
+        metric_cols[2].metric("총자산 상위 5%", format_display(summary["p95"]))
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("손실 확률", f"{summary['loss_probability'] * 100:.1f}%")
+        metric_cols[1].metric(f"집중 한도({CONCENTRATION_LIMIT:.0f}%) 초과 확률", f"{summary['breach_probability'] * 100:.1f}%")
+        metric_cols[2].metric("평균 리밸런싱 수수료", format_display(summary["mean_commission"]))
 
 st.markdown("---")
 
@@ -1316,46 +1881,19 @@ col1, col2, col3 = st.columns(3)
 with col1:
     st.write("**📋 데이터 백업**")
     if st.session_state.stocks:
-        # 엑셀 백업
-        df = pd.DataFrame(st.session_state.stocks)
-        df["평가금액"] = df["현재가"] * df["수량"]
-        df["투자금액"] = df["매수단가"] * df["수량"]
-
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            # 현재 포트폴리오 (통화별로 시트 생성)
-            df_usd = df.copy()
-            df_usd.to_excel(writer, index=False, sheet_name="현재포트폴리오_USD")
-            
-            # 원화 시트 추가
-            df_krw = df.copy()
-            currency_columns = ["매수단가", "현재가", "수익", "평가금액", "투자금액"]
-            for col in currency_columns:
-                if col in df_krw.columns:
-                    df_krw[col] = df_krw[col] * st.session_state.exchange_rate
-            df_krw.to_excel(writer, index=False, sheet_name="현재포트폴리오_KRW")
-            
-            # 거래내역
-            if st.session_state.transactions:
-                df_trans = pd.DataFrame(st.session_state.transactions)
-                df_trans.to_excel(writer, index=False, sheet_name="거래내역")
-            
-            # 실현손익
-            if st.session_state.realized_pnl:
-                df_pnl = pd.DataFrame(st.session_state.realized_pnl)
-                df_pnl.to_excel(writer, index=False, sheet_name="실현손익")
-            
-            # 일별히스토리
-            if os.path.exists(DAILY_HISTORY_FILE):
-                with open(DAILY_HISTORY_FILE, "r", encoding="utf-8") as f:
-                    daily_history = json.load(f)
-                if daily_history:
-                    df_history = pd.DataFrame.from_dict(daily_history, orient='index')
-                    df_history.to_excel(writer, sheet_name="일별히스토리")
+        # 엑셀 백업 (USD/KRW 현재 포트폴리오 + 거래내역 + 실현손익 + 일별히스토리)
+        with timed("export.excel"):
+            excel_data = build_excel_backup(
+                holdings_in(st.session_state.stocks, get_fx_matrix()),
+                st.session_state.transactions,
+                st.session_state.realized_pnl,
+                load_daily_history(DAILY_HISTORY_FILE),
+                st.session_state.exchange_rate
+            )
 
         st.download_button(
             label="📥 엑셀 백업",
-            data=buffer.getvalue(),
+            data=excel_data,
             file_name=f"portfolio_complete_{get_korean_date()}_{st.session_state.currency_mode}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True
@@ -1386,11 +1924,50 @@ with col2:
         if st.button("🔄 선택된 백업 복원", use_container_width=True):
             backup_path = os.path.join(BACKUP_DATA_DIR, selected_backup)
             try:
-                shutil.copy2(backup_path, PRIMARY_FILE)
-                st.success(f"✅ {selected_backup} 복원 완료! 새로고침됩니다.")
-                st.rerun()
+                restored_state = load_snapshot(backup_path)
+                if restored_state is None:
+                    st.error(f"❌ {selected_backup} 파일이 손상되어 복원할 수 없습니다.")
+                else:
+                    # 복원 전 상태도 되돌릴 수 있게 백업한 뒤 세션 상태까지 교체
+                    create_timestamped_backup()
+                    apply_restored_state(restored_state)
+                    st.session_state.restore_result = (f"{selected_backup} 복원 완료!", [])
+                    st.rerun()
             except Exception as e:
                 st.error(f"❌ 백업 복원 실패: {e}")
+        
+        # 특정 시점 복원: 그 이전 가장 최신 백업 + 이후 거래/실현손익/현금 기록 재생
+        col_restore_date, col_restore_time = st.columns(2)
+        with col_restore_date:
+            restore_date = st.date_input("복원 날짜", value=datetime.now(KST).date(), key="restore_date")
+        with col_restore_time:
+            restore_time = st.time_input("복원 시각", value=datetime.max.time().replace(second=0, microsecond=0),
+                                         step=60, key="restore_time")
+        if st.button("⏪ 선택한 시점으로 복원", use_container_width=True):
+            until = f"{restore_date:%Y-%m-%d} {restore_time:%H:%M}:59"
+            try:
+                journal = {key: st.session_state[key] for key in JOURNAL_KEYS}
+                result = materialize_point_in_time(BACKUP_DATA_DIR, until, journal)
+                if result is None:
+                    st.error(f"❌ {until} 이전의 온전한 백업이 없습니다.")
+                else:
+                    create_timestamped_backup()
+                    apply_restored_state(result.state)
+                    notes = [f"건너뛴 거래: {skipped}" for skipped in result.skipped]
+                    if result.replayed is None:
+                        notes.insert(0, f"백업 이후 기존 기록이 수정되어 {result.snapshot_time} 백업만 복원했습니다.")
+                    st.session_state.restore_result = (
+                        f"{until} 시점으로 복원 완료! ({result.snapshot_time} 백업 + 이후 기록 {result.replayed or 0}건)", notes
+                    )
+                    st.rerun()
+            except Exception as e:
+                st.error(f"❌ 시점 복원 실패: {e}")
+        if "restore_result" in st.session_state:
+            # 복원 직후 한 번만 표시
+            restore_summary, restore_notes = st.session_state.pop("restore_result")
+            st.success(f"✅ {restore_summary}")
+            for note in restore_notes:
+                st.warning(f"⚠️ {note}")
     else:
         st.info("사용 가능한 백업 파일이 없습니다.")
 
@@ -1399,16 +1976,19 @@ with col3:
     
     # 오래된 백업 파일 정리
     if st.button("🗑️ 오래된 백업 정리", use_container_width=True):
-        backup_files = [f for f in os.listdir(BACKUP_DATA_DIR) if f.startswith("portfolio_backup_")]
-        if len(backup_files) > 5:
-            backup_files.sort()
-            deleted_count = 0
-            for old_file in backup_files[:-5]:  # 최신 5개만 유지
-                os.remove(os.path.join(BACKUP_DATA_DIR, old_file))
-                deleted_count += 1
-            st.success(f"✅ {deleted_count}개의 오래된 백업 파일을 삭제했습니다.")
+        report = apply_retention()
+        for error in report["오류"]:
+            st.error(f"❌ {error}")
+        if report["삭제한 백업"] or report["요약한 히스토리 행"]:
+            st.success(f"✅ 백업 {report['삭제한 백업']}개 삭제, 히스토리 {report['요약한 히스토리 행']}행 요약 "
+                       f"({report['확보한 용량'] / 1024:,.0f} KB 확보)")
         else:
             st.info("정리할 백업 파일이 없습니다.")
+    else:
+        last_report = load_retention_state(RETENTION_STATE_FILE).get("report")
+        if last_report:
+            st.caption(f"마지막 정리 {last_report['시각']}: 백업 {last_report['삭제한 백업']}개 삭제, "
+                       f"히스토리 {last_report['요약한 히스토리 행']}행 요약")
     
     # 전체 데이터 초기화 (위험)
     st.write("⚠️ **위험 구역**")
@@ -1427,12 +2007,14 @@ with col3:
             st.session_state.total_commission = 0.0
             st.session_state.best_worst_trades = {"best": None, "worst": None}
             st.session_state.currency_mode = "USD"
-            st.session_state.exchange_rate = 1320.0
+            st.session_state.exchange_rate = DEFAULT_EXCHANGE_RATE
+            st.session_state.cash_ledger = []
             
             # 파일들 삭제
             for file_path in [PRIMARY_FILE, DAILY_HISTORY_FILE]:
                 if os.path.exists(file_path):
                     os.remove(file_path)
+            portfolio_store.evict(portfolio_id)
             
             st.success("✅ 모든 데이터가 초기화되었습니다. (백업 생성됨)")
             st.rerun()
@@ -1486,7 +2068,7 @@ with st.expander("ℹ️ 개선된 앱 정보 및 새로운 기능"):
     - **환율 업데이트**: 중요한 거래 전에 환율 업데이트 권장
     - **복사 기능**: ChatGPT에 바로 붙여넣기 가능한 완성된 문장 생성
     - **백업 관리**: 정기적으로 엑셀/JSON 백업을 PC에 저장 권장
-    - **성능 최적화**: 너무 많은 백업 파일 시 "오래된 백업 정리" 사용
+    - **백업 보존**: 최근 하루는 모두, 이후 일/주/월/연 단위로 하나씩 자동 보관 (2년 지난 히스토리는 월별 요약)
     
     ### 📊 **지원되는 데이터**
     - ✅ 보유 종목 및 수량 (통화별 표시)
@@ -1512,8 +2094,23 @@ st.caption(f"📊 **포트폴리오 트래커 v2.1** | {currency_status} | "
 
 # 실시간 데이터 상태 표시 (사이드바 없이 하단에)
 if st.session_state.stocks:
-    total_value = sum(stock['수량'] * stock['현재가'] for stock in st.session_state.stocks)
+    total_value = sum(stock['수량'] * stock['현재가'] for stock in holdings_in(st.session_state.stocks, get_fx_matrix()))
     total_assets = total_value + st.session_state.cash_amount
     st.info(f"💼 현재 {len(st.session_state.stocks)}개 종목 보유 중 | "
            f"💰 총 자산: {format_currency(total_assets, st.session_state.currency_mode, st.session_state.exchange_rate)} | "
-           f"📈 총 거래: {len(st.session_state.transactions)}건")
\ No newline at end of file
+           f"📈 총 거래: {len(st.session_state.transactions)}건")
+
+# 재실행 소요 시간 기록 및 메트릭 파일 내보내기 (15초마다, data/perf_metrics.prom / .json)
+if perf_utils.is_enabled():
+    perf_utils.record("rerun", time.perf_counter() - rerun_started)
+    if time.time() - st.session_state.get("last_perf_export", 0) > 15:
+        try:
+            perf_utils.write_metrics_files(ROOT_DATA_DIR)
+            st.session_state.last_perf_export = time.time()
+        except OSError:
+            pass
+
+# 재실행 프로파일 저장 (data/profiles/, 모든 포트폴리오 공통)
+profile_paths = profile_utils.finish_capture()
+if profile_paths:
+    st.caption(f"🔬 재실행 프로파일 저장: {', '.join(os.path.basename(path) for path in profile_paths)}")
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""벤치마크용 합성 포트폴리오 생성기와 가짜 시세 소스"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storage_utils import DEFAULT_EXCHANGE_RATE, compute_daily_snapshot
+
+# 보유 종목 / 거래 / 히스토리 일수 규모 (BENCH_SIZES=10,1000 처럼 덮어쓰기 가능)
+BENCH_SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "10,1000,100000").split(",")]
+
+def make_symbols(count):
+    return [f"SYM{i:05d}" for i in range(count)]
+
+def make_stocks(count, rng):
+    stocks = []
+    for symbol in make_symbols(count):
+        quantity = rng.randint(1, 500)
+        avg_price = round(rng.uniform(5, 800), 2)
+        current_price = round(avg_price * rng.uniform(0.6, 1.6), 2)
+        profit = (current_price - avg_price) * quantity
+        stocks.append({
+            "종목": symbol,
+            "수량": quantity,
+            "매수단가": avg_price,
+            "현재가": current_price,
+            "수익": round(profit, 2),
+            "수익률(%)": round(profit / (avg_price * quantity) * 100, 2)
+        })
+    return stocks
+
+def make_timestamp(start, offset_minutes):
+    moment = start + timedelta(minutes=offset_minutes)
+    return f"{moment:%Y-%m-%d} {offset_minutes // 60 % 24:02d}:{offset_minutes % 60:02d}:00"
+
+def make_transactions(count, symbols, rng):
+    start = date(2015, 1, 2)
+    transactions = []
+    for i in range(count):
+        quantity = rng.randint(1, 100)
+        price = round(rng.uniform(5, 800), 2)
+        total = quantity * price
+        commission = total * 0.0025
+        is_buy = i % 3 != 2
+        transaction = {
+            "날짜": make_timestamp(start, i * 37),
+            "종목": rng.choice(symbols),
+            "거래유형": "매수" if is_buy else "매도",
+            "수량": quantity,
+            "가격": price,
+            "총액": total,
+            "수수료": round(commission, 2),
+        }
+        if is_buy:
+            transaction["실제비용"] = round(total + commission, 2)
+        else:
+            transaction["실제수익"] = round(total - commission, 2)
+        transactions.append(transaction)
+    return transactions
+
+def make_realized_pnl(count, symbols, rng):
+    start = date(2015, 1, 2)
+    records = []
+    for i in range(count):
+        quantity = rng.randint(1, 100)
+        buy_price = round(rng.uniform(5, 800), 2)
+        sell_price = round(buy_price * rng.uniform(0.7, 1.4), 2)
+        commission = quantity * sell_price * 0.0025
+        records.append({
+            "날짜": make_timestamp(start, i * 53),
+            "종목": rng.choice(symbols),
+            "수량": quantity,
+            "매수가": buy_price,
+            "매도가": sell_price,
+            "실현손익": round((sell_price - buy_price) * quantity - commission, 2),
+            "수익률(%)": round((sell_price - buy_price) / buy_price * 100, 2),
+            "수수료": round(commission, 2)
+        })
+    return records
+
+def make_daily_history(days, stocks, rng):
+    # 100k일은 실제 달력 범위를 넘으므로 과거 날짜부터 거꾸로 채움
+    end = date(2026, 1, 1)
+    base = compute_daily_snapshot(stocks, 10000.0, DEFAULT_EXCHANGE_RATE)
+    history = {}
+    for i in range(days):
+        drift = rng.uniform(0.8, 1.2)
+        history[(end - timedelta(days=days - i)).isoformat()] = {
+            **base,
+            "total_value": base["total_value"] * drift,
+            "total_assets": base["total_assets"] * drift,
+            "total_profit": base["total_value"] * drift - base["total_investment"],
+            "total_return_rate": (drift - 1) * 100,
+            "exchange_rate": DEFAULT_EXCHANGE_RATE * rng.uniform(0.9, 1.1)
+        }
+    return history
+
+def make_state(size, seed=0):
+    """app.py의 st.session_state와 같은 키를 가진 합성 포트폴리오"""
+    rng = random.Random(seed)
+    stocks = make_stocks(size, rng)
+    symbols = [stock["종목"] for stock in stocks]
+    realized_pnl = make_realized_pnl(size, symbols, rng)
+    return {
+        "stocks": stocks,
+        "cash_amount": 10000.0,
+        "transactions": make_transactions(size, symbols, rng),
+        "target_settings": {f"{symbol}_target": 20.0 for symbol in symbols},
+        "realized_pnl": realized_pnl,
+        "stock_memos": {symbols[0]: [{"날짜": "2025-01-02 10:00:00", "유형": "매수", "내용": "벤치마크"}]},
+        "total_commission": sum(t["수수료"] for t in realized_pnl),
+        "best_worst_trades": {"best": realized_pnl[0], "worst": realized_pnl[-1]},
+        "currency_mode": "USD",
+        "exchange_rate": DEFAULT_EXCHANGE_RATE,
+        "cash_ledger": [{"날짜": "2025-01-02 09:00:00", "유형": "입금", "금액": 10000.0, "환율": DEFAULT_EXCHANGE_RATE}],
+    }
+
+class FakeQuoteSource:
+    """yfinance 대신 쓰는 결정적 시세 소스 (네트워크 호출 없음)"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def __call__(self, symbol):
+        self.calls += 1
+        return self.rng.uniform(5, 800)
+
+_STATE_CACHE = {}
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda n: f"n={n}")
+def size(request):
+    return request.param
+
+@pytest.fixture
+def state(size):
+    # 규모별 합성 데이터는 생성 비용이 커서 세션 동안 재사용
+    if size not in _STATE_CACHE:
+        _STATE_CACHE[size] = make_state(size)
+    return _STATE_CACHE[size]
+
+@pytest.fixture
+def daily_history(size, state):
+    key = ("history", size)
+    if key not in _STATE_CACHE:
+        _STATE_CACHE[key] = make_daily_history(size, state["stocks"][:10], random.Random(1))
+    return _STATE_CACHE[key]
+
+@pytest.fixture
+def run(benchmark, size):
+    """규모가 크면 라운드 수를 줄여 같은 함수를 측정"""
+    rounds = 5 if size <= 1000 else 1
+
+    def _run(func, *args, setup=None):
+        if setup is not None:
+            return benchmark.pedantic(func, setup=setup, rounds=rounds, iterations=1)
+        return benchmark.pedantic(func, args=args, rounds=rounds, iterations=1, warmup_rounds=0)
+
+    return _run
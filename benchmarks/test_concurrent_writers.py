@@ -0,0 +1,96 @@
+"""여러 프로세스가 같은 포트폴리오를 동시에 저장할 때 변경이 유실되지 않는지 확인하는 스트레스 테스트"""
+import json
+import multiprocessing
+import os
+
+from storage_utils import (
+    DEFAULT_EXCHANGE_RATE, read_data_version, read_portfolio_file, read_portfolio_text,
+    save_portfolio_files, save_portfolio_versioned
+)
+
+WRITERS = int(os.environ.get("STRESS_WRITERS", "8"))
+SAVES_PER_WRITER = int(os.environ.get("STRESS_SAVES", "25"))
+
+def _paths(directory):
+    files = [os.path.join(directory, name, "portfolio_data.json") for name in ["data", "backup", "backup2"]]
+    return files, os.path.join(directory, "data", ".portfolio.lock"), os.path.join(directory, "data", "portfolio_data.version")
+
+def _initial_state():
+    return {
+        "stocks": [{"종목": "AAA", "수량": 1, "매수단가": 10.0, "현재가": 10.0, "수익": 0.0, "수익률(%)": 0.0}],
+        "cash_amount": 0.0,
+        "transactions": [],
+        "target_settings": {},
+        "realized_pnl": [],
+        "stock_memos": {},
+        "total_commission": 0.0,
+        "best_worst_trades": {"best": None, "worst": None},
+        "currency_mode": "USD",
+        "exchange_rate": DEFAULT_EXCHANGE_RATE,
+        "cash_ledger": [],
+    }
+
+def _writer(directory, writer_id):
+    files, lock_path, version_path = _paths(directory)
+    # 처음 한 번만 읽고 이후에는 자기 저장 결과만 기준으로 사용 (다른 작성자 저장과 자주 엇갈림)
+    data = json.loads(read_portfolio_text(files[0]))
+    version = read_data_version(version_path, files[0])
+    base = data
+    state = {key: data[key] for key in ["stocks", "transactions", "target_settings", "realized_pnl",
+                                        "stock_memos", "total_commission", "best_worst_trades",
+                                        "currency_mode", "exchange_rate", "cash_ledger"]}
+    state["cash_amount"] = data["cash"]
+    merges = 0
+
+    for i in range(SAVES_PER_WRITER):
+        state = json.loads(json.dumps(state))
+        state["transactions"].append({"날짜": "2025-01-02 10:00:00", "종목": "AAA", "거래유형": "매수",
+                                      "수량": 1, "가격": 10.0, "총액": 10.0, "수수료": 0.0,
+                                      "작성자": writer_id, "순번": i})
+        state["cash_amount"] += 1.0
+        state["cash_ledger"].append({"날짜": "2025-01-02 10:00:00", "유형": "입금", "금액": 1.0,
+                                     "환율": DEFAULT_EXCHANGE_RATE, "작성자": writer_id})
+        state["total_commission"] += 0.5
+        stock = state["stocks"][0]
+        stock["수량"] += 1
+        state["target_settings"][f"writer{writer_id}"] = i
+
+        base, version, merged_state = save_portfolio_versioned(
+            state, base, version, files, lock_path, version_path, "2025-01-02 10:00:00", 0.0
+        )
+        if merged_state is not None:
+            state = merged_state
+            merges += 1
+    return merges
+
+def test_concurrent_writers_lose_no_updates(tmp_path):
+    directory = str(tmp_path)
+    files, _, _ = _paths(directory)
+    for file_path in files:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    save_portfolio_files(_initial_state(), files, "2025-01-02 09:00:00", 0.0, version=0)
+
+    with multiprocessing.Pool(WRITERS) as pool:
+        merges = pool.starmap(_writer, [(directory, writer_id) for writer_id in range(WRITERS)])
+
+    total = WRITERS * SAVES_PER_WRITER
+    for file_path in files:
+        data = read_portfolio_file(file_path)
+        assert data["version"] == total
+        assert len(data["transactions"]) == total
+        assert {(t["작성자"], t["순번"]) for t in data["transactions"]} == {
+            (writer_id, i) for writer_id in range(WRITERS) for i in range(SAVES_PER_WRITER)
+        }
+        # 작성자별 기록 순서 유지
+        for writer_id in range(WRITERS):
+            sequence = [t["순번"] for t in data["transactions"] if t["작성자"] == writer_id]
+            assert sequence == list(range(SAVES_PER_WRITER))
+        assert data["cash"] == total
+        assert sum(event["금액"] for event in data["cash_ledger"]) == data["cash"]
+        assert data["total_commission"] == total * 0.5
+        assert data["stocks"][0]["수량"] == 1 + total
+        assert data["stocks"][0]["매수단가"] == 10.0
+        assert data["target_settings"] == {f"writer{writer_id}": SAVES_PER_WRITER - 1 for writer_id in range(WRITERS)}
+    assert read_data_version(os.path.join(directory, "data", "portfolio_data.version"), files[0]) == total
+    if WRITERS > 1:
+        assert sum(merges) > 0
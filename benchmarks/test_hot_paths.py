@@ -0,0 +1,492 @@
+"""app.py 핫패스 벤치마크 (pytest-benchmark)
+
+실행: python -m pytest  (결과는 .benchmarks/ 에 커밋별로 자동 저장)
+비교: python -m pytest --benchmark-compare --benchmark-compare-fail=median:20%
+100k 규모의 느린 경로 포함: BENCH_SLOW=1 python -m pytest
+"""
+import copy
+import gc
+import io
+import json
+import operator
+import os
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from analytics_utils import compute_performance, portfolio_flows
+from alert_utils import STOP, TAKE, TARGET, AlertEngine, AlertTracker
+from chart_utils import MAX_CHART_POINTS, build_history_figures
+from conftest import FakeQuoteSource
+from currency_utils import CURRENCY_KEY, SCHEMA_VERSION, FxMatrix, holdings_in, migrate_holdings
+from fx_utils import FxRateSeries, KrwCostBasis, history_rates, record_days
+from import_utils import TransactionHashIndex, read_broker_file, replay_trades
+from json_stream_utils import CorruptDataError, load_portfolio_stream
+from money_utils import add_money, sum_money, to_minor, usd_to_krw_array
+from ledger_utils import DEPOSIT, WITHDRAWAL, CashLedger
+from projection_utils import PROJECTION_HORIZONS, run_projection, summarize_projection
+from rebalance_utils import capped_weights, holdings_arrays, random_scenarios, rebalance_trades, simulate_scenarios
+from record_utils import RecordIndex, compact_records
+from recovery_utils import candidate_files, recover_portfolio
+from restore_utils import materialize_point_in_time
+from retention_utils import compact_daily_history, history_cutoff
+from shared_state_utils import SharedPortfolio, copy_portfolio_sections, session_memory
+from portfolio_utils import (
+    build_excel_backup, build_pnl_period_frame, convert_history_to_krw, history_to_frame,
+    refresh_stock_prices, summarize_pnl_by_period
+)
+from storage_utils import (
+    STATE_TO_DATA_KEYS, PortfolioStore, build_portfolio_payload, compute_daily_snapshot, copy_timestamped_backup, damaged_sections,
+    save_portfolio_files, section_text, serialize_portfolio, unpack_portfolio_data, update_daily_history, validate_data_integrity,
+    write_daily_history, write_portfolio_files
+)
+
+LAST_UPDATED = "2026-01-01 09:00:00"
+
+def replica_paths(tmp_path):
+    paths = []
+    for folder in ["data", "data_backup", "data_backup2"]:
+        os.makedirs(tmp_path / folder, exist_ok=True)
+        paths.append(str(tmp_path / folder / "portfolio_data.json"))
+    return paths
+
+@pytest.mark.benchmark(group="save")
+def test_serialize_portfolio(run, state):
+    run(lambda: serialize_portfolio(build_portfolio_payload(state, LAST_UPDATED, 0.0)))
+
+@pytest.mark.benchmark(group="save")
+def test_write_portfolio_files(run, state, tmp_path):
+    json_data = serialize_portfolio(build_portfolio_payload(state, LAST_UPDATED, 0.0))
+    run(write_portfolio_files, json_data, replica_paths(tmp_path))
+
+@pytest.mark.benchmark(group="save")
+def test_save_portfolio_data_secure(run, state, tmp_path):
+    run(save_portfolio_files, state, replica_paths(tmp_path), LAST_UPDATED, 0.0)
+
+@pytest.mark.benchmark(group="load")
+def test_load_portfolio_data_secure(run, state, tmp_path):
+    # 복제 파일 3개 + 타임스탬프 백업 헤더를 읽고 가장 최신 파일만 전체 검사
+    paths = replica_paths(tmp_path)
+    save_portfolio_files(state, paths, LAST_UPDATED, 0.0)
+    copy_timestamped_backup(paths[0], os.path.dirname(paths[1]), "2026-01-01_09-00-00")
+
+    def load():
+        recovery = recover_portfolio(candidate_files(paths, os.path.dirname(paths[1])))
+        assert validate_data_integrity(recovery.data)
+        return unpack_portfolio_data(recovery.data)
+
+    loaded = run(load)
+    assert len(loaded[0]) == len(state["stocks"])
+
+@pytest.mark.benchmark(group="load")
+def test_recover_damaged_section(run, state, tmp_path):
+    # 가장 최신 복제 파일들의 거래 내역 섹션이 모두 깨졌을 때 같은 체크섬의 섹션을 타임스탬프 백업에서 가져옴
+    paths = replica_paths(tmp_path)
+    backup_dir = os.path.dirname(paths[1])
+    save_portfolio_files(state, paths, LAST_UPDATED, 0.0)
+    copy_timestamped_backup(paths[0], backup_dir, "2026-01-01_09-00-00")
+    changed = dict(state, cash_amount=state["cash_amount"] + 1)
+    save_portfolio_files(changed, paths, LAST_UPDATED, 1.0)
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        damage_at = text.rindex('"transactions"') + 40
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text[:damage_at] + "#" + text[damage_at + 1:])
+
+    recovery = run(recover_portfolio, candidate_files(paths, backup_dir))
+    assert "transactions" in recovery.repaired and recovery.data["cash"] == changed["cash_amount"]
+    assert recovery.data["transactions"] == state["transactions"]
+
+@pytest.mark.benchmark(group="load")
+def test_point_in_time_restore(run, state, tmp_path):
+    # 타임스탬프 백업 하나 + 그 뒤에 기록된 거래를 복원 시점까지만 재생 (이후 거래는 제외)
+    backup_dir = str(tmp_path)
+    paths = replica_paths(tmp_path)
+    save_portfolio_files(state, paths, LAST_UPDATED, 0.0)
+    copy_timestamped_backup(paths[0], backup_dir, "2026-01-01_09-00-00")
+    journal = dict(state, stocks=[dict(stock) for stock in state["stocks"]], transactions=list(state["transactions"]),
+                   realized_pnl=list(state["realized_pnl"]), cash_ledger=list(state["cash_ledger"]),
+                   best_worst_trades=dict(state["best_worst_trades"]))
+    symbols = [stock["종목"] for stock in state["stocks"]]
+    replay_trades(journal, [("2026-01-02 10:00:00", symbol, "매수", 2, 50.0, 1.0) for symbol in symbols[:10]], 1350.0)
+    replay_trades(journal, [("2026-01-05 10:00:00", "LATER", "매수", 1, 10.0, 0.5)], 1350.0)
+
+    result = run(materialize_point_in_time, backup_dir, "2026-01-03 00:00:00", journal)
+    assert result.replayed == 20 and len(result.state["transactions"]) == len(state["transactions"]) + 10
+    assert all(stock["종목"] != "LATER" for stock in result.state["stocks"])
+    assert result.state["cash_amount"] == pytest.approx(state["cash_amount"] - 10 * 101.0)
+
+@pytest.mark.benchmark(group="load")
+def test_stream_backup_upload(run, state):
+    # 업로드한 JSON 백업(바이트)을 스트리밍으로 검사/해석, 중간이 손상된 파일은 그 위치에서 중단
+    payload = build_portfolio_payload(state, LAST_UPDATED, 0.0)
+    content = serialize_portfolio(payload).encode("utf-8")
+
+    data = run(lambda: load_portfolio_stream(io.BytesIO(content)))
+    assert not damaged_sections(data)
+    data.pop("checksums")
+    assert data == payload
+    corrupt = content[:len(content) // 2] + b"#" + content[len(content) // 2 + 1:]
+    with pytest.raises(CorruptDataError):
+        load_portfolio_stream(io.BytesIO(corrupt))
+
+@pytest.mark.benchmark(group="load")
+def test_load_from_portfolio_store(run, state):
+    # 같은 서버의 다른 세션이 이미 로드한 포트폴리오 (디스크 읽기/파싱 없이 공유 데이터의 컨테이너만 복사)
+    store = PortfolioStore()
+    data = json.loads(serialize_portfolio(build_portfolio_payload(state, LAST_UPDATED, 0.0)))
+    store.put("bench", SharedPortfolio(data, 0))
+
+    def load():
+        shared = store.get("bench")
+        return shared.acquire(), unpack_portfolio_data(copy_portfolio_sections(shared.data))
+
+    ref, loaded = run(load)
+    assert len(loaded[0]) == len(state["stocks"]) and loaded[2] == data["transactions"]
+    # 세션은 기록 목록 자체만 가지고 레코드는 공유 데이터와 같은 객체를 씀
+    assert loaded[2] is not data["transactions"] and all(map(operator.is_, loaded[2], data["transactions"]))
+    memory = session_memory(zip(STATE_TO_DATA_KEYS, loaded), ref)
+    assert memory["공유 세션 수"] >= 1 and memory["세션"] < memory["공유"]
+
+def _traced_bytes(build):
+    # build()가 만든 결과가 차지하는 메모리 (중간에 버려진 객체 제외)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.benchmark(group="load")
+def test_compact_record_memory(run, benchmark, state):
+    # 거래 한 건당 메모리: JSON에서 읽은 dict vs CompactRecord (저장 형식은 그대로 돌아와야 함)
+    text = section_text(state["transactions"])
+    records, dict_bytes = _traced_bytes(lambda: json.loads(text))
+    compact, compact_bytes = _traced_bytes(lambda: compact_records(json.loads(text)))
+    per_record = {"dict": dict_bytes / len(records), "compact": compact_bytes / len(records)}
+    benchmark.extra_info["bytes_per_transaction"] = {key: round(value) for key, value in per_record.items()}
+    assert compact == records and section_text(compact) == text
+    if len(records) >= 1000:
+        assert per_record["compact"] < per_record["dict"] * 0.6
+
+    run(compact_records, records)
+
+@pytest.mark.benchmark(group="snapshot")
+def test_save_daily_snapshot(run, state, daily_history, tmp_path):
+    history_file = str(tmp_path / "daily_history.json")
+
+    def setup():
+        write_daily_history(history_file, daily_history)
+        return (), {}
+
+    def snapshot():
+        update_daily_history(
+            history_file, "2026-01-01",
+            compute_daily_snapshot(state["stocks"], state["cash_amount"], state["exchange_rate"])
+        )
+
+    run(snapshot, setup=setup)
+
+@pytest.mark.benchmark(group="snapshot")
+def test_compact_daily_history(run, daily_history):
+    # 2년보다 오래된 일별 기록을 월별 요약 행으로 합침 (최근 기록과 첫 기록은 그대로)
+    before = history_cutoff(date(2026, 1, 1))
+    history, removed = run(compact_daily_history, daily_history, before)
+    recent = sum(day >= before for day in daily_history)
+    assert len(history) + removed == len(daily_history) and sum(day >= before for day in history) == recent
+    assert len(history) <= recent + 1 + 12 * (len(daily_history) // 365 + 2)
+
+@pytest.mark.benchmark(group="analytics")
+def test_period_groupbys(run, state):
+    def summarize():
+        df_pnl = build_pnl_period_frame(state["realized_pnl"])
+        return summarize_pnl_by_period(df_pnl, "월"), summarize_pnl_by_period(df_pnl, "주").tail(4)
+
+    run(summarize)
+
+@pytest.mark.benchmark(group="analytics")
+def test_history_krw_conversion(run, daily_history):
+    # 날짜별 환율로 원화 변환 (센트 -> 원 int64 배열)
+    history_df = history_to_frame(daily_history)
+
+    def convert():
+        return [convert_history_to_krw(history_df, column, 1320.0)
+                for column in ["total_investment", "total_value", "total_assets"]]
+
+    converted = run(convert)
+    # 센트로 반올림한 뒤 변환하므로 차이는 1센트어치 이내
+    rate = history_df["exchange_rate"].iloc[-1]
+    assert converted[2][-1] == pytest.approx(history_df["total_assets"].iloc[-1] * rate, abs=rate / 100)
+
+@pytest.mark.benchmark(group="analytics")
+def test_krw_cost_basis(run, benchmark, state, daily_history):
+    # 거래 한 건 추가 후 거래일 환율 원화 원가 갱신 (전체 재생은 환율 이력이 바뀔 때만)
+    series = FxRateSeries.from_closes({}, history_rates(daily_history))
+    transactions = list(state["transactions"])
+    cost_basis = KrwCostBasis()
+    started = time.perf_counter()
+    cost_basis.sync(transactions, series, 1320.0)
+    benchmark.extra_info["full_sync_seconds"] = time.perf_counter() - started
+
+    def tick():
+        transactions.append(dict(transactions[-1]))
+        return cost_basis.sync(transactions, series, 1320.0)
+
+    assert run(tick) == 1
+    # as-of 환율은 그 날짜 이전(포함) 가장 최근 환율 (첫 환율보다 이르면 첫 환율)
+    days = [str(day) for day in series.days]
+    for record, rate in zip(transactions[::max(1, len(transactions) // 50)], cost_basis.rates[::max(1, len(transactions) // 50)]):
+        position = max(0, sum(day <= record["날짜"][:10] for day in days) - 1)
+        assert rate == series.rates[position]
+    rebuilt = KrwCostBasis()
+    rebuilt.sync(transactions, series, 1320.0)
+    assert (rebuilt.realized_won, rebuilt.cost_won) == (cost_basis.realized_won, cost_basis.cost_won)
+    assert len(record_days(transactions)) == len(cost_basis.rates)
+
+def test_krw_realized_duplicate_keys_across_pages():
+    # 같은 날 같은 종목/수량 매도가 다른 페이지에 있어도 실현손익 기록 전체 기준 순번으로 각자의 매도와 짝지음
+    series = FxRateSeries(np.array(["2026-01-02", "2026-01-05"], dtype="datetime64[D]"), [1300.0, 1350.0])
+    transactions = [
+        {"날짜": "2026-01-02 10:00:00", "종목": "AAPL", "거래유형": "매수", "수량": 2, "가격": 100.0, "총액": 200.0, "수수료": 0.5},
+        {"날짜": "2026-01-05 10:00:00", "종목": "AAPL", "거래유형": "매도", "수량": 1, "가격": 110.0, "총액": 110.0, "수수료": 0.28},
+        {"날짜": "2026-01-05 11:00:00", "종목": "AAPL", "거래유형": "매도", "수량": 1, "가격": 120.0, "총액": 120.0, "수수료": 0.3},
+    ]
+    realized_pnl = [
+        {"날짜": "2026-01-05 10:00:01", "종목": "AAPL", "수량": 1, "매수가": 100.0, "매도가": 110.0, "실현손익": 9.72},
+        {"날짜": "2026-01-05 11:00:02", "종목": "AAPL", "수량": 1, "매수가": 100.0, "매도가": 120.0, "실현손익": 19.7},
+    ]
+    cost_basis = KrwCostBasis()
+    cost_basis.sync(transactions, series, 1320.0)
+    full = cost_basis.realized_for(realized_pnl, None, series, 1320.0)
+    assert full[0][0] != full[0][1]
+    index = RecordIndex(value_key="실현손익")
+    index.sync(realized_pnl)
+    rows = index.query()
+    for page in (1, 2):
+        page_rows = index.page_rows(rows, page, 1)
+        won, fx_won, cost = cost_basis.realized_for(realized_pnl, page_rows, series, 1320.0)
+        assert (won.tolist(), fx_won.tolist(), cost.tolist()) == ([full[0][page_rows[0]]], [full[1][page_rows[0]]],
+                                                                  [full[2][page_rows[0]]])
+
+def test_krw_realized_oversell_falls_back_to_record():
+    # 이력보다 많이 판 매도는 아는 만큼 원가만 덜고, 실현손익은 기록의 달러 손익을 매도일 환율로 환산
+    series = FxRateSeries(np.array(["2026-01-02"], dtype="datetime64[D]"), [1300.0])
+    transactions = [
+        {"날짜": "2026-01-02 10:00:00", "종목": "A", "거래유형": "매수", "수량": 1, "가격": 100.0, "총액": 100.0, "수수료": 0.0},
+        {"날짜": "2026-01-03 10:00:00", "종목": "A", "거래유형": "매도", "수량": 2, "가격": 100.0, "총액": 200.0, "수수료": 0.0},
+    ]
+    realized_pnl = [{"날짜": "2026-01-03 10:00:00", "종목": "A", "수량": 2, "매수가": 100.0, "매도가": 100.0, "실현손익": 0.0}]
+    cost_basis = KrwCostBasis()
+    cost_basis.sync(transactions, series, 1320.0)
+    assert (cost_basis.realized_won, cost_basis.quantity["A"], cost_basis.cost_won["A"]) == (0, 0, 0)
+    won, fx_won, cost = cost_basis.realized_for(realized_pnl, None, series, 1320.0)
+    assert (won.tolist(), fx_won.tolist(), cost.tolist()) == ([0], [0], [260000])
+
+@pytest.mark.benchmark(group="analytics")
+def test_money_totals(run, benchmark, state):
+    # 실현손익/수수료 합계: 센트 정수(int64) 합산은 Decimal 합계와 같고, 한 건씩 누적해도 오차가 쌓이지 않음
+    amounts = [record["실현손익"] for record in state["realized_pnl"]] + [record["수수료"] for record in state["transactions"]]
+    started = time.perf_counter()
+    expected = sum((Decimal(repr(amount)) for amount in amounts), Decimal(0))
+    benchmark.extra_info["decimal_seconds"] = time.perf_counter() - started
+
+    total = run(sum_money, amounts)
+    assert Decimal(repr(total)) == expected
+    running = 0.0
+    for amount in amounts:
+        running = add_money(running, amount)
+    assert running == total
+
+@pytest.mark.benchmark(group="analytics")
+def test_fx_matrix_conversion(run, state):
+    # 거래 통화가 섞인 보유 종목의 평가 컬럼 묶음을 표시 통화로 한 번에 환산 (행별 환율 배열 하나를 곱함)
+    fx = FxMatrix({"KRW": 1350.0, "JPY": 150.0, "EUR": 0.9})
+    stocks = [dict(stock, **{CURRENCY_KEY: ("USD", "JPY", "EUR")[row % 3]})
+              for row, stock in enumerate(migrate_holdings(state["stocks"], 1))]
+    currencies = [stock[CURRENCY_KEY] for stock in stocks]
+    values = np.array([(stock["매수단가"], stock["현재가"], stock["수익"]) for stock in stocks])
+    converted = run(fx.convert_minor, values, currencies, "KRW")
+    assert converted.shape == values.shape
+    # USD -> 원화는 usd_to_krw_array와 같은 값, 다른 통화는 그 통화 최소 단위로 반올림한 뒤 교차 환율
+    usd = np.array(currencies) == "USD"
+    assert (converted[usd] == usd_to_krw_array(values[usd], 1350.0)).all()
+    row = currencies.index("JPY")
+    assert converted[row, 0] == round(to_minor(values[row, 0], "JPY") * 9.0)
+    # 이전 스키마 데이터는 USD로 채우고, 합계용 USD 환산 목록은 금액만 바뀜
+    assert migrate_holdings(state["stocks"], SCHEMA_VERSION) is state["stocks"]
+    in_usd = holdings_in(stocks, fx)
+    assert [stock["수량"] for stock in in_usd] == [stock["수량"] for stock in stocks]
+    assert abs(in_usd[row]["현재가"] - stocks[row]["현재가"] / 150.0) < 1e-9
+
+@pytest.mark.benchmark(group="export")
+def test_excel_export(run, state, daily_history, size):
+    if size > 1000 and not os.environ.get("BENCH_SLOW"):
+        pytest.skip("100k 규모 엑셀 내보내기는 수 분 소요 (BENCH_SLOW=1로 실행)")
+    run(build_excel_backup, state["stocks"], state["transactions"], state["realized_pnl"],
+        daily_history, state["exchange_rate"])
+
+@pytest.mark.benchmark(group="quotes")
+def test_price_refresh_loop(run, state):
+    stocks = copy.deepcopy(state["stocks"])
+    quotes = FakeQuoteSource()
+    run(refresh_stock_prices, stocks, quotes)
+    assert quotes.calls >= len(stocks)
+
+@pytest.mark.benchmark(group="alerts")
+def test_alert_full_evaluation(run, state):
+    def evaluate():
+        engine = AlertEngine()
+        engine.evaluate(state["stocks"], state["target_settings"], 10.0, -5.0, state["total_commission"])
+        return engine.alerts(TARGET, STOP, TAKE)
+
+    run(evaluate)
+
+@pytest.mark.benchmark(group="alerts")
+def test_alert_incremental_tick(run, state):
+    # 시세 한 건만 바뀐 재실행: 해당 종목만 다시 판정
+    stocks = copy.deepcopy(state["stocks"])
+    engine = AlertEngine()
+    engine.evaluate(stocks, state["target_settings"], 10.0, -5.0, state["total_commission"])
+
+    def tick():
+        stocks[0]["수익률(%)"] += 0.01
+        engine.evaluate(stocks, state["target_settings"], 10.0, -5.0, state["total_commission"])
+        return engine.alerts(TARGET, STOP, TAKE)
+
+    run(tick)
+    assert engine.last_changed <= len(stocks)
+
+@pytest.mark.benchmark(group="alerts")
+def test_alert_tracker_tick(run, state, tmp_path):
+    # 이미 발생한 알림이 유지되는 틱: 상태 배열 비교만 하고 기록은 추가하지 않음
+    stocks = copy.deepcopy(state["stocks"])
+    engine = AlertEngine()
+    engine.evaluate(stocks, state["target_settings"])
+    tracker = AlertTracker(str(tmp_path / "alert_log.jsonl"), str(tmp_path / "alert_state.json"))
+    first_events = tracker.update(engine, 0.0, LAST_UPDATED)
+
+    def tick():
+        stocks[0]["수익률(%)"] += 0.01
+        engine.evaluate(stocks, state["target_settings"])
+        return tracker.update(engine, 1.0, LAST_UPDATED)
+
+    run(tick)
+    assert first_events and not tick()
+
+@pytest.mark.benchmark(group="records")
+def test_transaction_page_view(run, state):
+    # 기록 한 건 추가 후 종목+유형 필터의 첫 페이지 표시
+    transactions = list(state["transactions"])
+    index = RecordIndex(type_key="거래유형", counted_types=("매수", "매도"))
+    index.sync(transactions)
+    symbol = transactions[0]["종목"]
+
+    def view():
+        transactions.append(dict(transactions[-1]))
+        index.sync(transactions)
+        rows = index.query(symbol=symbol, record_type="매수")
+        return index.page(rows, 1), index.most_common_symbol()
+
+    page, _ = run(view)
+    assert len(page) <= 15
+
+@pytest.mark.benchmark(group="charts")
+def test_history_figures(run, daily_history):
+    # 원화 모드 총자산/수익률 차트 생성 (시리즈당 MAX_CHART_POINTS개로 다운샘플링)
+    history_df = history_to_frame(daily_history)
+    asset_json, _ = run(build_history_figures, history_df, "KRW", 1320.0)
+    for trace in json.loads(asset_json)["data"]:
+        assert len(trace["x"]) <= MAX_CHART_POINTS
+
+@pytest.mark.benchmark(group="analytics")
+def test_performance_metrics(run, state, daily_history):
+    # TWR/MWR/낙폭/변동성/샤프/소르티노 (원화 기준, 거래 내역으로 입출금 분리)
+    history_df = history_to_frame(daily_history)
+
+    def analyze():
+        dates, assets, flows = portfolio_flows(history_df, state["transactions"], "KRW", 1320.0)
+        return compute_performance(dates, assets, flows)
+
+    result = run(analyze)
+    assert -1.0 <= result["max_drawdown"] <= 0.0
+
+@pytest.mark.benchmark(group="analytics")
+def test_cash_ledger_flows(run, size, daily_history):
+    # 입출금 이벤트 size건을 색인하고 히스토리 날짜별 입출금(원화, 이벤트 시점 환율)을 누적합으로 조회
+    history_df = history_to_frame(daily_history)
+    dates = history_df.index.values.astype("datetime64[D]")
+    events = [{"날짜": f"{dates[i * len(dates) // size]} 10:00:00", "유형": DEPOSIT if i % 3 else WITHDRAWAL,
+               "금액": 100.0 if i % 3 else -50.0, "환율": 1300.0 + i % 50} for i in range(size)]
+
+    def flows():
+        ledger = CashLedger()
+        ledger.sync(events)
+        return ledger, ledger.flows_by_date(dates, "KRW")
+
+    ledger, (daily_flows, covered) = run(flows)
+    assert daily_flows[covered].sum() == pytest.approx(
+        ledger.net_deposits_krw - ledger.deposits_as_of(f"{dates[0]} 23:59:59", "KRW"))
+
+@pytest.mark.benchmark(group="rebalance")
+def test_rebalance_plan(run, state):
+    # 집중 한도를 적용한 현재 비중으로 정수 주 단위 리밸런싱 거래 계산
+    _, quantities, prices = holdings_arrays(state["stocks"])
+    weights = capped_weights(quantities * prices, 49.0) * 0.9
+    plan = run(rebalance_trades, quantities, prices, state["cash_amount"], weights, 0.0025)
+    assert plan["cash_after"] >= 0
+
+@pytest.mark.benchmark(group="rebalance")
+def test_what_if_scenarios(run, size, state):
+    # 시나리오 x 보유 종목 전체를 배열 연산(메모리 상한 단위 분할)으로 평가 - 충격 행렬이 1천만 셀을 넘지 않게 시나리오 수 조정
+    _, quantities, prices = holdings_arrays(state["stocks"])
+    weights = capped_weights(quantities * prices, 49.0) * 0.9
+    price_shocks, fx_moves = random_scenarios(min(1000, 10_000_000 // size), len(prices))
+    result = run(simulate_scenarios, quantities, prices, state["cash_amount"], weights, price_shocks, fx_moves,
+                 1320.0, 0.0025, 50.0)
+    assert (result["commission"] >= 0).all()
+
+@pytest.mark.benchmark(group="projection")
+@pytest.mark.parametrize("method", ["bootstrap", "gbm"])
+def test_monte_carlo_projection(run, size, method):
+    # 20종목, 756거래일 수익률로 size개 경로의 1개월/3개월/1년 가치와 VaR/ES 계산 (현재 프로세스)
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.0003, 0.02, (756, 20))
+    weights = np.full(20, 0.9 / 20)
+
+    def project():
+        values = run_projection(returns, weights, 0.1, list(PROJECTION_HORIZONS.values()), size, method, workers=1)
+        return summarize_projection(values)
+
+    summary = run(project)
+    assert summary["1년"]["es99"] >= summary["1년"]["var99"]
+
+@pytest.mark.benchmark(group="import")
+def test_broker_import(run, size):
+    # 증권사 CSV size행을 청크로 읽어 정규화/중복 확인 후 빈 포트폴리오에 재생, 같은 파일을 다시 가져오면 모두 중복
+    lines = ["Trade Date,Symbol,Action,Quantity,Price ($),Commission ($)"]
+    for i in range(size):
+        action = "YOU BOUGHT" if i % 4 != 3 else "YOU SOLD"
+        lines.append(f"2025-{1 + i * 12 // size:02d}-{1 + i % 28:02d},SYM{i % 50},{action},{1 + i % 7},\"${100 + i % 90:,.2f}\",0.5")
+    content = "\n".join(lines).encode("utf-8")
+
+    def setup():
+        state = {"stocks": [], "transactions": [], "realized_pnl": [], "total_commission": 0.0,
+                 "cash_amount": 0.0, "cash_ledger": [], "best_worst_trades": {"best": None, "worst": None}}
+        return (state,), {}
+
+    def import_file(state):
+        trades, stats = read_broker_file(io.BytesIO(content), "trades.csv", TransactionHashIndex().sync([]), 0.0025)
+        replay_trades(state, trades, 1350.0)
+        return state, stats
+
+    state, stats = run(import_file, setup=setup)
+    assert stats["읽은 행"] == size and len(state["transactions"]) + stats["매매 아님"] <= size
+    index = TransactionHashIndex().sync(state["transactions"])
+    trades, stats = read_broker_file(io.BytesIO(content), "trades.csv", index, 0.0025)
+    assert len(trades) == size - len(state["transactions"])
@@ -0,0 +1,30 @@
+"""몬테카를로 전망을 프로세스 풀(공유 메모리 수익률 행렬)로 나눠 계산해도 단일 프로세스와 같은 분포가 나오는지 확인"""
+import os
+
+import numpy as np
+import pytest
+
+from projection_utils import PROJECTION_HORIZONS, run_projection, summarize_projection
+
+WORKERS = int(os.environ.get("PROJECTION_WORKERS", "2"))
+PATHS = int(os.environ.get("PROJECTION_TEST_PATHS", "20000"))
+
+@pytest.mark.parametrize("method", ["bootstrap", "gbm"])
+def test_process_pool_matches_single_process(method):
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0.0004, 0.015, (500, 8))
+    weights = np.full(8, 0.1)
+    steps = list(PROJECTION_HORIZONS.values())
+
+    serial = run_projection(returns, weights, 0.2, steps, PATHS, method, seed=1, workers=1)
+    pooled = run_projection(returns, weights, 0.2, steps, PATHS, method, seed=1, workers=WORKERS, parallel_min_cells=0)
+
+    assert pooled.shape == serial.shape == (PATHS, len(steps))
+    # 시드가 달라 경로는 다르지만 분포 요약은 표본 오차 안에서 일치
+    for name, row in summarize_projection(serial).items():
+        pooled_row = summarize_projection(pooled)[name]
+        for key in ["p5", "p50", "p95", "var95", "es95"]:
+            assert pooled_row[key] == pytest.approx(row[key], abs=0.02)
+    # 작업자마다 다른 난수열을 써서 경로가 중복되지 않음
+    half = PATHS // WORKERS
+    assert not np.allclose(pooled[:half], pooled[half:2 * half])
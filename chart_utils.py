@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from currency_utils import CURRENCY_NAMES, CURRENCY_SYMBOLS
+from portfolio_utils import convert_history_to_krw
+
+MAX_CHART_POINTS = 800   # 차트 가로 해상도 기준 시리즈당 최대 점 수
+FIGURE_CACHE_SIZE = 64
+# 기간 선택 -> 최근 일수 (None이면 전체)
+CHART_RANGES = {"1개월": 31, "3개월": 92, "6개월": 183, "1년": 366, "전체": None}
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: 시리즈 모양을 보존하는 threshold개 점의 인덱스"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        # 다음 구간 평균점과 직전 선택점으로 만든 삼각형 넓이가 가장 큰 점 선택
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(area.argmax())
+        selected[i + 1] = anchor
+    return selected
+
+def minmax_indices(y, threshold):
+    """구간별 최솟값/최댓값 인덱스 (급등락을 놓치지 않는 단순 다운샘플링)"""
+    n = len(y)
+    buckets = max(1, threshold // 2)
+    if threshold >= n:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    valid = offsets < n
+    picks = np.concatenate([
+        offsets[valid] + np.nanargmin(padded[valid], axis=1),
+        offsets[valid] + np.nanargmax(padded[valid], axis=1),
+        [0, n - 1],
+    ])
+    return np.unique(picks)
+
+def downsample_indices(index, values, max_points=MAX_CHART_POINTS, method="lttb"):
+    if method == "minmax":
+        return minmax_indices(np.asarray(values, dtype=float), max_points)
+    return lttb_indices(index.asi8, values, max_points)
+
+def slice_history_range(history_df, days):
+    """최근 days일 구간 (None이면 전체)"""
+    if days is None or history_df.empty:
+        return history_df
+    return history_df[history_df.index >= history_df.index[-1] - timedelta(days=days)]
+
+def _series(history_df, column, currency_mode, exchange_rate, max_points):
+    # 표시할 점만 골라 환율 변환 (변환은 선택된 날짜에만)
+    rows = downsample_indices(history_df.index, history_df[column].to_numpy(), max_points)
+    selected = history_df.iloc[rows]
+    if currency_mode == "KRW" and column != "total_return_rate":
+        return selected.index, convert_history_to_krw(selected, column, exchange_rate)
+    if currency_mode != "USD" and column != "total_return_rate":
+        # 히스토리에는 원화 환율만 기록되므로 다른 표시 통화는 현재 환율(exchange_rate)로 환산
+        return selected.index, (selected[column] * exchange_rate).tolist()
+    return selected.index, selected[column].tolist()
+
+def build_history_figures(history_df, currency_mode, exchange_rate, max_points=MAX_CHART_POINTS):
+    """
+    총자산 추이 / 수익률 추이 차트를 다운샘플링해 만들고 직렬화한 JSON 두 개를 반환
+    (exchange_rate: 1달러당 표시 통화 환율, 원화는 날짜별 기록 환율이 없을 때만 사용)
+    """
+    currency_text = CURRENCY_NAMES.get(currency_mode, currency_mode)
+    currency_symbol = CURRENCY_SYMBOLS.get(currency_mode, currency_mode)
+
+    fig = go.Figure()
+    for column, name, line in [
+        ("total_investment", "투자금액", dict(color='blue')),
+        ("total_value", "평가금액", dict(color='green')),
+        ("total_assets", "총자산", dict(color='red', width=3)),
+    ]:
+        x, y = _series(history_df, column, currency_mode, exchange_rate, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, name=name, line=line))
+    fig.update_layout(
+        title=f"투자금액 vs 평가금액 vs 총자산 추이 ({currency_text})",
+        xaxis_title="날짜",
+        yaxis_title=f"금액 ({currency_symbol})",
+        height=400
+    )
+
+    x, y = _series(history_df, "total_return_rate", currency_mode, exchange_rate, max_points)
+    fig2 = go.Figure(go.Scatter(x=x, y=y, mode="lines", name="수익률(%)"))
+    fig2.update_layout(title="일별 수익률 변화", xaxis_title="날짜", yaxis_title="수익률(%)", height=300)
+    return fig.to_json(), fig2.to_json()
+
+def build_allocation_figure(asset_data, currency_mode):
+    """자산 구성 파이차트 JSON"""
+    currency_text = CURRENCY_NAMES.get(currency_mode, currency_mode)
+    fig = px.pie(asset_data, names="종목", values="평가금액",
+                 title=f"💼 자산 구성 비율 (현금 포함, {currency_text} 기준)")
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig.to_json()
+
+class FigureCache:
+    """직렬화한 차트 JSON을 (데이터 버전, 통화, 기간 등) 키로 보관하는 프로세스 전역 LRU"""
+
+    def __init__(self, capacity=FIGURE_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
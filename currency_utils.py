@@ -0,0 +1,134 @@
+import numpy as np
+
+from money_utils import MINOR_DIGITS, from_minor, from_minor_array, minor_scale, scale_minor_array
+
+BASE_CURRENCY = "USD"  # 현금/원장/일별 히스토리/합계를 기록하는 기준 통화
+CURRENCY_SYMBOLS = {"USD": "$", "KRW": "₩", "JPY": "¥", "EUR": "€"}
+CURRENCY_NAMES = {"USD": "달러", "KRW": "원화", "JPY": "엔화", "EUR": "유로"}
+DEFAULT_FX_RATES = {"USD": 1.0, "KRW": 1320.0, "JPY": 150.0, "EUR": 0.92}  # 조회 전/실패 시 1달러당 대략적인 환율
+# 거래소 접미사 -> 거래 통화 (접미사가 없으면 미국 종목으로 보고 USD)
+EXCHANGE_SUFFIX_CURRENCIES = {
+    ".T": "JPY", ".KS": "KRW", ".KQ": "KRW",
+    ".DE": "EUR", ".F": "EUR", ".PA": "EUR", ".AS": "EUR", ".MI": "EUR", ".MC": "EUR", ".BR": "EUR",
+}
+HOLDING_AMOUNT_KEYS = ["매수단가", "현재가", "수익"]  # 보유 종목의 거래 통화 금액 필드
+CURRENCY_KEY = "통화"     # 보유 종목/거래/실현손익 기록의 거래 통화 필드 (없으면 BASE_CURRENCY)
+SCHEMA_VERSION = 2        # 1: 모든 금액 USD, 2: 종목/기록별 거래 통화
+
+def fx_ticker(currency):
+    """1달러당 currency 환율의 yfinance 티커 (KRW=X, JPY=X, EUR=X)"""
+    return f"{currency}=X"
+
+def guess_currency(symbol):
+    """종목 코드의 거래소 접미사로 추정한 거래 통화"""
+    for suffix, currency in EXCHANGE_SUFFIX_CURRENCIES.items():
+        if symbol.upper().endswith(suffix):
+            return currency
+    return BASE_CURRENCY
+
+def record_currency(record):
+    return record.get(CURRENCY_KEY) or BASE_CURRENCY
+
+def currency_symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, currency + " ")
+
+def format_money(amount, currency):
+    """표시 통화 금액 문자열 (소수 자릿수는 통화의 최소 단위)"""
+    return f"{currency_symbol(currency)}{amount:,.{MINOR_DIGITS.get(currency, 2)}f}"
+
+def migrate_holdings(stocks, schema_version):
+    """이전 스키마(USD만)의 보유 종목에 거래 통화를 채움 - 바꿀 종목만 새 dict (기록은 읽을 때 USD로 봄)"""
+    if schema_version >= SCHEMA_VERSION:
+        return stocks
+    return [stock if CURRENCY_KEY in stock else {**stock, CURRENCY_KEY: BASE_CURRENCY} for stock in stocks]
+
+def holdings_in(stocks, fx, target=BASE_CURRENCY):
+    """
+    보유 종목 금액을 target 통화로 바꾼 목록 (합계/비중/시뮬레이션 입력용). 모두 target 통화면 원래 목록 그대로,
+    아니면 다른 통화 종목만 금액 필드를 환산한 사본 (수량/수익률은 그대로)
+    """
+    if all(record_currency(stock) == target for stock in stocks):
+        return stocks
+    converted = []
+    for stock in stocks:
+        currency = record_currency(stock)
+        if currency != target:
+            rate = fx.rate(currency, target)
+            stock = {**stock, **{key: stock[key] * rate for key in HOLDING_AMOUNT_KEYS if key in stock}, CURRENCY_KEY: target}
+        converted.append(stock)
+    return converted
+
+class FxMatrix:
+    """
+    통화 간 교차 환율 행렬. matrix[i, j]는 currencies[i] 1단위의 currencies[j] 금액이며
+    1달러당 환율(rates) 하나씩으로 만듦. 통화가 섞인 금액 배열(행마다 다른 통화)을 한 번의 곱으로 환산
+    """
+
+    def __init__(self, rates):
+        rates = {**DEFAULT_FX_RATES, **{currency: rate for currency, rate in rates.items() if rate}}
+        rates[BASE_CURRENCY] = 1.0
+        self.currencies = list(rates)
+        self.per_usd = np.array([rates[currency] for currency in self.currencies], dtype=np.float64)
+        self.matrix = self.per_usd[np.newaxis, :] / self.per_usd[:, np.newaxis]
+        self._index = {currency: position for position, currency in enumerate(self.currencies)}
+        self._scales = np.array([minor_scale(currency) if currency in MINOR_DIGITS else 100
+                                 for currency in self.currencies], dtype=np.float64)
+
+    def position(self, currency):
+        return self._index.get(currency, self._index[BASE_CURRENCY])
+
+    def rate(self, source, target):
+        """source 1단위의 target 금액"""
+        return float(self.matrix[self.position(source), self.position(target)])
+
+    def indexes(self, currencies):
+        """통화 코드 목록 -> 행렬 위치 배열 (종류가 몇 개뿐이라 고유값만 찾아 펼침, 모르는 통화는 기준 통화)"""
+        codes = np.asarray(currencies, dtype=object)
+        if not len(codes):
+            return np.zeros(0, dtype=np.intp)
+        uniques, inverse = np.unique(codes.astype(str), return_inverse=True)
+        return np.array([self.position(code) for code in uniques], dtype=np.intp)[inverse]
+
+    def factors(self, sources, target):
+        """행별 원래 통화 -> target 환율 배열 (sources가 통화 하나면 그 환율 하나)"""
+        if isinstance(sources, str):
+            return self.rate(sources, target)
+        return self.matrix[self.indexes(sources), self.position(target)]
+
+    def convert(self, values, sources, target):
+        """
+        금액 배열(n,) 또는 금액 열 묶음(n, k)을 행별 원래 통화에서 target으로 (반올림 없는 float).
+        여러 평가 컬럼을 한 번에 넘기면 환율 배열 하나를 열 방향으로 곱함
+        """
+        values = np.asarray(values, dtype=np.float64)
+        factors = np.asarray(self.factors(sources, target))
+        return values * (factors[:, np.newaxis] if values.ndim == 2 and factors.ndim else factors)
+
+    def convert_minor(self, values, sources, target):
+        """
+        convert와 같은 환산을 최소 단위 int64로: 원래 통화의 최소 단위로 한 번 반올림한 뒤 환율을 곱해
+        target 최소 단위로 반올림 (USD -> KRW는 usd_to_krw_array와 같은 값)
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        if isinstance(sources, str):
+            source_scales = self._scales[self.position(sources)]
+        else:
+            source_scales = self._scales[self.indexes(sources)]
+        factors = np.asarray(self.factors(sources, target)) * self._scales[self.position(target)] / source_scales
+        if values.ndim == 2 and np.ndim(factors):
+            source_scales, factors = source_scales[:, np.newaxis], factors[:, np.newaxis]
+        return scale_minor_array(scale_minor_array(values, source_scales), factors)
+
+    def convert_money(self, values, sources, target):
+        """convert_minor를 target 금액 float 배열로"""
+        return from_minor_array(self.convert_minor(values, sources, target), target)
+
+    def convert_units(self, units, source, target):
+        """최소 단위 정수 금액 하나를 target 최소 단위 정수로 (같은 통화면 그대로)"""
+        if source == target:
+            return int(units)
+        return int(self.convert_minor([from_minor(units, source)], source, target)[0])
+
+    def total(self, amounts, target):
+        """{통화: 금액} 합계를 target으로"""
+        return float(sum(amount * self.rate(currency, target) for currency, amount in amounts.items()))
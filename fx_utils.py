@@ -0,0 +1,206 @@
+from collections import Counter
+
+import numpy as np
+
+from currency_utils import BASE_CURRENCY, record_currency
+from money_utils import from_minor, scale_minor, to_minor, usd_to_krw, usd_to_krw_array
+
+FX_SYMBOL = "KRW=X"  # USD/KRW 일별 환율 (가격 이력 캐시에 종목처럼 보관)
+
+def record_days(records, date_key="날짜"):
+    """기록 날짜('YYYY-MM-DD ...') -> datetime64[D] 배열 (날짜가 없거나 잘못되면 NaT)"""
+    days = np.empty(len(records), dtype="datetime64[D]")
+    for row, record in enumerate(records):
+        try:
+            days[row] = np.datetime64(str(record.get(date_key, ""))[:10], "D")
+        except ValueError:
+            days[row] = np.datetime64("NaT")
+    return days
+
+def history_rates(daily_history):
+    """일별 히스토리에 기록된 날짜별 환율 {'YYYY-MM-DD': 환율} (시세 이력이 없는 날의 보조 값)"""
+    return {day: row["exchange_rate"] for day, row in daily_history.items() if row.get("exchange_rate")}
+
+class FxRateSeries:
+    """
+    날짜순 일별 USD/KRW 환율 (datetime64[D] 배열 + 환율 배열).
+    as-of 조회는 그 날짜 이전(포함) 가장 최근 환율 - 기록 전체를 searchsorted 한 번으로 조회
+    """
+
+    def __init__(self, days, rates):
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.rates = np.asarray(rates, dtype=np.float64)
+        # 파생 결과(기록별 환율, 원화 원가)를 다시 계산할지 판단하는 값 - 새 환율이 붙거나 바뀌면 달라짐
+        self.version = (len(self.days), str(self.days[-1]) if len(self.days) else None,
+                        float(self.rates.sum()) if len(self.rates) else 0.0)
+
+    @classmethod
+    def from_closes(cls, closes, points=None):
+        """가격 이력 캐시의 환율 종가 + 보조 환율 {'YYYY-MM-DD': 환율} (같은 날짜는 종가 우선)"""
+        merged = {str(day)[:10]: rate for day, rate in (points or {}).items()}
+        merged.update((day.strftime("%Y-%m-%d"), rate) for day, rate in closes.items())
+        days = sorted(day for day, rate in merged.items() if rate and np.isfinite(rate))
+        return cls(np.array(days, dtype="datetime64[D]"), [merged[day] for day in days])
+
+    def __len__(self):
+        return len(self.days)
+
+    def rates_as_of(self, days, fallback):
+        """
+        날짜 배열 각각의 as-of 환율. 첫 환율보다 이른 날짜는 첫 환율, 환율이 없거나 날짜가 NaT면 fallback
+        (NaT는 정렬상 맨 뒤라 마지막 환율이 되므로 따로 처리)
+        """
+        days = np.asarray(days, dtype="datetime64[D]")
+        if not len(self.days):
+            return np.full(len(days), fallback, dtype=np.float64)
+        positions = np.searchsorted(self.days, days, side="right") - 1
+        rates = self.rates[np.maximum(positions, 0)]
+        rates[np.isnat(days)] = fallback
+        return rates
+
+    def rate_as_of(self, day, fallback):
+        return float(self.rates_as_of([day], fallback)[0])
+
+class KrwCostBasis:
+    """
+    거래 내역을 각 거래일 환율로 재생한 원화 원가/실현손익 (평균단가 기준, 원 단위 정수로 누적).
+    매수는 그날 환율의 원화 금액을 원가에 더하고, 매도는 원화 평균 원가를 덜어 그날 환율의 매도 금액(수수료 제외)과
+    비교하므로 실현손익에 환차손익이 포함됨. RecordIndex처럼 같은 리스트에 추가된 거래만 재생하고,
+    리스트가 바뀌거나 환율 이력이 갱신되면(version) 처음부터 다시 계산.
+    실현손익 기록은 매도 거래와 시각이 몇 초 다를 수 있어 (거래일, 종목, 수량)의 같은 순번끼리 짝지음
+    (순번은 실현손익 기록 전체 기준으로 추가된 기록만 계산).
+    환율 이력은 USD/KRW뿐이라 USD 거래만 재생 (다른 통화 거래는 현재 교차 환율로 환산)
+    """
+
+    def __init__(self):
+        self._reset(None, None)
+        self._pnl_records = None
+        self._pnl_keys = []   # 실현손익 기록별 ((거래일, 종목, 수량), 같은 키 안의 순번)
+        self._pnl_seen = Counter()
+        self._pnl_last = None
+
+    def _reset(self, records, version):
+        self._records = records
+        self._version = version
+        self._last = None
+        self.count = 0
+        self._rates = np.empty(0, dtype=np.float64)  # 거래별 적용 환율 (앞 count개만 사용, 두 배씩 늘림)
+        self.quantity = {}    # 종목 -> 이력상 보유 수량
+        self.cost_won = {}    # 종목 -> 원화 원가 (원)
+        self.cost_usd = {}    # 종목 -> 달러 원가 (센트)
+        self.realized = {}    # (거래일, 종목, 수량) -> 매도 순서대로 [(원화 실현손익, 환차손익, 원화 원가) 또는 None] 원
+        self.realized_won = 0
+        self.fx_won = 0
+
+    def sync(self, records, series, fallback):
+        """거래 내역과 원화 원가를 맞춤, 새로 재생한 거래 수 반환"""
+        # 환율 이력이 없으면 모든 거래에 fallback(현재 환율)을 쓰므로 그 값도 기준에 포함
+        version = (series.version, None if len(series) else fallback)
+        if (records is not self._records or version != self._version or len(records) < self.count
+                or (self.count and records[self.count - 1] is not self._last)):
+            self._reset(records, version)
+        start = self.count
+        if start < len(records):
+            if len(records) > len(self._rates):
+                grown = np.empty(max(len(records), 2 * len(self._rates)), dtype=np.float64)
+                grown[:start] = self._rates[:start]
+                self._rates = grown
+            self._rates[start:len(records)] = series.rates_as_of(record_days(records[start:]), fallback)
+            for row in range(start, len(records)):
+                self._add(records[row], self._rates[row])
+        self.count = len(records)
+        self._last = records[-1] if records else None
+        return self.count - start
+
+    @property
+    def rates(self):
+        """거래별 적용 환율 (거래 내역과 같은 순서)"""
+        return self._rates[:self.count]
+
+    def _add(self, record, rate):
+        trade_type = record.get("거래유형")
+        if trade_type not in ("매수", "매도") or record_currency(record) != BASE_CURRENCY:
+            return
+        symbol = record.get("종목")
+        quantity = record.get("수량", 0) or 0
+        total_units = to_minor(record.get("총액", quantity * (record.get("가격", 0) or 0)))
+        total_won = usd_to_krw(from_minor(total_units), rate)
+        held = self.quantity.get(symbol, 0)
+        if trade_type == "매수":
+            self.quantity[symbol] = held + quantity
+            self.cost_won[symbol] = self.cost_won.get(symbol, 0) + total_won
+            self.cost_usd[symbol] = self.cost_usd.get(symbol, 0) + total_units
+            return
+        key = (str(record.get("날짜", ""))[:10], symbol, quantity)
+        if held <= 0:
+            self.realized.setdefault(key, []).append(None)
+            return
+        share = min(quantity, held) / held
+        removed_won = scale_minor(self.cost_won[symbol], share)
+        removed_usd = scale_minor(self.cost_usd[symbol], share)
+        self.quantity[symbol] = held - min(quantity, held)
+        self.cost_won[symbol] -= removed_won
+        self.cost_usd[symbol] -= removed_usd
+        if quantity > held:
+            # 이력보다 많이 파는 기록(가져오기 이전 보유분 등)은 가진 만큼 원가만 덜어내고, 실현손익은 짝짓지 않음
+            # (이력이 없는 매도처럼 None 자리만 남겨 같은 키의 뒤 매도 순번을 유지, realized_for가 기록의
+            # 달러 손익을 매도일 환율로 환산)
+            self.realized.setdefault(key, []).append(None)
+            return
+        commission_units = to_minor(record.get("수수료", 0))
+        realized_won = usd_to_krw(from_minor(total_units - commission_units), rate) - removed_won
+        # 같은 달러 손익을 매도일 환율로만 환산한 값과의 차이 = 매수일 이후 환율 변동 효과
+        fx_won = realized_won - usd_to_krw(from_minor(total_units - commission_units - removed_usd), rate)
+        self.realized.setdefault(key, []).append((realized_won, fx_won, removed_won))
+        self.realized_won += realized_won
+        self.fx_won += fx_won
+
+    def holding_cost(self, symbol, quantity):
+        """보유 종목의 원화 원가 (이력상 수량과 다르면 None - 이력이 일부만 있는 종목)"""
+        if self.quantity.get(symbol) != quantity:
+            return None
+        return self.cost_won.get(symbol)
+
+    def _sync_pnl(self, pnl_records):
+        """실현손익 기록별 매칭 키와 순번 (같은 리스트에 추가된 기록만 계산, 리스트가 바뀌면 처음부터)"""
+        count = len(self._pnl_keys)
+        if (pnl_records is not self._pnl_records or len(pnl_records) < count
+                or (count and pnl_records[count - 1] is not self._pnl_last)):
+            self._pnl_records, self._pnl_keys, self._pnl_seen = pnl_records, [], Counter()
+        for record in pnl_records[len(self._pnl_keys):]:
+            key = (str(record.get("날짜", ""))[:10], record.get("종목"), record.get("수량"))
+            self._pnl_keys.append((key, self._pnl_seen[key]))
+            self._pnl_seen[key] += 1
+        self._pnl_last = pnl_records[-1] if pnl_records else None
+
+    def realized_for(self, pnl_records, rows, series, fallback, fx=None):
+        """
+        실현손익 기록 전체(pnl_records) 중 rows 행(None이면 전체)의 (원화 실현손익, 환차손익, 판 수량의 원화 원가) 원 배열.
+        매도 거래를 찾지 못한 기록은 달러 금액을 그 기록 날짜의 환율로 환산하고 환차손익은 0
+        (USD가 아닌 기록은 fx의 현재 교차 환율)
+        """
+        self._sync_pnl(pnl_records)
+        rows = range(len(pnl_records)) if rows is None else list(rows)
+        won = np.zeros(len(rows), dtype=np.int64)
+        fx_won = np.zeros(len(rows), dtype=np.int64)
+        cost = np.zeros(len(rows), dtype=np.int64)
+        missing = []
+        for position, row in enumerate(rows):
+            key, occurrence = self._pnl_keys[row]
+            found = self.realized.get(key, ())
+            if occurrence < len(found) and found[occurrence] is not None:
+                won[position], fx_won[position], cost[position] = found[occurrence]
+            else:
+                missing.append(position)
+        if missing:
+            records = [pnl_records[rows[position]] for position in missing]
+            rates = series.rates_as_of(record_days(records), fallback)
+            amounts = np.array([(record.get("실현손익", 0) or 0, (record.get("매수가", 0) or 0) * (record.get("수량", 0) or 0))
+                                for record in records], dtype=np.float64)
+            converted = np.column_stack([usd_to_krw_array(amounts[:, 0], rates), usd_to_krw_array(amounts[:, 1], rates)])
+            currencies = [record_currency(record) for record in records]
+            foreign = np.array([currency != BASE_CURRENCY for currency in currencies])
+            if fx is not None and foreign.any():
+                converted[foreign] = fx.convert_minor(amounts[foreign], np.asarray(currencies)[foreign], "KRW")
+            won[missing], cost[missing] = converted[:, 0], converted[:, 1]
+        return won, fx_won, cost
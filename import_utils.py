@@ -0,0 +1,297 @@
+import csv
+import hashlib
+import io
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from currency_utils import BASE_CURRENCY, CURRENCY_KEY, FxMatrix, guess_currency, record_currency
+from ledger_utils import BUY, SELL, make_cash_event
+from money_utils import from_minor, round_money, to_minor
+from portfolio_utils import apply_current_price, build_realized_pnl_record, update_best_worst_trades
+
+IMPORT_CHUNK_ROWS = 5000   # 한 번에 읽어 정규화하는 행 수
+IMPORT_ERROR_LIMIT = 20    # 화면에 보여주는 건너뛴 행 사유 수
+
+# 거래 내역 필드 -> 증권사 내보내기 파일에서 찾는 헤더 이름 (대소문자/공백 무시)
+COLUMN_ALIASES = {
+    "날짜": ["날짜", "거래일", "거래일자", "체결일", "체결일자", "일자", "date", "trade date", "run date",
+           "activity date", "settlement date", "transaction date"],
+    "종목": ["종목", "종목코드", "티커", "symbol", "ticker"],
+    "거래유형": ["거래유형", "매매구분", "구분", "거래구분", "action", "side", "type", "transaction type",
+             "trans code"],
+    "수량": ["수량", "체결수량", "거래수량", "quantity", "qty", "shares"],
+    "가격": ["가격", "단가", "체결단가", "체결가", "price", "trade price", "price ($)"],
+    "수수료": ["수수료", "commission", "commissions", "fee", "fees", "fees & comm", "commission ($)"],
+}
+REQUIRED_COLUMNS = ["날짜", "종목", "거래유형", "수량", "가격"]
+# 거래유형 값 판별 (현금매수/YOU BOUGHT/Buy to open/B 등 증권사별 표기)
+BUY_PATTERN = r"매수|\bbuy\b|\bbought\b|^b$"
+SELL_PATTERN = r"매도|\bsell\b|\bsold\b|^s$"
+
+class ImportFormatError(Exception):
+    """거래 내역 파일에서 필요한 컬럼을 찾을 수 없음"""
+
+def _header_key(name):
+    return " ".join(str(name).strip().lower().split())
+
+def resolve_columns(columns):
+    """파일 헤더 -> {거래 필드: 파일 컬럼}, 필수 컬럼이 없으면 ImportFormatError"""
+    by_key = {_header_key(column): column for column in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_key:
+                mapping[field] = by_key[alias]
+                break
+    missing = [field for field in REQUIRED_COLUMNS if field not in mapping]
+    if missing:
+        raise ImportFormatError(f"필수 컬럼을 찾을 수 없습니다: {', '.join(missing)} (파일 컬럼: {', '.join(map(str, columns))})")
+    return mapping
+
+def _detect_encoding(file):
+    # 국내 증권사 CSV는 cp949가 많아 앞부분이 UTF-8로 읽히지 않으면 cp949로 처리
+    sample = file.read(65536)
+    file.seek(0)
+    try:
+        sample[:-4].decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp949"
+
+def _iter_excel_chunks(file, chunk_rows):
+    from openpyxl import load_workbook
+
+    # read_only 모드는 시트 전체를 메모리에 올리지 않고 행 단위로 읽음
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name) if name is not None else "" for name in header]
+        width = len(header)
+        buffer = []
+        for row in rows:
+            if any(value is not None for value in row):
+                buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=header).fillna("").astype(str)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header).fillna("").astype(str)
+    finally:
+        workbook.close()
+
+def iter_import_chunks(file, file_name, chunk_rows=IMPORT_CHUNK_ROWS):
+    """CSV/엑셀 파일을 chunk_rows행씩 문자열 DataFrame으로 읽음"""
+    if file_name.lower().endswith((".xlsx", ".xlsm")):
+        yield from _iter_excel_chunks(file, chunk_rows)
+        return
+    encoding = _detect_encoding(file)
+    text = io.TextIOWrapper(file, encoding=encoding, newline="")
+    try:
+        # 구분자(쉼표/탭/세미콜론)는 첫 줄로 판단
+        delimiter = csv.Sniffer().sniff(text.readline(), delimiters=",\t;").delimiter
+    except csv.Error:
+        delimiter = ","
+    text.seek(0)
+    try:
+        yield from pd.read_csv(text, sep=delimiter, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                               skipinitialspace=True)
+    finally:
+        text.detach()
+
+def _numbers(series):
+    # 숫자로 바로 읽히지 않는 값만 통화 기호/천 단위 구분자/괄호 음수 처리
+    values = pd.to_numeric(series, errors="coerce")
+    retry = values.isna() & (series.str.strip() != "")
+    if retry.any():
+        text = series[retry].str.strip()
+        negative = text.str.startswith("(") & text.str.endswith(")")
+        cleaned = pd.to_numeric(text.str.replace(r"[^\d.\-]", "", regex=True), errors="coerce")
+        values[retry] = cleaned.where(~negative, -cleaned)
+    return values
+
+def _by_unique(series, convert):
+    # 날짜/거래유형처럼 반복이 많은 컬럼은 고유값만 변환해 매핑
+    codes, uniques = pd.factorize(series)
+    converted = convert(pd.Series(uniques, dtype=object))
+    return pd.Series(converted.to_numpy()[codes], index=series.index)
+
+def _trade_types(uniques):
+    text = uniques.astype(str).str.strip().str.lower()
+    is_buy = text.str.contains(BUY_PATTERN, regex=True)
+    is_sell = text.str.contains(SELL_PATTERN, regex=True)
+    return pd.Series(np.select([is_buy & ~is_sell, is_sell & ~is_buy], ["매수", "매도"], ""))
+
+def _dates(uniques):
+    return pd.to_datetime(uniques.str.strip(), errors="coerce", format="mixed").dt.strftime("%Y-%m-%d %H:%M:%S")
+
+def normalize_chunk(frame, mapping, commission_rate):
+    """
+    원본 행 -> 정규화한 거래 DataFrame (날짜, 종목, 거래유형, 수량, 가격, 수수료)과 사유별 무효 행 수.
+    수량은 절댓값, 수수료 컬럼이 없거나 비어 있으면 거래금액 x commission_rate로 추정
+    """
+    trades = pd.DataFrame({
+        "날짜": _by_unique(frame[mapping["날짜"]], _dates),
+        "종목": _by_unique(frame[mapping["종목"]], lambda uniques: uniques.str.strip().str.upper()),
+        "거래유형": _by_unique(frame[mapping["거래유형"]], _trade_types),
+        "수량": _numbers(frame[mapping["수량"]]).abs(),
+        "가격": _numbers(frame[mapping["가격"]]).abs(),
+    })
+    estimated = trades["수량"] * trades["가격"] * commission_rate
+    if "수수료" in mapping:
+        trades["수수료"] = _numbers(frame[mapping["수수료"]]).abs().fillna(estimated)
+    else:
+        trades["수수료"] = estimated
+
+    problems = {
+        "날짜 오류": trades["날짜"].isna(),
+        "종목 없음": trades["종목"].isin(["", "NAN", "NONE"]),
+        # 배당/입출금 등 매매가 아닌 행
+        "매매 아님": trades["거래유형"] == "",
+        "수량/가격 오류": ~(trades["수량"] > 0) | ~(trades["가격"] > 0),
+    }
+    invalid = pd.Series(False, index=frame.index)
+    counts = Counter()
+    for reason, mask in problems.items():
+        counts[reason] = int((mask & ~invalid).sum())
+        invalid |= mask
+    return trades[~invalid], counts
+
+def transaction_key(date_text, symbol, trade_type, quantity, price):
+    """거래 한 건의 내용 해시 (같은 내용의 거래는 같은 키)"""
+    text = f"{str(date_text)[:19]}|{symbol}|{trade_type}|{float(quantity):g}|{float(price):.4f}"
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+class TransactionHashIndex:
+    """
+    거래 내역의 내용 해시별 건수 (중복 가져오기 방지용).
+    같은 리스트에 거래가 추가되면 새 거래만 해시하며, 같은 내용의 거래가 여러 건이면
+    파일 안에서 그 건수를 넘는 행만 새 거래로 봄
+    """
+
+    def __init__(self):
+        self._records = None
+        self._last = None
+        self.count = 0
+        self.counts = Counter()
+
+    def sync(self, records):
+        if (records is not self._records or len(records) < self.count
+                or (self.count and records[self.count - 1] is not self._last)):
+            self._records, self.count, self.counts = records, 0, Counter()
+        for record in records[self.count:]:
+            self.counts[transaction_key(record.get("날짜", ""), record.get("종목"), record.get("거래유형"),
+                                        record.get("수량", 0), record.get("가격", 0))] += 1
+        self.count = len(records)
+        self._last = records[-1] if records else None
+        return self
+
+def read_broker_file(file, file_name, index, commission_rate, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    파일을 청크 단위로 읽어 정규화/중복 제거한 새 거래 목록(날짜순)과 통계 반환.
+    index는 기존 거래 내역으로 동기화한 TransactionHashIndex (가져온 거래는 반영하지 않음)
+    """
+    seen = Counter()
+    trades = []
+    stats = Counter()
+    mapping = None
+    for frame in iter_import_chunks(file, file_name, chunk_rows):
+        if mapping is None:
+            mapping = resolve_columns(frame.columns)
+        stats["읽은 행"] += len(frame)
+        normalized, invalid = normalize_chunk(frame, mapping, commission_rate)
+        stats.update(invalid)
+        for row in normalized.itertuples(index=False):
+            key = transaction_key(row.날짜, row.종목, row.거래유형, row.수량, row.가격)
+            seen[key] += 1
+            if seen[key] <= index.counts.get(key, 0):
+                stats["중복"] += 1
+                continue
+            trades.append((row.날짜, row.종목, row.거래유형, float(row.수량), float(row.가격), float(row.수수료)))
+    if mapping is None:
+        raise ImportFormatError("거래 내역이 없는 파일입니다.")
+    # 같은 날짜 안에서는 파일 순서 유지 (안정 정렬)
+    trades.sort(key=lambda trade: trade[0])
+    return trades, stats
+
+def replay_trades(state, trades, exchange_rate, update_cash=True, fx=None):
+    """
+    정규화한 거래를 날짜순으로 보유 종목/거래 내역/실현손익/수수료/현금 원장에 한 번에 반영.
+    state는 st.session_state와 같은 키를 가진 mapping, 보유 수량보다 많은 매도는 건너뜀.
+    반영한 거래 수와 건너뛴 거래 설명 목록 반환. 금액 합계(수수료/현금)는 센트 정수로 누적.
+    거래 통화는 보유 종목의 통화(새 종목은 거래소 접미사로 추정), USD가 아닌 거래의 현금/수수료는 fx(FxMatrix,
+    없으면 exchange_rate와 기본 환율)로 USD 환산
+    """
+    fx = fx or FxMatrix({"KRW": exchange_rate})
+    holdings = {stock["종목"]: stock for stock in state["stocks"]}
+    last_prices = {}  # 수익/수익률은 마지막에 바뀐 종목만 한 번 재계산
+    applied = 0
+    skipped = []
+    commission_units = to_minor(state["total_commission"])
+    cash_units = to_minor(state["cash_amount"])
+    for date_text, symbol, trade_type, quantity, price, commission in trades:
+        quantity = int(quantity) if float(quantity).is_integer() else quantity
+        stock = holdings.get(symbol)
+        currency = record_currency(stock) if stock is not None else guess_currency(symbol)
+        total_units = to_minor(quantity * price, currency)
+        fee_units = to_minor(commission, currency)
+        if trade_type == "매수":
+            if stock is None:
+                stock = holdings[symbol] = {"종목": symbol, "수량": quantity, "매수단가": price, CURRENCY_KEY: currency}
+                state["stocks"].append(stock)
+            else:
+                total_quantity = stock["수량"] + quantity
+                stock["매수단가"] = round_money(
+                    (stock["수량"] * stock["매수단가"] + from_minor(total_units, currency)) / total_quantity, currency)
+                stock["수량"] = total_quantity
+            last_prices[symbol] = price
+            transaction = {
+                "날짜": date_text, "종목": symbol, "거래유형": "매수", "수량": quantity, "가격": price,
+                "총액": from_minor(total_units, currency), "수수료": from_minor(fee_units, currency),
+                "실제비용": from_minor(total_units + fee_units, currency)
+            }
+            cash_change_units = -(total_units + fee_units)
+            kind = BUY
+        else:
+            if stock is None or stock["수량"] < quantity:
+                held = stock["수량"] if stock else 0
+                skipped.append(f"{date_text[:10]} {symbol} 매도 {quantity}주 (보유 {held}주)")
+                continue
+            pnl_record = build_realized_pnl_record(date_text, symbol, quantity, stock["매수단가"], price, commission, currency)
+            state["realized_pnl"].append(pnl_record)
+            update_best_worst_trades(state["best_worst_trades"], pnl_record)
+            if stock["수량"] == quantity:
+                state["stocks"].remove(stock)
+                del holdings[symbol]
+            else:
+                stock["수량"] -= quantity
+                last_prices[symbol] = price
+            transaction = {
+                "날짜": date_text, "종목": symbol, "거래유형": "매도", "수량": quantity, "가격": price,
+                "총액": from_minor(total_units, currency), "수수료": from_minor(fee_units, currency),
+                "실제수익": from_minor(total_units - fee_units, currency)
+            }
+            cash_change_units = total_units - fee_units
+            kind = SELL
+        if currency != BASE_CURRENCY:
+            transaction[CURRENCY_KEY] = currency
+        state["transactions"].append(transaction)
+        # 현금/누적 수수료는 USD로 기록
+        commission_units += fx.convert_units(fee_units, currency, BASE_CURRENCY)
+        cash_change_units = fx.convert_units(cash_change_units, currency, BASE_CURRENCY)
+        if update_cash:
+            state["cash_ledger"].append(make_cash_event(kind, from_minor(cash_change_units), date_text, exchange_rate, symbol))
+            cash_units += cash_change_units
+        applied += 1
+    # 새로 편입한 종목의 현재가는 가격 갱신 전까지 마지막 거래 가격으로 둠
+    for symbol, price in last_prices.items():
+        stock = holdings.get(symbol)
+        if stock is not None:
+            apply_current_price(stock, stock.get("현재가", price))
+    state["total_commission"] = from_minor(commission_units)
+    state["cash_amount"] = from_minor(cash_units)
+    return applied, skipped
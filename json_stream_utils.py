@@ -0,0 +1,222 @@
+import io
+import json
+import re
+from operator import methodcaller
+
+STREAM_CHUNK_CHARS = 1 << 16      # 한 번에 읽는 문자 수
+MAX_RECORD_CHARS = 1 << 20        # 레코드 한 건이 이보다 길어도 끝나지 않으면 손상으로 판단
+
+NUMBER = (int, float)
+SCHEMA_TYPES = {str: {str}, NUMBER: {int, float}}  # 스키마 타입 -> 허용하는 실제 타입 (bool 제외)
+# 레코드 목록 섹션 -> 레코드마다 반드시 있어야 하는 필드와 타입
+RECORD_SCHEMAS = {
+    "stocks": {"종목": str, "수량": NUMBER, "매수단가": NUMBER, "현재가": NUMBER},
+    "transactions": {"날짜": str, "종목": str, "거래유형": str, "수량": NUMBER, "가격": NUMBER},
+    "realized_pnl": {"날짜": str, "종목": str, "실현손익": NUMBER},
+    "cash_ledger": {"유형": str, "금액": NUMBER},
+}
+# 그 밖의 섹션 -> 타입
+VALUE_TYPES = {
+    "cash": NUMBER,
+    "total_commission": NUMBER,
+    "exchange_rate": NUMBER,
+    "currency_mode": str,
+    "target_settings": dict,
+    "stock_memos": dict,
+    "best_worst_trades": dict,
+    "checksums": dict,
+    "backup_timestamp": NUMBER,
+    "last_updated": str,
+    "version": NUMBER,
+}
+REQUIRED_SECTIONS = ["stocks", "cash", "transactions"]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+class CorruptDataError(Exception):
+    """JSON 백업이 깨졌거나 구조가 올바르지 않음 (읽은 위치/섹션 포함, sections: 손상 전까지 온전히 읽은 섹션)"""
+    sections = None
+
+def _is_type(value, expected):
+    # bool은 int의 하위 타입이지만 숫자 필드로 받지 않음
+    return type(value) in SCHEMA_TYPES[expected] if expected in SCHEMA_TYPES else isinstance(value, expected)
+
+def check_records(section, records, start=0):
+    """레코드 묶음이 섹션 스키마에 맞는지 검사 (틀린 첫 레코드 위치와 함께 CorruptDataError)"""
+    schema = RECORD_SCHEMAS[section]
+    fields = [(field, methodcaller("get", field)) for field in schema]
+    # 묶음 전체를 타입 집합으로 먼저 확인하고, 틀렸을 때만 한 건씩 찾음
+    if not set(map(type, records)) - {dict} and all(
+            not set(map(type, map(getter, records))) - SCHEMA_TYPES[schema[field]] for field, getter in fields):
+        return
+    for row, record in enumerate(records):
+        if type(record) is not dict:
+            raise CorruptDataError(f"{section}[{start + row}]: 객체가 아닙니다")
+        for field, expected in schema.items():
+            if type(record.get(field)) not in SCHEMA_TYPES[expected]:
+                raise CorruptDataError(f"{section}[{start + row}]: '{field}' 필드가 없거나 형식이 다릅니다")
+
+class _StreamReader:
+    # 파일을 STREAM_CHUNK_CHARS씩 읽으면서 JSON 값 하나씩 해석 (읽은 부분은 버퍼에서 버림)
+    def __init__(self, text_file, chunk_chars):
+        self.file = text_file
+        self.chunk_chars = chunk_chars
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0  # 버퍼 시작 위치의 파일 내 문자 위치
+        self.eof = False
+        self.scan = json.scanner.make_scanner(json.JSONDecoder())
+
+    def fill(self, size=0):
+        if self.pos > self.chunk_chars:
+            self.offset += self.pos
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(max(size, self.chunk_chars))
+        if chunk:
+            self.buffer += chunk
+        else:
+            self.eof = True
+
+    def position(self):
+        return self.offset + self.pos
+
+    def peek(self):
+        """공백을 건너뛴 다음 문자 (파일 끝이면 빈 문자열)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise CorruptDataError(f"위치 {self.position()}: '{chars}'가 필요하지만 '{char or '파일 끝'}'입니다")
+        self.pos += 1
+        return char
+
+    def value(self, max_chars=None):
+        self.peek()
+        while True:
+            try:
+                value, end = self.scan(self.buffer, self.pos)
+            except StopIteration as e:
+                error = CorruptDataError(f"위치 {self.offset + e.value}: JSON 값이 필요합니다")
+            except json.JSONDecodeError as e:
+                error = CorruptDataError(f"위치 {self.offset + e.pos}: {e.msg}")
+            else:
+                # 숫자가 버퍼 끝에 걸리면 뒤에 자릿수가 더 있을 수 있음
+                if end < len(self.buffer) or self.eof or not _is_type(value, NUMBER):
+                    self.pos = end
+                    return value
+                error = None
+            # 버퍼 끝에서 잘린 값이면 더 읽어서 재시도, 파일 끝이거나 max_chars보다 길면 손상
+            if error is not None and (self.eof or (max_chars is not None and len(self.buffer) - self.pos > max_chars)):
+                raise error
+            # 큰 값(target_settings 등)은 읽는 양을 두 배씩 늘려 재시도 횟수를 줄임
+            self.fill(len(self.buffer) - self.pos)
+
+    def records(self, max_chars):
+        """'[' 다음부터 배열 원소를 묶음(리스트)으로 돌려줌 (']'까지 소비)"""
+        while True:
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            # 버퍼에 있는 완전한 레코드들은 한 번에 해석: 마지막 '},'까지 잘라 배열로 감싸서 성공하면
+            # 그 구간은 레코드 경계가 맞음 (문자열/중첩 객체 안에서 잘렸으면 실패하고 한 건씩 읽음)
+            cut = self.buffer.rfind("},", self.pos, self.pos + 2 * self.chunk_chars)
+            if cut > self.pos:
+                batch_text = "[" + self.buffer[self.pos:cut + 1] + "]"
+                try:
+                    batch, end = self.scan(batch_text, 0)
+                except (StopIteration, json.JSONDecodeError):
+                    batch, end = None, 0
+                if end == len(batch_text):
+                    yield batch
+                    self.pos = cut + 2
+                    continue
+                if end:
+                    # 감싼 '['가 중간에서 닫혔으면 배열이 그 안에서 끝난 것 (뒤의 '},'는 다음 섹션)
+                    yield batch
+                    self.pos += end - 1
+                    return
+            yield [self.value(max_chars)]
+            if self.expect(",]") == "]":
+                return
+
+def _stream_object(reader, sections, until=None):
+    # until이 주어지면 그 안에 없는 키를 만났을 때 멈춤 (앞부분 헤더만 읽기)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value(MAX_RECORD_CHARS)
+        if not isinstance(key, str):
+            raise CorruptDataError(f"위치 {reader.position()}: 키가 문자열이 아닙니다")
+        if until is not None and key not in until:
+            return
+        reader.expect(":")
+        schema = RECORD_SCHEMAS.get(key)
+        if schema is not None and reader.peek() == "[":
+            # 레코드 목록은 버퍼 단위 묶음으로 읽어 바로 검사 후 섹션 리스트에 추가 (손상된 묶음에서 바로 중단)
+            section = []
+            reader.pos += 1
+            for records in reader.records(MAX_RECORD_CHARS):
+                check_records(key, records, len(section))
+                section.extend(records)
+            sections[key] = section
+        else:
+            value = reader.value()
+            expected = VALUE_TYPES.get(key, list if schema is not None else None)
+            if expected is not None and not _is_type(value, expected):
+                raise CorruptDataError(f"'{key}' 섹션의 형식이 올바르지 않습니다")
+            sections[key] = value
+        if reader.expect(",}") == "}":
+            return
+
+def load_portfolio_stream(file, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    포트폴리오 JSON을 조금씩 읽으며 구조를 검사해 저장 데이터와 같은 dict로 반환.
+    file은 경로, 텍스트 파일 또는 바이너리 파일(업로드 파일 등)이며 파일 전체 문자열을 만들지 않음.
+    문법 오류/필수 섹션 누락/레코드 형식 오류를 만나면 그 자리에서 CorruptDataError
+    """
+    if isinstance(file, str):
+        with open(file, "r", encoding="utf-8") as text_file:
+            return load_portfolio_stream(text_file, chunk_chars)
+    if not isinstance(file, io.TextIOBase):
+        text_file = io.TextIOWrapper(file, encoding="utf-8-sig")
+        try:
+            return load_portfolio_stream(text_file, chunk_chars)
+        finally:
+            # 호출한 쪽의 파일은 닫지 않음
+            text_file.detach()
+
+    sections = {}
+    reader = _StreamReader(file, chunk_chars)
+    try:
+        _stream_object(reader, sections)
+        if reader.peek():
+            raise CorruptDataError(f"위치 {reader.position()}: JSON 뒤에 다른 내용이 있습니다")
+        missing = [key for key in REQUIRED_SECTIONS if key not in sections]
+        if missing:
+            raise CorruptDataError(f"필수 섹션이 없습니다: {', '.join(missing)}")
+    except UnicodeDecodeError as e:
+        error = CorruptDataError(f"UTF-8 파일이 아닙니다: {e}")
+        error.sections = sections
+        raise error from None
+    except CorruptDataError as e:
+        e.sections = sections
+        raise
+    return sections
+
+def read_stream_header(file_path, keys, chunk_chars=STREAM_CHUNK_CHARS):
+    """파일 맨 앞에서 keys에 속한 섹션만 연속으로 읽음 (다른 키를 만나면 중단, 손상되면 CorruptDataError)"""
+    sections = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        try:
+            _stream_object(_StreamReader(f, chunk_chars), sections, set(keys))
+        except UnicodeDecodeError as e:
+            raise CorruptDataError(f"UTF-8 파일이 아닙니다: {e}") from None
+    return sections
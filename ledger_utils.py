@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from money_utils import from_minor, from_minor_array, round_money, scale_minor, to_minor
+
+DEPOSIT = "입금"
+WITHDRAWAL = "출금"
+BUY = "매수"
+SELL = "매도"
+OPENING = "기초잔액"
+EXTERNAL_TYPES = (DEPOSIT, WITHDRAWAL)  # 수익률 계산에서 외부 현금흐름으로 보는 유형
+CASH_TOLERANCE = 0.01                  # 현금 입력값 변경으로 보지 않는 소수점 오차
+EARLIEST = np.datetime64(0, "s")        # 날짜를 읽을 수 없는 이벤트는 잔액 조회에서 가장 앞에 둠
+
+def make_cash_event(kind, amount, timestamp, exchange_rate, symbol=None):
+    """현금 변동 이벤트 한 건 (금액은 부호 포함 USD 센트 단위, 환율은 발생 시점 값)"""
+    event = {"날짜": timestamp, "유형": kind, "금액": round_money(amount), "환율": exchange_rate}
+    if symbol:
+        event["종목"] = symbol
+    return event
+
+def cash_adjustment_event(current_cash, new_cash, timestamp, exchange_rate):
+    """보유 현금 입력값 변경 -> 입금/출금 이벤트 (변화가 오차 이내면 None)"""
+    change = new_cash - current_cash
+    if abs(change) <= CASH_TOLERANCE:
+        return None
+    return make_cash_event(DEPOSIT if change > 0 else WITHDRAWAL, change, timestamp, exchange_rate)
+
+def opening_ledger(cash, timestamp, exchange_rate):
+    """원장이 없던 기존 데이터용 - 현재 현금을 기초잔액 이벤트 하나로 기록"""
+    return [make_cash_event(OPENING, cash, timestamp, exchange_rate)] if cash else []
+
+def _parse_times(date_texts):
+    return pd.to_datetime(pd.Series(date_texts, dtype=object).str[:19], errors="coerce").to_numpy(dtype="datetime64[s]")
+
+class CashLedger:
+    """
+    뒤에 추가만 되는 현금 이벤트 목록의 인덱스.
+    잔액/순입금액은 이벤트가 추가될 때 갱신하고, 시점 조회(as-of)용 누적합 배열은
+    새 이벤트가 생긴 뒤 첫 조회 때 한 번만 만들어 이진 탐색으로 답함 (날짜 파싱은 새 이벤트분만).
+    금액은 센트(원화 환산은 원) 정수로 더하므로 이벤트가 많아도 합계에 오차가 쌓이지 않음.
+    같은 리스트에 이벤트가 추가되면 새 이벤트만 색인 (리스트가 교체되거나 줄면 전체 재구성).
+    """
+
+    def __init__(self, fallback_rate=1320.0):
+        self.fallback_rate = fallback_rate
+        self._reset(None)
+
+    def _reset(self, events):
+        self._events = events
+        self._last = None
+        self.count = 0
+        self.balance = 0.0
+        self.net_deposits = 0.0
+        self.net_deposits_krw = 0.0  # 각 입출금 시점 환율로 환산한 합계
+        self._balance_units = 0      # 위 세 합계의 정수(센트/원) 누적
+        self._deposit_units = 0
+        self._deposit_won = 0
+        self.balances = []   # 기록 순서 기준 각 이벤트 직후 잔액
+        self._dates = []
+        self._times = np.empty(0, dtype="datetime64[s]")
+        self._amounts = []   # 센트
+        self._won = []       # 입출금의 이벤트 시점 원화 환산액 (원)
+        self._external = []
+        self._prefix = None
+
+    def sync(self, events):
+        """이벤트 리스트와 인덱스를 맞춤, 새로 색인한 이벤트 수 반환"""
+        if (events is not self._events or len(events) < self.count
+                or (self.count and events[self.count - 1] is not self._last)):
+            self._reset(events)
+        start = self.count
+        for event in events[start:]:
+            self._add(event)
+        self.count = len(events)
+        self._last = events[-1] if events else None
+        if self.count != start:
+            self._prefix = None
+        return self.count - start
+
+    def _add(self, event):
+        units = to_minor(event.get("금액", 0))
+        external = event.get("유형") in EXTERNAL_TYPES
+        won = scale_minor(units, (event.get("환율") or self.fallback_rate) / 100) if external else 0
+        self._balance_units += units
+        self.balance = from_minor(self._balance_units)
+        if external:
+            self._deposit_units += units
+            self._deposit_won += won
+            self.net_deposits = from_minor(self._deposit_units)
+            self.net_deposits_krw = float(self._deposit_won)
+        self.balances.append(self.balance)
+        self._dates.append(str(event.get("날짜", "")))
+        self._amounts.append(units)
+        self._won.append(won)
+        self._external.append(external)
+
+    def _prefix_arrays(self):
+        """(원장 시작 시각, 시간순 이벤트 시각, 누적 잔액, 누적 입출금 USD, 누적 입출금 원화) - 누적합은 앞에 0을 붙임"""
+        if self._prefix is None:
+            if len(self._times) < self.count:
+                self._times = np.concatenate([self._times, _parse_times(self._dates[len(self._times):])])
+            known = ~np.isnat(self._times)
+            # 날짜를 알 수 있는 첫 이벤트부터 원장이 기록된 것으로 봄
+            start = self._times[known].min() if known.any() else None
+            times = np.where(known, self._times, EARLIEST)
+            amounts = np.array(self._amounts, dtype=np.int64)
+            won = np.array(self._won, dtype=np.int64)
+            external = np.array(self._external, dtype=bool)
+            if np.any(times[1:] < times[:-1]):
+                order = np.argsort(times, kind="stable")
+                times, amounts, won, external = times[order], amounts[order], won[order], external[order]
+            flows = np.where(external, amounts, 0)
+            # 누적합은 정수로 구한 뒤 한 번만 금액으로 바꿈
+            self._prefix = (
+                start,
+                times,
+                from_minor_array(np.concatenate([[0], np.cumsum(amounts)])),
+                from_minor_array(np.concatenate([[0], np.cumsum(flows)])),
+                from_minor_array(np.concatenate([[0], np.cumsum(won)]), "KRW"),
+            )
+        return self._prefix
+
+    def start_time(self):
+        """원장이 시작된 시각 (이벤트가 없으면 None)"""
+        if not self.count:
+            return None
+        return self._prefix_arrays()[0]
+
+    def balance_as_of(self, when):
+        """when(포함) 시점의 현금 잔액"""
+        _, times, balances, _, _ = self._prefix_arrays()
+        return float(balances[np.searchsorted(times, np.datetime64(when, "s"), side="right")])
+
+    def deposits_as_of(self, when, currency_mode="USD"):
+        """when(포함)까지의 누적 순입금액 - 원화는 각 이벤트 시점 환율로 환산"""
+        _, times, _, deposits_usd, deposits_krw = self._prefix_arrays()
+        deposits = deposits_krw if currency_mode == "KRW" else deposits_usd
+        return float(deposits[np.searchsorted(times, np.datetime64(when, "s"), side="right")])
+
+    def flows_by_date(self, dates, currency_mode="USD"):
+        """
+        기록 날짜별 입출금 합계 (직전 기록 날짜 다음 날 ~ 해당 날짜 끝, 첫 기록은 0)와
+        그 구간 전체가 원장 시작 이후인지 여부를 함께 반환
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        flows = np.zeros(len(dates))
+        covered = np.zeros(len(dates), dtype=bool)
+        if not self.count or len(dates) == 0:
+            return flows, covered
+        start, times, _, deposits_usd, deposits_krw = self._prefix_arrays()
+        if start is None:
+            return flows, covered
+        deposits = deposits_krw if currency_mode == "KRW" else deposits_usd
+        day_ends = (dates + np.timedelta64(1, "D")).astype("datetime64[s]")
+        cumulative = deposits[np.searchsorted(times, day_ends, side="left")]
+        flows[1:] = np.diff(cumulative)
+        covered[1:] = day_ends[:-1] > start
+        return flows, covered
+
+    def recent(self, limit=20):
+        """최근 limit개 이벤트 (잔액 포함, 최신순)"""
+        start = max(0, self.count - limit)
+        return [{**self._events[row], "잔액": round(self.balances[row], 2)}
+                for row in range(self.count - 1, start - 1, -1)]
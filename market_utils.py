@@ -0,0 +1,249 @@
+import json
+import os
+from datetime import date, datetime, time as dt_time, timedelta
+from functools import lru_cache
+
+import pytz
+
+NY_TZ = pytz.timezone('America/New_York')
+KST = pytz.timezone('Asia/Seoul')
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+EARLY_CLOSE = dt_time(13, 0)
+FX_WEEK_CLOSE = dt_time(17, 0)  # 외환시장: 금 17:00 ET 마감 ~ 일 17:00 ET 개장
+
+# 규칙으로 계산되지 않는 임시 휴장일
+SPECIAL_CLOSURES = {
+    date(2018, 12, 5),  # 부시 전 대통령 국장
+    date(2025, 1, 9),   # 카터 전 대통령 국장
+}
+
+QUOTE_REFRESH_INTERVAL = 60   # 장중 시세 재조회 최소 간격 (초)
+FX_REFRESH_INTERVAL = 600     # 환율 재조회 최소 간격 (초)
+CLOSE_SETTLE_MINUTES = 15     # 마감 후 종가 확정까지 대기 (분)
+
+def now_in_new_york(now=None):
+    """현재 시각(또는 tz-aware now)을 뉴욕 시간으로 변환"""
+    if now is None:
+        return datetime.now(NY_TZ)
+    return now.astimezone(NY_TZ)
+
+def to_kst(moment):
+    return moment.astimezone(KST)
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def _nth_weekday(year, month, weekday, n):
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+def _last_weekday(year, month, weekday):
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day):
+    # 토요일 휴일은 금요일, 일요일 휴일은 월요일에 휴장
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=64)
+def us_market_holidays(year):
+    """NYSE 정규 휴장일 집합"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),     # 마틴 루터 킹 데이
+        _nth_weekday(year, 2, 0, 3),     # 대통령의 날
+        _easter(year) - timedelta(days=2),  # 성금요일
+        _last_weekday(year, 5, 0),       # 메모리얼 데이
+        _observed(date(year, 7, 4)),     # 독립기념일
+        _nth_weekday(year, 9, 0, 1),     # 노동절
+        _nth_weekday(year, 11, 3, 4),    # 추수감사절
+        _observed(date(year, 12, 25)),   # 크리스마스
+    }
+    # 신정이 토요일이면 전년도 12/31은 휴장하지 않음
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # 준틴스
+    holidays.update(day for day in SPECIAL_CLOSURES if day.year == year)
+    return frozenset(holidays)
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in us_market_holidays(day.year)
+
+@lru_cache(maxsize=64)
+def early_close_days(year):
+    """13:00 ET 조기 마감일 (독립기념일 전날, 추수감사절 다음날, 크리스마스 이브)"""
+    candidates = [
+        date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+        date(year, 12, 24),
+    ]
+    return frozenset(day for day in candidates if is_trading_day(day))
+
+def market_session(day):
+    """해당 날짜의 (개장, 마감) 뉴욕 시각, 휴장일이면 None"""
+    if not is_trading_day(day):
+        return None
+    close = EARLY_CLOSE if day in early_close_days(day.year) else MARKET_CLOSE
+    return (NY_TZ.localize(datetime.combine(day, MARKET_OPEN)),
+            NY_TZ.localize(datetime.combine(day, close)))
+
+def is_us_market_open(now=None):
+    """미국 정규장 개장 여부 (휴장일/조기 마감 반영)"""
+    ny_now = now_in_new_york(now)
+    session = market_session(ny_now.date())
+    return session is not None and session[0] <= ny_now < session[1]
+
+def next_market_open(now=None):
+    """다음 정규장 개장 시각 (장중이면 다음 거래일 개장)"""
+    ny_now = now_in_new_york(now)
+    day = ny_now.date()
+    for _ in range(15):
+        session = market_session(day)
+        if session is not None and session[0] > ny_now:
+            return session[0]
+        day += timedelta(days=1)
+    raise ValueError("15일 안에 거래일이 없습니다")
+
+def previous_market_close(now=None):
+    """now 이전에 끝난 가장 최근 정규장 (마감 시각, 거래일)"""
+    ny_now = now_in_new_york(now)
+    day = ny_now.date()
+    for _ in range(15):
+        session = market_session(day)
+        if session is not None and session[1] <= ny_now:
+            return session[1], day
+        day -= timedelta(days=1)
+    raise ValueError("15일 안에 거래일이 없습니다")
+
+def is_fx_market_open(now=None):
+    """외환시장(24/5) 개장 여부"""
+    ny_now = now_in_new_york(now)
+    weekday, now_time = ny_now.weekday(), ny_now.time()
+    if weekday == 5:
+        return False
+    if weekday == 4:
+        return now_time < FX_WEEK_CLOSE
+    if weekday == 6:
+        return now_time >= FX_WEEK_CLOSE
+    return True
+
+def previous_fx_close(now=None):
+    """가장 최근 외환시장 주간 마감 (금 17:00 ET)"""
+    ny_now = now_in_new_york(now)
+    friday = ny_now.date() - timedelta(days=(ny_now.weekday() - 4) % 7)
+    close = NY_TZ.localize(datetime.combine(friday, FX_WEEK_CLOSE))
+    return close if close <= ny_now else close - timedelta(days=7)
+
+class RefreshScheduler:
+    """시세/환율 재조회 시점과 장 마감 스냅샷 여부 판단 (마지막 조회 기록은 JSON 파일에 보관)"""
+
+    def __init__(self, state_file, quote_interval=QUOTE_REFRESH_INTERVAL, fx_interval=FX_REFRESH_INTERVAL):
+        self.state_file = state_file
+        self.quote_interval = quote_interval
+        self.fx_interval = fx_interval
+        self.state = self._load()
+
+    def _load(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except:
+                pass
+        return {}
+
+    def _save(self):
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.state_file)
+
+    def _settled_close(self, now):
+        close, day = previous_market_close(now)
+        return close + timedelta(minutes=CLOSE_SETTLE_MINUTES), day
+
+    # 시세
+    def quotes_due(self, now=None):
+        """시세를 다시 조회해야 하는지 (장 마감 후 종가를 이미 받았으면 False)"""
+        ny_now = now_in_new_york(now)
+        last = self.state.get("last_quote_fetch")
+        if last is None:
+            return True
+        settled, _ = self._settled_close(ny_now)
+        if is_us_market_open(ny_now) or ny_now < settled:
+            return ny_now.timestamp() - last >= self.quote_interval
+        return last < settled.timestamp()
+
+    def next_quote_fetch(self, now=None):
+        """다음 시세 조회 예정 시각 (뉴욕 시간)"""
+        ny_now = now_in_new_york(now)
+        if self.quotes_due(ny_now):
+            return ny_now
+        settled, _ = self._settled_close(ny_now)
+        if is_us_market_open(ny_now) or ny_now < settled:
+            return now_in_new_york(datetime.fromtimestamp(self.state["last_quote_fetch"] + self.quote_interval, NY_TZ))
+        return next_market_open(ny_now)
+
+    def mark_quotes_fetched(self, now=None):
+        self.state["last_quote_fetch"] = now_in_new_york(now).timestamp()
+        self._save()
+
+    # 환율
+    def fx_due(self, now=None):
+        ny_now = now_in_new_york(now)
+        last = self.state.get("last_fx_fetch")
+        if last is None or self.state.get("last_fx_rate") is None or "last_fx_rates" not in self.state:
+            return True
+        if is_fx_market_open(ny_now):
+            return ny_now.timestamp() - last >= self.fx_interval
+        return last < previous_fx_close(ny_now).timestamp()
+
+    def cached_fx_rate(self):
+        return self.state.get("last_fx_rate")
+
+    def cached_fx_rates(self):
+        """마지막으로 조회한 통화별 1달러당 환율 (통화별 조회 전 기록은 원화 환율만)"""
+        rates = dict(self.state.get("last_fx_rates") or {})
+        if self.state.get("last_fx_rate") is not None:
+            rates.setdefault("KRW", self.state["last_fx_rate"])
+        return rates
+
+    def mark_fx_fetched(self, rate, now=None, rates=None):
+        self.state["last_fx_fetch"] = now_in_new_york(now).timestamp()
+        self.state["last_fx_rate"] = rate
+        if rates is not None:
+            self.state["last_fx_rates"] = rates
+        self._save()
+
+    # 장 마감 스냅샷
+    def eod_snapshot_due(self, now=None):
+        """종가 확정 후 아직 스냅샷을 찍지 않은 거래일 (없으면 None)"""
+        ny_now = now_in_new_york(now)
+        settled, day = self._settled_close(ny_now)
+        if ny_now < settled:
+            # 마감 직후 종가 확정 전이면 그 이전 거래일 기준
+            _, day = previous_market_close(settled - timedelta(minutes=CLOSE_SETTLE_MINUTES, seconds=1))
+        if self.state.get("last_eod_session") == day.isoformat():
+            return None
+        return day
+
+    def mark_eod_snapshot(self, session_day):
+        self.state["last_eod_session"] = session_day.isoformat()
+        self._save()
@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+
+MINOR_DIGITS = {"USD": 2, "KRW": 0, "JPY": 0, "EUR": 2}  # 통화별 최소 단위 자릿수 (센트 / 원 / 엔 / 유로센트)
+ROUNDING_TOLERANCE = 1e-6            # 최소 단위 기준 이진 소수 오차 (1.005 * 100 = 100.4999...를 100.5로 봄)
+
+# 반올림 규칙: 모든 금액은 최소 단위 정수로 바꿀 때 한 번만, 0.5는 0에서 먼 쪽으로 (ROUND_HALF_UP, 부호 대칭).
+# 합계/누적은 정수로만 더하고 저장/표시할 때 float로 바꿈 (소수 둘째 자리까지라 JSON에 그대로 기록됨)
+
+def minor_scale(currency="USD"):
+    return 10 ** MINOR_DIGITS[currency]
+
+def _round_half_up(value):
+    units = math.floor(abs(value) + 0.5 + ROUNDING_TOLERANCE)
+    return -units if value < 0 else units
+
+def to_minor(amount, currency="USD"):
+    """금액 -> 최소 단위 정수 (None은 0)"""
+    return _round_half_up(float(amount or 0) * minor_scale(currency))
+
+def from_minor(units, currency="USD"):
+    """최소 단위 정수 -> 저장/표시용 float"""
+    return int(units) / minor_scale(currency)
+
+def round_money(amount, currency="USD"):
+    """금액을 최소 단위로 반올림한 float (round(amount, 2)와 달리 1.005 -> 1.01)"""
+    return from_minor(to_minor(amount, currency), currency)
+
+def add_money(*amounts, currency="USD"):
+    """금액들을 최소 단위 정수로 더한 float (누적해도 오차가 쌓이지 않음)"""
+    return from_minor(sum(to_minor(amount, currency) for amount in amounts), currency)
+
+def scale_minor(units, factor):
+    """최소 단위 금액에 수량/수수료율 등을 곱해 다시 최소 단위로 반올림"""
+    return _round_half_up(units * factor)
+
+def usd_to_krw(amount, exchange_rate):
+    """달러 금액 -> 원 (센트 단위로 한 번 반올림한 뒤 환율을 곱해 원 단위로 반올림)"""
+    return scale_minor(to_minor(amount, "USD"), exchange_rate / minor_scale("USD"))
+
+def to_minor_array(values, currency="USD"):
+    """금액 배열 -> 최소 단위 int64 배열 (to_minor와 같은 반올림, NaN은 0)"""
+    scaled = np.nan_to_num(np.asarray(values, dtype=np.float64)) * minor_scale(currency)
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5 + ROUNDING_TOLERANCE)).astype(np.int64)
+
+def scale_minor_array(units, factors):
+    scaled = np.asarray(units, dtype=np.float64) * factors
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5 + ROUNDING_TOLERANCE)).astype(np.int64)
+
+def from_minor_array(units, currency="USD"):
+    return np.asarray(units, dtype=np.int64) / minor_scale(currency)
+
+def sum_money(values, currency="USD"):
+    """금액 목록의 정확한 합계 (int64 배열로 한 번에 합산)"""
+    if not len(values):
+        return 0.0
+    return from_minor(to_minor_array(values, currency).sum(), currency)
+
+def usd_to_krw_array(values, exchange_rates):
+    """달러 금액 배열 -> 원 int64 배열 (환율은 값 하나 또는 같은 길이 배열)"""
+    return scale_minor_array(to_minor_array(values, "USD"), np.asarray(exchange_rates, dtype=np.float64) / minor_scale("USD"))
@@ -0,0 +1,179 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# PORTFOLIO_PERF=1 이면 항상 수집, 아니면 앱의 성능 패널을 켠 동안만 수집
+ENV_ENABLED = os.environ.get("PORTFOLIO_PERF", "0") == "1"
+_enabled = ENV_ENABLED
+
+WINDOW_SIZE = 512  # 작업별로 보관하는 최근 측정값 개수
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "portfolio_operation_seconds"
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+class PerfRegistry:
+    """작업별 최근 측정값(rolling window)과 누적 횟수/합계 보관 (프로세스 전역, 스레드 안전)"""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window_size)
+                self._counts[name] = 0
+                self._totals[name] = 0.0
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def snapshot(self):
+        """작업 이름 -> {count, sum, last, max, p50, p95, p99} (초 단위)"""
+        with self._lock:
+            items = [(name, list(samples), self._counts[name], self._totals[name])
+                     for name, samples in self._samples.items()]
+
+        stats = {}
+        for name, samples, count, total in sorted(items):
+            ordered = sorted(samples)
+            entry = {"count": count, "sum": total, "last": samples[-1], "max": ordered[-1]}
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = _percentile(ordered, q)
+            stats[name] = entry
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+def _percentile(ordered, q):
+    # nearest-rank 방식
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+registry = PerfRegistry()
+
+def record(name, seconds):
+    if _enabled:
+        registry.record(name, seconds)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.record(self.name, time.perf_counter() - self.start)
+        return False
+
+def timed(name):
+    """with timed("save"): ... - 비활성화 시 공유 no-op 컨텍스트 반환"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+def timed_function(name):
+    """함수 실행 시간 측정 데코레이터 - 비활성화 시 플래그 확인 한 번만 추가"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def to_prometheus_text(stats=None):
+    """Prometheus text exposition format (summary 타입)"""
+    stats = registry.snapshot() if stats is None else stats
+    lines = [
+        f"# HELP {METRIC_NAME} Portfolio tracker operation latency over the last {WINDOW_SIZE} samples.",
+        f"# TYPE {METRIC_NAME} summary",
+    ]
+    for name, entry in stats.items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            lines.append(f'{METRIC_NAME}{{operation="{label}",quantile="{q}"}} {entry[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'{METRIC_NAME}_sum{{operation="{label}"}} {entry["sum"]:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{operation="{label}"}} {entry["count"]}')
+    return "\n".join(lines) + "\n"
+
+def to_json(stats=None):
+    stats = registry.snapshot() if stats is None else stats
+    return json.dumps({"generated_at": time.time(), "operations": stats}, indent=2)
+
+def write_metrics_files(directory):
+    """node_exporter textfile collector용 .prom 파일과 JSON 파일을 원자적으로 기록"""
+    stats = registry.snapshot()
+    for file_name, content in [("perf_metrics.prom", to_prometheus_text(stats)),
+                               ("perf_metrics.json", to_json(stats))]:
+        path = os.path.join(directory, file_name)
+        temp_file = path + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_file, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = to_json().encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = to_prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """/metrics (Prometheus) 와 /metrics.json 을 제공하는 HTTP 서버를 한 번만 시작"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="perf-metrics", daemon=True).start()
+    return _server
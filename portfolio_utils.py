@@ -0,0 +1,152 @@
+import io
+
+import pandas as pd
+import yfinance as yf
+
+from currency_utils import BASE_CURRENCY, CURRENCY_KEY, fx_ticker, record_currency
+from money_utils import from_minor, round_money, to_minor, usd_to_krw_array
+from perf_utils import timed_function
+
+# 표시 통화 변환 대상 금액 컬럼
+CURRENCY_COLUMNS = ["매수단가", "현재가", "수익", "평가금액", "투자금액"]
+
+@timed_function("quote.fetch")
+def fetch_current_price(symbol):
+    """yfinance에서 당일 종가(현재가) 조회"""
+    return yf.Ticker(symbol).history(period="1d")["Close"].iloc[-1]
+
+def fetch_price_history(symbol, start):
+    """start(YYYY-MM-DD) 이후 일별 종가 시리즈"""
+    return yf.Ticker(symbol).history(start=start)["Close"]
+
+def fetch_fx_rates(currencies):
+    """통화별 1달러당 환율 최근 종가 {통화: 환율} - 모든 환율 티커를 한 번에 조회 (받지 못한 통화는 빠짐)"""
+    tickers = {fx_ticker(currency): currency for currency in currencies if currency != BASE_CURRENCY}
+    closes = yf.download(list(tickers), period="5d", progress=False, auto_adjust=False)["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(next(iter(tickers)))
+    latest = closes.ffill().iloc[-1]
+    return {currency: float(latest[ticker]) for ticker, currency in tickers.items()
+            if ticker in latest and pd.notna(latest[ticker])}
+
+def apply_current_price(stock, current_price):
+    """현재가 반영 후 수익/수익률 재계산 (금액은 종목의 거래 통화 최소 단위로)"""
+    currency = record_currency(stock)
+    stock["현재가"] = round_money(current_price, currency)
+    profit = (current_price - stock["매수단가"]) * stock["수량"]
+    stock["수익"] = round_money(profit, currency)
+    stock["수익률(%)"] = round((profit / (stock["매수단가"] * stock["수량"])) * 100, 2)
+
+@timed_function("quote.refresh")
+def refresh_stock_prices(stocks, fetch_price=fetch_current_price):
+    """보유 종목 현재가 일괄 업데이트 (조회 실패 종목은 건너뜀), 갱신된 종목 수 반환"""
+    updated = 0
+    for stock in stocks:
+        try:
+            apply_current_price(stock, fetch_price(stock["종목"]))
+            updated += 1
+        except:
+            continue
+    return updated
+
+def apply_live_prices(stocks, prices):
+    """최근가 테이블을 반영한 표시용 복사본 (원본 보유 종목은 변경하지 않음)"""
+    live_stocks = []
+    for stock in stocks:
+        stock = dict(stock)
+        if stock["종목"] in prices:
+            apply_current_price(stock, prices[stock["종목"]])
+        live_stocks.append(stock)
+    return live_stocks
+
+def build_realized_pnl_record(timestamp, symbol, quantity, buy_price, sell_price, commission, currency=BASE_CURRENCY):
+    """매도 한 건의 실현손익 기록 (금액은 거래 통화의 최소 단위 정수로 계산, USD가 아니면 통화 필드 추가)"""
+    commission_units = to_minor(commission, currency)
+    realized_units = to_minor((sell_price - buy_price) * quantity, currency) - commission_units
+    realized_rate = ((sell_price - buy_price) / buy_price) * 100
+    record = {
+        "날짜": timestamp,
+        "종목": symbol,
+        "수량": quantity,
+        "매수가": buy_price,
+        "매도가": sell_price,
+        "실현손익": from_minor(realized_units, currency),
+        "수익률(%)": round(realized_rate, 2),
+        "수수료": from_minor(commission_units, currency)
+    }
+    if currency != BASE_CURRENCY:
+        record[CURRENCY_KEY] = currency
+    return record
+
+def update_best_worst_trades(best_worst_trades, pnl_record):
+    """실현손익 기록으로 최고/최악 거래 갱신"""
+    rate = pnl_record["수익률(%)"]
+    if not best_worst_trades["best"] or rate > best_worst_trades["best"]["수익률(%)"]:
+        best_worst_trades["best"] = pnl_record
+    if not best_worst_trades["worst"] or rate < best_worst_trades["worst"]["수익률(%)"]:
+        best_worst_trades["worst"] = pnl_record
+
+def build_pnl_period_frame(realized_pnl):
+    """실현손익 기록에 월/주 기간 컬럼 추가"""
+    df_pnl = pd.DataFrame(realized_pnl)
+    df_pnl["월"] = pd.to_datetime(df_pnl["날짜"]).dt.to_period("M")
+    df_pnl["주"] = pd.to_datetime(df_pnl["날짜"]).dt.to_period("W")
+    return df_pnl
+
+def summarize_pnl_by_period(df_pnl, period_column):
+    """기간별 실현손익 합계 / 평균 수익률 / 거래 횟수"""
+    return df_pnl.groupby(period_column).agg({
+        "실현손익": "sum",
+        "수익률(%)": "mean",
+        "종목": "count"
+    }).round(2)
+
+def history_to_frame(daily_history):
+    """일별 히스토리 dict -> 날짜 인덱스 DataFrame"""
+    history_df = pd.DataFrame.from_dict(daily_history, orient='index')
+    history_df.index = pd.to_datetime(history_df.index)
+    return history_df.sort_index()
+
+def convert_history_to_krw(history_df, column, fallback_rate):
+    """각 날짜의 환율로 원화 변환 (환율 기록이 없으면 fallback_rate 사용, 원 단위로 반올림)"""
+    if "exchange_rate" in history_df:
+        rates = history_df["exchange_rate"].fillna(fallback_rate).to_numpy()
+    else:
+        rates = fallback_rate
+    return usd_to_krw_array(history_df[column].to_numpy(), rates).astype(float).tolist()
+
+def build_excel_backup(stocks, transactions, realized_pnl, daily_history, exchange_rate):
+    """엑셀 백업 파일(bytes) 생성"""
+    df = pd.DataFrame(stocks)
+    df["평가금액"] = df["현재가"] * df["수량"]
+    df["투자금액"] = df["매수단가"] * df["수량"]
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        # 현재 포트폴리오 (통화별로 시트 생성)
+        df_usd = df.copy()
+        df_usd.to_excel(writer, index=False, sheet_name="현재포트폴리오_USD")
+
+        # 원화 시트 추가
+        df_krw = df.copy()
+        for col in CURRENCY_COLUMNS:
+            if col in df_krw.columns:
+                df_krw[col] = df_krw[col] * exchange_rate
+        df_krw.to_excel(writer, index=False, sheet_name="현재포트폴리오_KRW")
+
+        # 거래내역
+        if transactions:
+            df_trans = pd.DataFrame(transactions)
+            df_trans.to_excel(writer, index=False, sheet_name="거래내역")
+
+        # 실현손익
+        if realized_pnl:
+            df_pnl = pd.DataFrame(realized_pnl)
+            df_pnl.to_excel(writer, index=False, sheet_name="실현손익")
+
+        # 일별히스토리
+        if daily_history:
+            df_history = pd.DataFrame.from_dict(daily_history, orient='index')
+            df_history.to_excel(writer, sheet_name="일별히스토리")
+
+    return buffer.getvalue()
@@ -0,0 +1,93 @@
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+from portfolio_utils import fetch_price_history
+from storage_utils import file_lock
+
+PRICE_CACHE_TTL = 6 * 3600        # 이 시간이 지난 캐시 파일만 새 종가를 추가로 조회 (초)
+PRICE_HISTORY_DAYS = 3 * 365      # 처음 조회할 때 받아오는 기간 (일)
+FETCH_RETRY_SECONDS = 600         # 조회에 실패한 종목은 이 시간 동안 다시 조회하지 않음
+
+def _normalize_closes(closes):
+    """시간대가 붙은 일별 종가 -> 날짜 인덱스(tz 없음) float 시리즈"""
+    closes = pd.Series(closes, dtype=float).dropna()
+    index = pd.to_datetime(closes.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    closes.index = index.normalize()
+    return closes[~closes.index.duplicated(keep="last")].sort_index()
+
+class PriceHistoryCache:
+    """
+    종목별 일별 종가를 CSV로 보관하는 로컬 캐시 (여러 세션/포트폴리오가 공유).
+    파일이 PRICE_CACHE_TTL보다 오래됐을 때만 마지막 날짜 이후 종가를 추가 조회하고,
+    조회에 실패하면 가지고 있는 종가를 그대로 사용 (FETCH_RETRY_SECONDS 동안 재조회 안 함)
+    """
+
+    def __init__(self, cache_dir, fetch=fetch_price_history, ttl=PRICE_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = {}  # 종목 -> (파일 mtime_ns, 종가 시리즈)
+        self._failed = {}  # 종목 -> 마지막 조회 실패 시각
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, symbol):
+        return os.path.join(self.cache_dir, re.sub(r"[^\w.=^-]", "_", symbol) + ".csv")
+
+    def load(self, symbol):
+        """캐시 파일의 종가 (없으면 빈 시리즈), 파일이 그대로면 메모리 사본 재사용"""
+        file_path = self.path(symbol)
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except FileNotFoundError:
+            return pd.Series(dtype=float)
+        with self._lock:
+            entry = self._memory.get(symbol)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        try:
+            closes = pd.read_csv(file_path, index_col=0, parse_dates=True).iloc[:, 0]
+            closes = _normalize_closes(closes)
+        except Exception:
+            return pd.Series(dtype=float)
+        with self._lock:
+            self._memory[symbol] = (mtime, closes)
+        return closes
+
+    def is_fresh(self, symbol):
+        try:
+            return time.time() - os.path.getmtime(self.path(symbol)) < self.ttl
+        except OSError:
+            return False
+
+    def closes(self, symbol, today):
+        """today까지의 일별 종가 - 캐시가 오래됐으면 빠진 날짜만 조회해 파일에 덧붙임"""
+        cached = self.load(symbol)
+        if self.is_fresh(symbol):
+            return cached
+        with self._lock:
+            failed_at = self._failed.get(symbol)
+        if failed_at is not None and time.time() - failed_at < FETCH_RETRY_SECONDS:
+            return cached
+        start = cached.index[-1] + timedelta(days=1) if len(cached) else pd.Timestamp(today - timedelta(days=PRICE_HISTORY_DAYS))
+        try:
+            fetched = _normalize_closes(self.fetch(symbol, start.strftime("%Y-%m-%d")))
+        except Exception:
+            with self._lock:
+                self._failed[symbol] = time.time()
+            return cached
+        merged = _normalize_closes(pd.concat([cached, fetched]))
+        file_path = self.path(symbol)
+        with file_lock(file_path + ".lock"):
+            # 새 종가가 없어도 파일을 다시 써서 조회 시각(mtime)을 갱신
+            temp_file = file_path + ".tmp"
+            merged.rename("close").to_csv(temp_file, index_label="date")
+            os.replace(temp_file, file_path)
+        return merged
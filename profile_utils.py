@@ -0,0 +1,173 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import streamlit as st
+
+# 프로파일링 모드: PORTFOLIO_PROFILE 환경변수 또는 ?profile= 쿼리 파라미터
+#   1 / cprofile : cProfile(결정적) -> .prof (snakeviz, flameprof 등으로 플레임그래프)
+#   sample       : 스택 샘플링 -> .folded (flamegraph.pl, speedscope 호환)
+PROFILE_MODES = {"1": "cprofile", "cprofile": "cprofile", "sample": "sample"}
+SAMPLE_INTERVAL = 0.005  # 5ms
+TOP_N = 30
+
+def requested_mode():
+    """이번 재실행에 요청된 프로파일링 모드 (없으면 None)"""
+    value = os.environ.get("PORTFOLIO_PROFILE", "")
+    if not value:
+        try:
+            value = st.query_params.get("profile", "")
+        except Exception:
+            value = ""
+    return PROFILE_MODES.get(str(value).lower())
+
+class _StackSampler(threading.Thread):
+    """대상 스레드의 콜스택을 주기적으로 수집해 folded stack 형태로 집계"""
+
+    def __init__(self, target_thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="rerun-profiler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class RerunCapture:
+    """재실행 한 번의 프로파일과 섹션(st.subheader)별 소요 시간"""
+
+    def __init__(self, mode, output_dir):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.now()
+        self.sections = [("(시작)", time.perf_counter())]
+        self.finished = False
+        self._profiler = None
+        self._sampler = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = _StackSampler(self.thread_id)
+            self._sampler.start()
+
+    def mark_section(self, title):
+        self.sections.append((str(title), time.perf_counter()))
+
+    def section_times(self, end):
+        """(섹션 제목, 소요 초) - 다음 섹션 시작 또는 종료 시점까지"""
+        bounds = [start for _, start in self.sections[1:]] + [end]
+        return [(title, bound - start) for (title, start), bound in zip(self.sections, bounds)]
+
+    def finish(self, interrupted=False):
+        """프로파일 중지 후 결과 파일 저장, 저장된 파일 경로 목록 반환"""
+        if self.finished:
+            return []
+        end = time.perf_counter()
+        self.finished = True
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"rerun_{self.started_at:%Y%m%d-%H%M%S-%f}")
+        summary = io.StringIO()
+        total = end - self.sections[0][1]
+        summary.write(f"재실행 프로파일 ({self.mode}) {self.started_at:%Y-%m-%d %H:%M:%S}"
+                      f" | 총 {total * 1000:.1f}ms{' | st.rerun()으로 중단됨' if interrupted else ''}\n\n")
+
+        summary.write("## 섹션별 소요 시간\n")
+        for title, seconds in sorted(self.section_times(end), key=lambda item: item[1], reverse=True):
+            summary.write(f"{seconds * 1000:10.1f}ms  {title}\n")
+
+        paths = []
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(base + ".prof")
+            paths.append(base + ".prof")
+            summary.write(f"\n## 누적 시간 상위 {TOP_N}개 함수\n")
+            pstats.Stats(self._profiler, stream=summary).sort_stats("cumulative").print_stats(TOP_N)
+        if self._sampler is not None:
+            self._sampler.stop()
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(base + ".folded")
+            leaf_counts = Counter()
+            for stack, count in self._sampler.stacks.items():
+                leaf_counts[stack.rsplit(";", 1)[-1]] += count
+            total_samples = sum(leaf_counts.values()) or 1
+            summary.write(f"\n## 자체 샘플 상위 {TOP_N}개 함수 (샘플 간격 {SAMPLE_INTERVAL * 1000:.0f}ms)\n")
+            for leaf, count in leaf_counts.most_common(TOP_N):
+                summary.write(f"{count:6d} ({count / total_samples * 100:5.1f}%)  {leaf}\n")
+
+        with open(base + "_summary.txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        paths.append(base + "_summary.txt")
+        _active_captures.pop(self.thread_id, None)
+        return paths
+
+# 스크립트 실행 스레드 id -> 진행 중인 캡처
+_active_captures = {}
+_original_subheader = None
+
+def _install_subheader_hook():
+    """st.subheader 호출을 섹션 경계로 기록 (프로파일링을 처음 켤 때 한 번만 설치)"""
+    global _original_subheader
+    if _original_subheader is not None:
+        return
+    _original_subheader = st.subheader
+
+    def subheader(body, *args, **kwargs):
+        capture = _active_captures.get(threading.get_ident())
+        if capture is not None:
+            capture.mark_section(body)
+        return _original_subheader(body, *args, **kwargs)
+
+    st.subheader = subheader
+
+def start_capture(output_dir):
+    """요청된 경우에만 재실행 프로파일링 시작 (꺼져 있으면 모드 확인 외 비용 없음)"""
+    # st.rerun()으로 끝나지 못한 이전 캡처는 중단된 실행으로 저장
+    previous = st.session_state.get("rerun_capture")
+    if previous is not None and not previous.finished:
+        previous.finish(interrupted=True)
+        st.session_state.rerun_capture = None
+
+    mode = requested_mode()
+    if mode is None:
+        return None
+
+    _install_subheader_hook()
+    capture = RerunCapture(mode, output_dir)
+    _active_captures[capture.thread_id] = capture
+    st.session_state.rerun_capture = capture
+    capture.start()
+    return capture
+
+def finish_capture():
+    capture = st.session_state.get("rerun_capture")
+    if capture is None or capture.finished:
+        return []
+    st.session_state.rerun_capture = None
+    return capture.finish()
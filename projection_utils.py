@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+PROJECTION_HORIZONS = {"1개월": 21, "3개월": 63, "1년": 252}  # 기간 -> 거래일 수
+PROJECTION_PATHS = 100_000
+PROJECTION_LOOKBACK = 756          # 시뮬레이션에 쓰는 최근 일별 수익률 수 (약 3년)
+MIN_HISTORY_DAYS = 60              # 이보다 종가 이력이 짧은 종목은 다른 종목 평균 수익률로 대신함
+CONFIDENCE_LEVELS = (0.95, 0.99)
+RETURN_PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_CELLS = 4_000_000            # 한 번에 만드는 (경로 x 거래일 x 종목) 수익률 수 - 메모리 상한
+PARALLEL_MIN_CELLS = 50_000_000    # 이보다 작은 시뮬레이션은 프로세스 풀 없이 현재 프로세스에서 계산
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+def aligned_log_returns(closes_by_symbol, lookback=PROJECTION_LOOKBACK, min_days=MIN_HISTORY_DAYS):
+    """
+    종목별 일별 종가 -> (날짜를 맞춘 로그수익률 행렬 (거래일 x 종목, 입력 종목 순서), 대용치를 쓴 종목).
+    이력이 없거나 짧은 종목과 상장 전 빈 날짜는 같은 날 다른 종목 평균 수익률로 채움.
+    쓸 수 있는 종목이 하나도 없으면 (None, 전체 종목)
+    """
+    symbols = list(closes_by_symbol)
+    usable = {symbol: closes for symbol, closes in closes_by_symbol.items()
+              if closes is not None and len(closes) > min_days}
+    if not usable:
+        return None, symbols
+    frame = pd.DataFrame(usable).sort_index().ffill().tail(lookback + 1)
+    returns = np.log(frame.to_numpy(dtype=float))
+    returns = returns[1:] - returns[:-1]
+    with np.errstate(invalid="ignore"):
+        row_mean = np.nan_to_num(np.nanmean(np.where(np.isfinite(returns), returns, np.nan), axis=1))
+    returns = np.where(np.isfinite(returns), returns, row_mean[:, None])
+    columns = {symbol: returns[:, i] for i, symbol in enumerate(frame.columns)}
+    proxied = [symbol for symbol in symbols if symbol not in columns]
+    matrix = np.column_stack([columns.get(symbol, row_mean) for symbol in symbols])
+    return matrix, proxied
+
+def gbm_parameters(returns):
+    """GBM용 일별 로그수익률 평균과 공분산의 촐레스키 인수"""
+    drift = returns.mean(axis=0)
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    jitter = 1e-12 * np.eye(len(covariance))
+    return drift, np.linalg.cholesky(covariance + jitter)
+
+def simulate_paths(returns, weights, cash_weight, steps_at, paths, method, seed):
+    """
+    보유 수량을 유지한다고 보고 paths개 경로의 기간별 포트폴리오 가치(현재 = 1)를 (paths x 기간) 배열로 계산.
+    bootstrap은 과거 거래일을 통째로 복원 추출(종목 간 상관 유지), gbm은 평균/공분산으로 만든 다변량 정규분포.
+    경로는 CHUNK_CELLS 단위로 나눠 만듦 (gbm은 기간 경계 사이 합만 추출하므로 거래일 수와 무관)
+    """
+    steps_at = np.asarray(steps_at)
+    max_steps = int(steps_at[-1])
+    symbols = returns.shape[1]
+    rng = np.random.default_rng(seed)
+    if method == "gbm":
+        drift, factor = gbm_parameters(returns)
+    segment_starts = np.concatenate([[0], steps_at[:-1]])
+    segment_lengths = (steps_at - segment_starts).astype(float)
+    values = np.empty((paths, len(steps_at)))
+    chunk = max(1, CHUNK_CELLS // (max_steps * symbols))
+    for start in range(0, paths, chunk):
+        count = min(chunk, paths - start)
+        if method == "gbm":
+            # 정규분포 로그수익률의 L일 합은 N(L*평균, L*공분산)이므로 기간 경계 구간 합을 바로 추출
+            segments = (rng.standard_normal((count * len(steps_at), symbols)) @ factor.T).reshape(count, len(steps_at), symbols)
+            segments = segments * np.sqrt(segment_lengths)[:, None] + segment_lengths[:, None] * drift
+        else:
+            sampled = returns[rng.integers(0, len(returns), (count, max_steps))]
+            segments = np.add.reduceat(sampled, segment_starts, axis=1)
+        # 기간 경계 사이 구간 합을 누적해 기간별 누적 로그수익률
+        growth = np.exp(np.cumsum(segments, axis=1))
+        values[start:start + count] = growth @ weights + cash_weight
+    return values
+
+def _simulate_shared(shm_name, shape, weights, cash_weight, steps_at, paths, method, seed):
+    # 프로세스 풀 작업: 공유 메모리의 수익률 행렬을 복사 없이 읽어 시뮬레이션
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        returns = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        values = simulate_paths(returns, weights, cash_weight, steps_at, paths, method, seed)
+        del returns
+        return values
+    finally:
+        shm.close()
+
+def run_projection(returns, weights, cash_weight, steps_at, paths=PROJECTION_PATHS, method="bootstrap",
+                   seed=0, workers=MAX_WORKERS, parallel_min_cells=PARALLEL_MIN_CELLS):
+    """
+    경로를 작업자 수만큼 나눠 프로세스 풀에서 계산 (수익률 행렬은 공유 메모리로 한 번만 전달).
+    작업량이 parallel_min_cells보다 작거나 작업자가 1이면 현재 프로세스에서 계산
+    """
+    returns = np.ascontiguousarray(returns, dtype=np.float64)
+    steps_at = [int(steps) for steps in steps_at]
+    seeds = np.random.SeedSequence(seed).spawn(max(1, workers))
+    cells = paths * (len(steps_at) if method == "gbm" else steps_at[-1]) * returns.shape[1]
+    if workers <= 1 or cells < parallel_min_cells:
+        return simulate_paths(returns, weights, cash_weight, steps_at, paths, method, seeds[0])
+
+    shm = shared_memory.SharedMemory(create=True, size=returns.nbytes)
+    try:
+        np.ndarray(returns.shape, dtype=np.float64, buffer=shm.buf)[:] = returns
+        sizes = [paths // workers + (i < paths % workers) for i in range(workers)]
+        # Streamlit 서버의 스레드를 복제하지 않도록 spawn으로 작업자 생성
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_simulate_shared, shm.name, returns.shape, weights, cash_weight,
+                                   steps_at, size, method, seeds[i])
+                       for i, size in enumerate(sizes) if size]
+            return np.concatenate([future.result() for future in futures])
+    finally:
+        shm.close()
+        shm.unlink()
+
+def summarize_projection(values, horizons=PROJECTION_HORIZONS, confidence_levels=CONFIDENCE_LEVELS):
+    """기간별 수익률 분위수, VaR/기대손실(ES, 양수 = 손실률)과 손실 확률"""
+    summary = {}
+    for column, name in enumerate(horizons):
+        returns = np.sort(values[:, column] - 1)
+        row = {f"p{q}": float(np.percentile(returns, q)) for q in RETURN_PERCENTILES}
+        for level in confidence_levels:
+            # 하위 (1 - level) 꼬리 경로 평균이 기대손실
+            tail = max(1, int(np.ceil(len(returns) * (1 - level))))
+            row[f"var{round(level * 100)}"] = float(-returns[tail - 1])
+            row[f"es{round(level * 100)}"] = float(-returns[:tail].mean())
+        row["loss_probability"] = float((returns < 0).mean())
+        summary[name] = row
+    return summary
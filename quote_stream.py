@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+from market_utils import is_us_market_open
+
+FX_SYMBOL = "KRW=X"
+POLL_INTERVAL = 15         # 장중 시세 갱신 주기 (초)
+CLOSED_POLL_INTERVAL = 300  # 장 마감 중 확인 주기 (초)
+MAX_CONCURRENCY = 8        # 동시에 조회하는 종목 수 상한
+SYMBOL_TTL = 600           # 이 시간 동안 요청이 없는 종목은 폴링 대상에서 제외
+QUOTE_CACHE_SECONDS = 60   # 공유 시세 캐시 유효 시간 (초)
+
+class QuoteCache:
+    """프로세스 전역 최근가 캐시 - 여러 포트폴리오/세션이 같은 종목을 중복 조회하지 않도록 공유"""
+
+    def __init__(self, max_age=QUOTE_CACHE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._prices = {}  # 종목 -> (가격, 조회 시각)
+
+    def put(self, symbol, price):
+        with self._lock:
+            self._prices[symbol] = (float(price), time.time())
+
+    def peek(self, symbol):
+        """유효 시간 안의 캐시 가격 (없으면 None)"""
+        with self._lock:
+            entry = self._prices.get(symbol)
+        if entry is not None and time.time() - entry[1] < self.max_age:
+            return entry[0]
+        return None
+
+    def get(self, symbol, fetch_price):
+        price = self.peek(symbol)
+        if price is None:
+            price = fetch_price(symbol)
+            self.put(symbol, price)
+        return price
+
+class QuotePoller:
+    """백그라운드 asyncio 루프로 보유 종목 + KRW=X 최근가 테이블을 유지 (프로세스 전역 공유)"""
+
+    def __init__(self, fetch_price, market_open=is_us_market_open, poll_interval=POLL_INTERVAL,
+                 closed_poll_interval=CLOSED_POLL_INTERVAL, max_concurrency=MAX_CONCURRENCY,
+                 symbol_ttl=SYMBOL_TTL, cache=None):
+        self.fetch_price = fetch_price
+        self.cache = cache
+        self.market_open = market_open
+        self.poll_interval = poll_interval
+        self.closed_poll_interval = closed_poll_interval
+        self.max_concurrency = max_concurrency
+        self.symbol_ttl = symbol_ttl
+        self._lock = threading.Lock()
+        self._watched = {FX_SYMBOL: float("inf")}  # 종목 -> 마지막 요청 시각
+        self._table = {}  # 종목 -> {"price": float, "updated_at": float}
+        self._wakeup = None
+        self._loop = None
+        self._thread = None
+        self._stop = False
+
+    def watch(self, symbols):
+        """세션이 보고 있는 종목 등록 (처음 보는 종목은 즉시 조회)"""
+        now = time.time()
+        new_symbol = False
+        with self._lock:
+            for symbol in symbols:
+                new_symbol = new_symbol or symbol not in self._table
+                self._watched[symbol] = now
+        if new_symbol:
+            self._wake()
+
+    def quote(self, symbol):
+        with self._lock:
+            return self._table.get(symbol)
+
+    def prices(self):
+        """종목 -> 최근가 (KRW=X 제외)"""
+        with self._lock:
+            return {symbol: entry["price"] for symbol, entry in self._table.items() if symbol != FX_SYMBOL}
+
+    def fx_rate(self):
+        entry = self.quote(FX_SYMBOL)
+        return entry["price"] if entry else None
+
+    def last_updated(self):
+        with self._lock:
+            return max((entry["updated_at"] for entry in self._table.values()), default=None)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()),
+                                            name="quote-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _symbols_to_poll(self, is_open):
+        now = time.time()
+        with self._lock:
+            # 오래 요청되지 않은 종목 정리
+            for symbol in [s for s, requested in self._watched.items() if now - requested > self.symbol_ttl]:
+                del self._watched[symbol]
+            if is_open:
+                return list(self._watched)
+            # 장 마감 중에는 아직 가격이 없는 종목만 조회 (종가는 변하지 않음)
+            return [symbol for symbol in self._watched if symbol not in self._table]
+
+    async def _fetch(self, semaphore, symbol):
+        async with semaphore:
+            try:
+                price = await asyncio.to_thread(self.fetch_price, symbol)
+            except Exception:
+                return
+        with self._lock:
+            self._table[symbol] = {"price": float(price), "updated_at": time.time()}
+        if self.cache is not None:
+            self.cache.put(symbol, price)
+
+    async def poll_once(self):
+        is_open = self.market_open()
+        symbols = self._symbols_to_poll(is_open)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._fetch(semaphore, symbol) for symbol in symbols))
+        return is_open
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while not self._stop:
+            self._wakeup.clear()
+            is_open = await self.poll_once()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       self.poll_interval if is_open else self.closed_poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,145 @@
+import numpy as np
+
+REBALANCE_BAND = 1.0          # 목표 비중과의 차이가 이 값(%p) 미만인 종목은 거래하지 않음
+SCENARIO_COUNT = 2000
+SCENARIO_MARKET_VOL = 0.10    # 시나리오: 전 종목 공통(시장) 가격 충격 표준편차
+SCENARIO_PRICE_VOL = 0.15     # 시나리오: 종목별 가격 충격 표준편차
+SCENARIO_FX_VOL = 0.05        # 시나리오: 환율 변화율 표준편차
+SCENARIO_CHUNK_CELLS = 2_000_000  # 한 번에 계산하는 (시나리오 x 종목) 셀 수 - 메모리 상한
+
+def holdings_arrays(stocks):
+    """보유 종목 -> (종목 목록, 수량, 현재가) 배열"""
+    count = len(stocks)
+    symbols = [stock["종목"] for stock in stocks]
+    quantities = np.fromiter((stock["수량"] for stock in stocks), float, count)
+    prices = np.fromiter((stock["현재가"] for stock in stocks), float, count)
+    return symbols, quantities, prices
+
+def capped_weights(weights, limit):
+    """
+    상대 비중을 합계 1로 정규화한 뒤 한 종목이 limit(%)을 넘지 않도록 초과분을
+    나머지 종목에 비중대로 나눠줌 (모든 종목이 한도에 걸리면 동일 비중)
+    """
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum(axis=-1, keepdims=True)
+    weights = np.where(total > 0, weights / np.where(total > 0, total, 1), 1.0 / weights.shape[-1])
+    cap = max(limit / 100, 1.0 / weights.shape[-1])
+    for _ in range(weights.shape[-1]):
+        over = weights > cap + 1e-12
+        if not over.any():
+            break
+        excess = np.where(over, weights - cap, 0.0).sum(axis=-1, keepdims=True)
+        weights = np.where(over, cap, weights)
+        below = weights < cap - 1e-12
+        room = np.where(below, weights, 0.0)
+        room_total = room.sum(axis=-1, keepdims=True)
+        # 한도 아래 종목이 모두 0이면 그 종목들에 똑같이 나눔
+        share = np.where(room_total > 0, room / np.where(room_total > 0, room_total, 1),
+                         below / np.maximum(below.sum(axis=-1, keepdims=True), 1))
+        weights = weights + excess * share
+    return weights
+
+def rebalance_trades(quantities, prices, cash, target_weights, commission_rate, band=REBALANCE_BAND):
+    """
+    목표 비중(총자산 대비, 합계 1 이하이고 나머지는 현금)으로 가는 정수 주 단위 최소 거래.
+    prices/cash/target_weights에 앞쪽 차원(시나리오)을 두면 모든 시나리오를 한 번에 계산.
+    - band(%p) 미만으로 벗어난 종목은 거래하지 않음
+    - 매도는 올림(비중을 확실히 낮춤), 매수는 내림(현금 초과 방지)
+    - 매수는 매도 대금(수수료 차감)과 목표 현금을 넘는 보유 현금 안에서 비례 축소하여 집행
+    """
+    quantities = np.asarray(quantities, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    cash = np.asarray(cash, dtype=float)[..., None]
+    target_weights = np.broadcast_to(np.asarray(target_weights, dtype=float), prices.shape)
+    tradable = prices > 0
+    safe_prices = np.where(tradable, prices, 1.0)
+
+    values = quantities * prices
+    total = values.sum(axis=-1, keepdims=True) + cash
+    drift = values / np.where(total > 0, total, 1.0) - target_weights
+    delta = np.where(tradable & (np.abs(drift) * 100 >= band), target_weights * total - values, 0.0)
+
+    sell = np.minimum(np.ceil(np.maximum(-delta, 0.0) / safe_prices), quantities)
+    proceeds = (sell * prices).sum(axis=-1, keepdims=True) * (1 - commission_rate)
+    cash_target = (1 - target_weights.sum(axis=-1, keepdims=True)) * total
+    budget = np.maximum(cash + proceeds - cash_target, 0.0)
+    wanted = np.maximum(delta, 0.0)
+    cost = wanted.sum(axis=-1, keepdims=True) * (1 + commission_rate)
+    scale = np.where(cost > budget, budget / np.where(cost > 0, cost, 1.0), 1.0)
+    buy = np.floor(wanted * scale / safe_prices)
+
+    shares = buy - sell
+    sell_value = (sell * prices).sum(axis=-1)
+    buy_value = (buy * prices).sum(axis=-1)
+    commission = (sell_value + buy_value) * commission_rate
+    cash_after = cash[..., 0] + sell_value - buy_value - commission
+    values_after = (quantities + shares) * prices
+    total_after = values_after.sum(axis=-1) + cash_after
+    return {
+        "shares": shares.astype(np.int64),
+        "commission": commission,
+        "turnover": sell_value + buy_value,
+        "cash_after": cash_after,
+        "weights_after": values_after / np.where(total_after > 0, total_after, 1.0)[..., None],
+    }
+
+def random_scenarios(count, holdings, market_vol=SCENARIO_MARKET_VOL, price_vol=SCENARIO_PRICE_VOL,
+                     fx_vol=SCENARIO_FX_VOL, seed=0):
+    """(가격 변화율 (count, holdings), 환율 변화율 (count,)) - 시장 공통 충격 + 종목별 충격 (정규분포)"""
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0.0, market_vol, (count, 1)) + rng.normal(0.0, price_vol, (count, holdings))
+    fx_moves = rng.normal(0.0, fx_vol, count)
+    return np.maximum(shocks, -0.95), np.maximum(fx_moves, -0.5)
+
+def simulate_scenarios(quantities, prices, cash, target_weights, price_shocks, fx_moves, exchange_rate,
+                       commission_rate, concentration_limit, band=REBALANCE_BAND):
+    """
+    가격/환율 충격 시나리오별 총자산(USD/원화), 최대 종목 비중(주식 대비 %),
+    집중 한도 초과 여부와 목표 비중으로 되돌리는 리밸런싱 수수료를 배열로 계산.
+    시나리오는 SCENARIO_CHUNK_CELLS 단위로 나눠 메모리 사용량을 제한
+    """
+    quantities = np.asarray(quantities, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    count = len(fx_moves)
+    chunk = max(1, SCENARIO_CHUNK_CELLS // max(1, len(prices)))
+    result = {key: np.empty(count) for key in ["total_usd", "total_krw", "max_weight", "commission", "turnover"]}
+    for start in range(0, count, chunk):
+        rows = slice(start, min(start + chunk, count))
+        shocked = prices * (1 + price_shocks[rows])
+        values = quantities * shocked
+        stock_total = values.sum(axis=-1)
+        total_usd = stock_total + cash
+        result["total_usd"][rows] = total_usd
+        result["total_krw"][rows] = total_usd * exchange_rate * (1 + fx_moves[rows])
+        result["max_weight"][rows] = np.where(
+            stock_total > 0, values.max(axis=-1, initial=0.0) / np.where(stock_total > 0, stock_total, 1.0) * 100, 0.0)
+        trades = rebalance_trades(quantities, shocked, np.full(shocked.shape[0], cash), target_weights,
+                                  commission_rate, band)
+        result["commission"][rows] = trades["commission"]
+        result["turnover"][rows] = trades["turnover"]
+    result["breach"] = result["max_weight"] > concentration_limit
+    return result
+
+def summarize_scenarios(result, base_total, currency_mode="USD", exchange_rate=1.0):
+    """
+    시나리오 결과 요약 (총자산 분위수/손실 확률은 표시 통화 기준, 원화는 시나리오별 환율 반영,
+    그 밖의 통화는 exchange_rate(1달러당 표시 통화)로 환산)
+    """
+    if currency_mode == "KRW":
+        totals, base = result["total_krw"], base_total * exchange_rate
+        commission = result["commission"] * exchange_rate
+    elif currency_mode != "USD":
+        totals, base = result["total_usd"] * exchange_rate, base_total * exchange_rate
+        commission = result["commission"] * exchange_rate
+    else:
+        totals, base = result["total_usd"], base_total
+        commission = result["commission"]
+    low, median, high = np.percentile(totals, [5, 50, 95])
+    return {
+        "p5": float(low),
+        "median": float(median),
+        "p95": float(high),
+        "loss_probability": float((totals < base).mean()),
+        "breach_probability": float(result["breach"].mean()),
+        "mean_commission": float(commission.mean()),
+    }
@@ -0,0 +1,242 @@
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from datetime import timedelta
+
+from currency_utils import BASE_CURRENCY, record_currency
+from money_utils import from_minor, to_minor
+
+DEFAULT_PAGE_SIZE = 15
+COMPACT_SECTIONS = ["transactions", "realized_pnl", "cash_ledger"]  # 레코드를 압축하는 기록 섹션 (메모는 따로)
+INTERNED_FIELDS = {"종목", "거래유형", "유형"}  # 값이 몇 가지뿐이라 기록끼리 같은 문자열 객체를 쓰는 필드
+
+class RecordIndex:
+    """
+    거래 내역/실현손익처럼 뒤에 추가만 되는 기록의 조회용 인덱스.
+    종목/유형별 행 번호 목록, 날짜 목록, 종목별 건수(최다 종목 포함)와 거래 통화별 금액 합계(최소 단위 정수로 누적)를 유지하며
+    같은 리스트에 기록이 추가되면 새 행만 색인 (리스트가 교체되거나 줄면 전체 재구성).
+    counted_types를 주면 해당 유형의 기록만 종목별 건수에 포함.
+    """
+
+    def __init__(self, symbol_key="종목", type_key=None, date_key="날짜", value_key=None, counted_types=None):
+        self.symbol_key = symbol_key
+        self.type_key = type_key
+        self.date_key = date_key
+        self.value_key = value_key
+        self.counted_types = counted_types
+        self._reset(None)
+
+    def _reset(self, records):
+        self._records = records
+        self._last = None
+        self.count = 0
+        self.dates = []
+        self.dates_sorted = True
+        self.rows_by_symbol = defaultdict(list)
+        self.rows_by_type = defaultdict(list)
+        self.symbol_counts = Counter()
+        self.top_symbol = None
+        self.top_count = 0
+        self.value_total = 0.0   # 기준 통화(USD) 기록의 합계
+        self.value_totals = {}   # 거래 통화 -> 합계
+        self._value_units = {}
+        self.positive_count = 0
+
+    def sync(self, records):
+        """기록 리스트와 인덱스를 맞춤, 새로 색인한 행 수 반환"""
+        if (records is not self._records or len(records) < self.count
+                or (self.count and records[self.count - 1] is not self._last)):
+            self._reset(records)
+        start = self.count
+        for row in range(start, len(records)):
+            self._add(row, records[row])
+        self.count = len(records)
+        self._last = records[-1] if records else None
+        return self.count - start
+
+    def _add(self, row, record):
+        symbol = record.get(self.symbol_key)
+        self.rows_by_symbol[symbol].append(row)
+        record_type = None
+        if self.type_key is not None:
+            record_type = record.get(self.type_key)
+            self.rows_by_type[record_type].append(row)
+        if self.counted_types is None or record_type in self.counted_types:
+            # 건수는 늘기만 하므로 최다 종목도 추가 시점에 갱신
+            count = self.symbol_counts[symbol] = self.symbol_counts[symbol] + 1
+            if count > self.top_count:
+                self.top_symbol, self.top_count = symbol, count
+        date_text = str(record.get(self.date_key, ""))
+        if self.dates and date_text < self.dates[-1]:
+            self.dates_sorted = False
+        self.dates.append(date_text)
+        if self.value_key is not None:
+            value = record.get(self.value_key, 0) or 0
+            currency = record_currency(record)
+            units = self._value_units[currency] = self._value_units.get(currency, 0) + to_minor(value, currency)
+            self.value_totals[currency] = from_minor(units, currency)
+            if currency == BASE_CURRENCY:
+                self.value_total = self.value_totals[currency]
+            self.positive_count += value > 0
+
+    def symbols(self):
+        return sorted(symbol for symbol in self.rows_by_symbol if symbol is not None)
+
+    def most_common_symbol(self):
+        """가장 많이 기록된 (종목, 건수), 기록이 없으면 None"""
+        return (self.top_symbol, self.top_count) if self.top_count else None
+
+    def query(self, symbol=None, record_type=None, start_date=None, end_date=None):
+        """조건에 맞는 행 번호 (오름차순), 조건이 없으면 전체 range"""
+        if symbol is not None and record_type is not None:
+            type_rows = self.rows_by_type.get(record_type, [])
+            symbol_rows = self.rows_by_symbol.get(symbol, [])
+            # 짧은 쪽을 기준으로 교집합
+            if len(type_rows) < len(symbol_rows):
+                rows = [row for row in type_rows if self._records[row].get(self.symbol_key) == symbol]
+            else:
+                rows = [row for row in symbol_rows if self._records[row].get(self.type_key) == record_type]
+        elif symbol is not None:
+            rows = self.rows_by_symbol.get(symbol, [])
+        elif record_type is not None:
+            rows = self.rows_by_type.get(record_type, [])
+        else:
+            rows = range(self.count)
+
+        if start_date is None and end_date is None:
+            return rows
+        low = start_date.isoformat() if start_date is not None else ""
+        high = (end_date + timedelta(days=1)).isoformat() if end_date is not None else None
+        if self.dates_sorted:
+            # 날짜순으로 쌓인 기록은 이진 탐색으로 행 범위를 구한 뒤 후보를 잘라냄
+            first = bisect_left(self.dates, low)
+            last = bisect_left(self.dates, high) if high is not None else self.count
+            if isinstance(rows, range):
+                return range(first, last)
+            return rows[bisect_left(rows, first):bisect_right(rows, last - 1)]
+        return [row for row in rows
+                if low <= self.dates[row] and (high is None or self.dates[row] < high)]
+
+    def page_rows(self, rows, page_number, page_size=DEFAULT_PAGE_SIZE):
+        """최신 기록부터 page_size씩 나눈 page_number(1부터) 페이지의 행 번호 (페이지 안은 시간순)"""
+        end = len(rows) - (page_number - 1) * page_size
+        start = max(0, end - page_size)
+        return rows[start:max(end, 0)]
+
+    def records(self, rows):
+        return [self._records[row] for row in rows]
+
+    def page(self, rows, page_number, page_size=DEFAULT_PAGE_SIZE):
+        """page_rows 페이지의 기록"""
+        return self.records(self.page_rows(rows, page_number, page_size))
+
+def page_count(total, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, -(-total // page_size))
+
+class CompactRecord(Mapping):
+    """
+    기록 한 건을 키 목록이 같은 기록끼리 공유하는 슬롯 클래스에 담은 읽기 전용 레코드 (dict 대비 절반 이하 메모리).
+    dict처럼 읽고 비교되며 dict(record)는 원래 키 순서 그대로 돌아옴. 값을 바꾸려면 새 dict를 만들어 추가
+    """
+    __slots__ = ()
+    _fields = ()
+    _slots = {}
+
+    def __getitem__(self, key):
+        try:
+            slot = self._slots[key]
+        except KeyError:
+            raise KeyError(key) from None
+        return slot.__get__(self)
+
+    def get(self, key, default=None):
+        slot = self._slots.get(key)
+        return default if slot is None else slot.__get__(self)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _value_tuple(self):
+        return tuple(slot.__get__(self) for slot in self._slots.values())
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._value_tuple() == other._value_tuple()
+        if isinstance(other, Mapping):
+            return dict(zip(self._fields, self._value_tuple())) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(zip(self._fields, self._value_tuple())))
+
+    def __reduce__(self):
+        return compact_record, (dict(zip(self._fields, self._value_tuple())),)
+
+_record_classes = {}
+_record_classes_lock = threading.Lock()
+
+def _record_class(fields):
+    # 키 목록(순서 포함)마다 슬롯 클래스 하나 (키가 식별자가 아닐 수 있어 슬롯 이름은 위치로)
+    cls = _record_classes.get(fields)
+    if cls is None:
+        with _record_classes_lock:
+            cls = _record_classes.get(fields)
+            if cls is None:
+                names = tuple(f"_{position}" for position in range(len(fields)))
+                cls = type("CompactRecord", (CompactRecord,), {"__slots__": names})
+                cls._fields = fields
+                cls._slots = {key: getattr(cls, name) for key, name in zip(fields, names)}
+                cls._setters = [slot.__set__ for slot in cls._slots.values()]
+                cls._interned = [position for position, key in enumerate(fields) if key in INTERNED_FIELDS]
+                _record_classes[fields] = cls
+    return cls
+
+def compact_record(record):
+    """dict 기록 -> CompactRecord (이미 압축된 기록은 그대로, 반복되는 문자열 값은 intern)"""
+    if isinstance(record, CompactRecord):
+        return record
+    cls = _record_class(tuple(record))
+    values = list(record.values())
+    for position in cls._interned:
+        if type(values[position]) is str:
+            values[position] = sys.intern(values[position])
+    compact = cls.__new__(cls)
+    for setter, value in zip(cls._setters, values):
+        setter(compact, value)
+    return compact
+
+def compact_records(records):
+    return [compact_record(record) if isinstance(record, dict) else record for record in records]
+
+def record_to_dict(value):
+    """json.dumps(default=...)용 - CompactRecord를 원래 키 순서의 dict로"""
+    if isinstance(value, CompactRecord):
+        return dict(zip(value._fields, value._value_tuple()))
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def compact_portfolio_records(data):
+    """
+    저장 데이터(또는 같은 키의 세션 상태 dict)의 기록/메모/최고·최악 거래를 CompactRecord로 바꾼 새 dict.
+    이후 추가되는 기록은 dict 그대로 섞여도 되며 저장하면 원래와 같은 JSON이 됨
+    """
+    compacted = dict(data)
+    for key in COMPACT_SECTIONS:
+        if isinstance(data.get(key), list):
+            compacted[key] = compact_records(data[key])
+    if isinstance(data.get("stock_memos"), dict):
+        compacted["stock_memos"] = {symbol: compact_records(memos) if isinstance(memos, list) else memos
+                                    for symbol, memos in data["stock_memos"].items()}
+    if isinstance(data.get("best_worst_trades"), dict):
+        compacted["best_worst_trades"] = {key: compact_record(record) if isinstance(record, dict) else record
+                                          for key, record in data["best_worst_trades"].items()}
+    return compacted
@@ -0,0 +1,203 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from json_stream_utils import CorruptDataError, read_stream_header
+from storage_utils import (
+    CHECKSUMS_KEY, META_KEYS, damaged_sections, file_lock, join_sections, list_timestamped_backups,
+    read_portfolio_checked, section_checksum, section_text, split_sections, write_portfolio_files
+)
+
+RECOVERY_WORKERS = 4  # 헤더를 동시에 읽는 파일 수
+
+class ReplicaReport:
+    """복제/백업 파일 하나의 검사 결과 (헤더는 미리, 전체 검사는 필요할 때 한 번만)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.timestamp = None   # 헤더의 backup_timestamp (체크섬이 맞을 때만)
+        self.checksums = {}     # 파일에 기록된 섹션별 체크섬 (없으면 이전 형식 파일)
+        self.verified = False
+        self.data = {}          # 온전히 읽은 섹션 (손상 지점 앞까지)
+        self.text = None        # 원본 JSON 문자열 (손상된 파일도 섹션 원문을 쓰려고 보관)
+        self.damaged = []       # 체크섬이 다르거나 읽지 못한 섹션
+        self.error = None
+        self._texts = None      # 원문을 섹션별로 나눈 것 (split_sections)
+
+    def read_header(self):
+        try:
+            self.mtime = os.stat(self.path).st_mtime_ns
+            header = read_stream_header(self.path, META_KEYS + [CHECKSUMS_KEY])
+        except (OSError, CorruptDataError) as e:
+            self.error = str(e)
+            return self
+        checksums = header.get(CHECKSUMS_KEY)
+        if isinstance(checksums, dict):
+            self.checksums = checksums
+            timestamp = header.get("backup_timestamp")
+            if timestamp is not None and section_checksum(section_text(timestamp)) == checksums.get("backup_timestamp"):
+                self.timestamp = timestamp
+        return self
+
+    def verify(self):
+        """전체를 읽어 섹션별 체크섬 확인 (이전 형식 파일은 읽히면 온전한 것으로 봄)"""
+        if self.verified:
+            return self
+        self.verified = True
+        try:
+            self.data, self.text = read_portfolio_checked(self.path)
+        except CorruptDataError as e:
+            self.data = e.sections or {}
+            self.error = str(e)
+            if self.checksums:
+                # 손상 지점 앞의 섹션도 원문 구간으로 비교하도록 원문을 따로 읽음
+                self._read_text()
+        except OSError as e:
+            self.error = str(e)
+        if self.checksums:
+            # 헤더에서 읽은 체크섬 기준 (원문 구간의 해시가 맞으면 다시 직렬화하지 않음)
+            self.data[CHECKSUMS_KEY] = self.checksums
+            self.damaged = damaged_sections(self.data, self.section_texts())
+            for key in self.damaged:
+                self.data.pop(key, None)
+            # 손상 지점 뒤라서 읽지 못한 섹션도 원문 구간의 체크섬이 맞으면 그 구간만 해석해 사용
+            for key in list(self.damaged):
+                section = self.section(key)
+                if section is not None:
+                    self.data[key] = section[0]
+                    self.damaged.remove(key)
+        elif self.error:
+            self.damaged.append("전체")
+        self.data.pop(CHECKSUMS_KEY, None)
+        if self.timestamp is None and not self.checksums and not self.damaged:
+            self.timestamp = self.data.get("backup_timestamp")
+        return self
+
+    def _read_text(self):
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                self.text = f.read()
+        except OSError:
+            pass
+
+    def section_texts(self):
+        if self._texts is None:
+            if self.text is None:
+                self._read_text()
+            self._texts = split_sections(self.text or "")
+        return self._texts
+
+    def section(self, key):
+        """체크섬이 맞는 섹션 하나의 (값, 원문) - 파일 전체를 검사하지 않고 그 구간만 해석 (없거나 다르면 None)"""
+        if self._texts is not None:
+            text = self._texts.get(key)
+        else:
+            if self.text is None:
+                self._read_text()
+            text = split_sections(self.text or "", {key}).get(key)
+        if text is None or key not in self.checksums or section_checksum(text) != self.checksums[key]:
+            return None
+        try:
+            return json.loads(text), text
+        except ValueError:
+            return None
+
+    @property
+    def valid(self):
+        return self.verified and not self.damaged
+
+class RecoveryResult:
+    """복구에 쓴 파일, 다른 파일에서 가져온 섹션({섹션: 파일}), 모든 파일의 검사 결과"""
+
+    def __init__(self, source, data, json_text, repaired, reports):
+        self.source = source
+        self.data = data
+        self.json_text = json_text
+        self.repaired = repaired
+        self.reports = reports
+
+def candidate_files(replica_paths, backup_dir):
+    """복제 파일 + 타임스탬프 백업 (최신순)"""
+    backups = sorted(list_timestamped_backups(backup_dir), reverse=True) if os.path.isdir(backup_dir) else []
+    return list(replica_paths) + [os.path.join(backup_dir, name) for name in backups]
+
+def scan_replicas(paths, workers=RECOVERY_WORKERS):
+    """모든 파일의 헤더(백업 시각, 섹션 체크섬)를 동시에 읽음"""
+    reports = [ReplicaReport(path) for path in paths if os.path.exists(path)]
+    with ThreadPoolExecutor(max(1, min(workers, len(reports)))) as pool:
+        list(pool.map(ReplicaReport.read_header, reports))
+    return reports
+
+def _repair(report, reports):
+    # 손상된 섹션마다 같은 체크섬을 가진 다른 파일의 섹션을 찾음 ({섹션: (파일, 값, 원문)}, 하나라도 못 찾으면 None)
+    found = {}
+    for key in report.damaged:
+        expected = report.checksums.get(key)
+        for other in reports:
+            if other is report or expected is None or other.checksums.get(key) != expected:
+                continue
+            section = other.section(key)
+            if section is not None:
+                found[key] = (other.path,) + section
+                break
+        else:
+            return None
+    return found
+
+def recover_portfolio(paths, workers=RECOVERY_WORKERS):
+    """
+    백업 시각(backup_timestamp)이 가장 최신인 온전한 파일을 찾음 (모두 실패하면 None).
+    가장 최신 파일의 일부 섹션만 손상됐으면 같은 체크섬의 섹션을 다른 파일에서 가져와 복구.
+    전체 검사는 최신 파일부터 필요한 만큼만 하므로 기본 파일이 온전하면 한 번만 읽음
+    """
+    reports = scan_replicas(paths, workers)
+    # 같은 시각이면 주어진 순서(기본 -> 백업 -> 보조 -> 타임스탬프 백업) 우선
+    order = sorted(reports, key=lambda report: report.timestamp if report.timestamp is not None else float("-inf"),
+                   reverse=True)
+    for report in order:
+        report.verify()
+        if report.valid:
+            return RecoveryResult(report.path, report.data, report.text, {}, reports)
+        if not report.checksums:
+            continue
+        found = _repair(report, reports)
+        if found is not None:
+            data, json_text = _assemble(report, found)
+            repaired = {key: path for key, (path, _, _) in found.items()}
+            return RecoveryResult(report.path, data, json_text, repaired, reports)
+    return None
+
+def _assemble(report, found):
+    # 온전한 섹션과 다른 파일에서 가져온 섹션을 원래 키 순서로 합침 (검사를 통과한 원문 구간은 다시 직렬화하지 않음)
+    data = dict(report.data)
+    texts = dict(report.section_texts())
+    for key, (_, value, text) in found.items():
+        data[key] = value
+        texts[key] = text
+    data = {key: data[key] for key in report.checksums if key in data}
+    texts = {key: texts.get(key) or section_text(value) for key, value in data.items()}
+    texts[CHECKSUMS_KEY] = section_text(report.checksums)
+    return data, join_sections(texts)
+
+def rewrite_replicas(result, replica_paths, lock_path):
+    """
+    없거나 손상됐거나 복구한 데이터와 내용(체크섬)이 다른 복제 파일을 복구한 JSON으로 다시 기록.
+    잠금 안에서 기록하며 검사 이후 다른 작성자가 바꾼 파일은 건너뜀. 다시 기록한 파일 목록 반환
+    """
+    reports = {report.path: report for report in result.reports}
+    expected = reports[result.source].checksums
+    targets = [(path, reports[path].mtime if path in reports else None) for path in replica_paths
+               if path not in reports or reports[path].damaged or reports[path].error
+               or reports[path].checksums != expected]
+    written = []
+    with file_lock(lock_path):
+        for path, mtime in targets:
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current == mtime:
+                write_portfolio_files(result.json_text, [path])
+                written.append(path)
+    return written
@@ -0,0 +1,78 @@
+from import_utils import replay_trades
+from money_utils import add_money, sum_money
+from portfolio_utils import update_best_worst_trades
+from recovery_utils import ReplicaReport
+from storage_utils import STATE_TO_DATA_KEYS, snapshot_times, unpack_portfolio_data
+
+JOURNAL_KEYS = ["transactions", "realized_pnl", "cash_ledger"]  # 뒤에 추가만 되는 기록 (스냅샷 이후 재생 대상)
+
+class PointInTimeResult:
+    """복원 기준 스냅샷(경로, 시각), 복원한 상태(세션 상태 키), 재생한 기록 수(None이면 스냅샷만), 건너뛴 거래"""
+
+    def __init__(self, snapshot, snapshot_time, state, replayed, skipped):
+        self.snapshot = snapshot
+        self.snapshot_time = snapshot_time
+        self.state = state
+        self.replayed = replayed
+        self.skipped = skipped
+
+def journal_tail(snapshot_records, journal_records, until):
+    """
+    journal이 스냅샷 기록 뒤에 추가만 된 목록이면 그 뒤에 추가된 기록 중 until(포함)까지의 것,
+    스냅샷 이후 기존 기록이 바뀌었거나 지워졌으면 None (마지막 공통 기록만 비교)
+    """
+    count = len(snapshot_records)
+    if len(journal_records) < count or (count and journal_records[count - 1] != snapshot_records[-1]):
+        return None
+    return [record for record in journal_records[count:] if str(record.get("날짜", ""))[:19] <= until]
+
+def replay_journal(state, journal, until):
+    """
+    스냅샷 상태에 journal(현재 기록)의 until까지 새 기록을 이어 붙임 (거래는 보유 종목/수수료에 재생,
+    현금은 원장 이벤트 합으로 반영). 기록이 스냅샷과 이어지지 않으면 None, 아니면 (상태, 재생한 기록 수, 건너뛴 거래)
+    """
+    tails = {key: journal_tail(state[key], journal[key], until) for key in JOURNAL_KEYS}
+    if any(tail is None for tail in tails.values()):
+        return None
+    trades = [(record["날짜"], record["종목"], record["거래유형"], record["수량"], record["가격"], record.get("수수료", 0.0))
+              for record in tails["transactions"] if record.get("거래유형") in ("매수", "매도")]
+    # 보유 종목/수수료만 재생하고 기록은 원래 항목을 그대로 이어 붙임 (현금은 원장에 이미 기록됨)
+    scratch = dict(state, transactions=[], realized_pnl=[], cash_ledger=[],
+                   best_worst_trades=dict(state["best_worst_trades"]))
+    _, skipped = replay_trades(scratch, trades, state["exchange_rate"], update_cash=False)
+    best_worst_trades = dict(state["best_worst_trades"])
+    for record in tails["realized_pnl"]:
+        update_best_worst_trades(best_worst_trades, record)
+    restored = dict(state, stocks=scratch["stocks"], total_commission=scratch["total_commission"],
+                    best_worst_trades=best_worst_trades,
+                    cash_amount=add_money(state["cash_amount"],
+                                          sum_money([event.get("금액", 0.0) for event in tails["cash_ledger"]])))
+    for key, tail in tails.items():
+        restored[key] = state[key] + tail
+    return restored, sum(len(tail) for tail in tails.values()), skipped
+
+def load_snapshot(path):
+    """백업 파일 하나를 섹션 체크섬까지 검사해 세션 상태 키 dict로 (손상됐으면 None)"""
+    report = ReplicaReport(path).read_header().verify()
+    if not report.valid:
+        return None
+    return dict(zip(STATE_TO_DATA_KEYS, unpack_portfolio_data(report.data)))
+
+def materialize_point_in_time(backup_dir, until, journal=None):
+    """
+    until('YYYY-MM-DD HH:MM:SS', 포함) 시점의 포트폴리오 상태를 만듦: until 이전의 가장 최신 온전한 타임스탬프 백업을
+    읽고, journal(현재 세션 상태 등 그 뒤까지 기록된 상태)이 있으면 스냅샷 이후 until까지의 기록만 재생.
+    해당 시점 이전 백업이 없거나 모두 손상됐으면 None
+    """
+    for snapshot_time, path in snapshot_times(backup_dir):
+        if snapshot_time > until:
+            continue
+        state = load_snapshot(path)
+        if state is None:
+            continue
+        replayed = replay_journal(state, journal, until) if journal is not None else None
+        if replayed is None:
+            return PointInTimeResult(path, snapshot_time, state, None, [])
+        state, count, skipped = replayed
+        return PointInTimeResult(path, snapshot_time, state, count, skipped)
+    return None
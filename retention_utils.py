@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from storage_utils import file_lock, load_daily_history, snapshot_times, write_daily_history
+
+# (이 기간(일)보다 오래된 백업부터, 남기는 간격) - 첫 기간보다 최근 백업은 모두 남김
+BACKUP_TIERS = [(1, "day"), (14, "week"), (90, "month"), (730, "year")]
+HISTORY_DETAIL_YEARS = 2          # 이보다 오래된 일별 히스토리는 월마다 요약 행 하나로 합침
+RETENTION_INTERVAL = 24 * 3600    # 보존 정책을 다시 적용하는 간격 (초)
+SUMMARY_DAYS_KEY = "compacted_days"
+BACKUP_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _bucket(moment, granularity):
+    if granularity == "day":
+        return moment.date()
+    if granularity == "week":
+        return tuple(moment.isocalendar())[:2]
+    if granularity == "month":
+        return moment.year, moment.month
+    return moment.year
+
+def backups_to_prune(snapshots, now, tiers=BACKUP_TIERS):
+    """
+    [(백업 시각, 경로)] 중 지울 경로: 백업 나이에 맞는 간격(일/주/월/연)마다 가장 최신 백업 하나만 남김.
+    가장 최신 백업은 나이와 관계없이 남김
+    """
+    kept = set()
+    prune = []
+    for position, (time_text, path) in enumerate(sorted(snapshots, reverse=True)):
+        moment = datetime.strptime(time_text, BACKUP_TIME_FORMAT)
+        age_days = (now - moment).total_seconds() / 86400
+        tier = next((index for index in range(len(tiers) - 1, -1, -1) if age_days >= tiers[index][0]), None)
+        if tier is None:
+            continue
+        # 최신순으로 보므로 구간마다 처음 만난 백업이 가장 최신
+        key = (tier, _bucket(moment, tiers[tier][1]))
+        if key in kept and position:
+            prune.append(path)
+        else:
+            kept.add(key)
+    return prune
+
+def history_cutoff(today, years=HISTORY_DETAIL_YEARS):
+    """일별 기록을 그대로 두는 첫 날짜 (years년 전 그 달 1일, 'YYYY-MM-DD')"""
+    return date(today.year - years, today.month, 1).isoformat()
+
+def compact_daily_history(daily_history, before):
+    """
+    before('YYYY-MM-DD') 이전 일별 기록을 월마다 그 달 마지막 기록 날짜의 요약 행 하나로 합침.
+    요약 행은 마지막 기록 값에 합친 일수와 총자산 최저/최고를 더한 것이라 기존 히스토리 계산에 그대로 쓰임.
+    첫 기록은 수익률 계산의 기준점이므로 합치지 않음. (합친 히스토리, 없앤 행 수) 반환 - 합칠 것이 없으면 입력 dict 그대로
+    """
+    months = {}
+    first = min(daily_history, default=None)
+    for day in daily_history:
+        if day < before and day != first:
+            months.setdefault(day[:7], []).append(day)
+    compacted = {}
+    for days in months.values():
+        if len(days) < 2:
+            continue
+        rows = [daily_history[day] for day in sorted(days)]
+        summary = {key: round(value, 4) if isinstance(value, float) else value for key, value in rows[-1].items()}
+        summary[SUMMARY_DAYS_KEY] = sum(row.get(SUMMARY_DAYS_KEY, 1) for row in rows)
+        summary["min_total_assets"] = min(row.get("min_total_assets", row.get("total_assets", 0.0)) for row in rows)
+        summary["max_total_assets"] = max(row.get("max_total_assets", row.get("total_assets", 0.0)) for row in rows)
+        compacted[max(days)] = (summary, days)
+    if not compacted:
+        return daily_history, 0
+    removed = {day for _, days in compacted.values() for day in days}
+    history = {day: row for day, row in daily_history.items() if day not in removed}
+    history.update({day: summary for day, (summary, _) in compacted.items()})
+    return dict(sorted(history.items())), len(removed) - len(compacted)
+
+def load_retention_state(state_file):
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_retention_state(state_file, state):
+    temp_file = state_file + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, state_file)
+
+def retention_due(state_file, now_timestamp, interval=RETENTION_INTERVAL):
+    return now_timestamp - load_retention_state(state_file).get("last_run", 0) >= interval
+
+def run_retention(backup_dir, history_file, lock_path, state_file, now, now_timestamp):
+    """
+    보존 정책 한 번 적용: 백업을 간격별로 정리하고, 기준 기간을 새로 넘긴 달의 일별 히스토리만 요약 (증분).
+    now는 백업 파일 이름과 같은 한국 시간(tz 없음). 보고(삭제한 백업 수, 요약으로 없앤 행 수, 확보한 용량, 오류)를
+    상태 파일에 남기고 반환
+    """
+    state = load_retention_state(state_file)
+    report = {"시각": now.strftime(BACKUP_TIME_FORMAT), "삭제한 백업": 0, "요약한 히스토리 행": 0, "확보한 용량": 0, "오류": []}
+    try:
+        with file_lock(lock_path):
+            for path in backups_to_prune(snapshot_times(backup_dir), now):
+                size = os.path.getsize(path)
+                os.remove(path)
+                report["삭제한 백업"] += 1
+                report["확보한 용량"] += size
+    except Exception as e:
+        report["오류"].append(f"백업 정리: {e}")
+
+    # 기준 날짜는 한 달에 한 번만 바뀌므로 그 사이에는 히스토리 파일을 읽지 않음
+    before = history_cutoff(now.date())
+    if state.get("history_compacted_before", "") < before and os.path.exists(history_file):
+        try:
+            with file_lock(history_file + ".lock"):
+                size = os.path.getsize(history_file)
+                history, removed = compact_daily_history(load_daily_history(history_file), before)
+                if removed:
+                    write_daily_history(history_file, history)
+                    report["확보한 용량"] += size - os.path.getsize(history_file)
+            report["요약한 히스토리 행"] = removed
+            state["history_compacted_before"] = before
+        except Exception as e:
+            report["오류"].append(f"히스토리 요약: {e}")
+
+    state["last_run"] = now_timestamp
+    state["report"] = report
+    _save_retention_state(state_file, state)
+    return report
+
+class RetentionRunner:
+    """보존 정책을 백그라운드 스레드 하나에서 실행 (같은 포트폴리오 작업이 진행 중이면 다시 넣지 않음)"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="retention")
+        self._lock = threading.Lock()
+        self._running = set()
+
+    def submit(self, key, *args):
+        """run_retention(*args)을 예약, 이미 진행 중이면 None"""
+        with self._lock:
+            if key in self._running:
+                return None
+            self._running.add(key)
+        future = self._executor.submit(run_retention, *args)
+        future.add_done_callback(lambda _: self._finish(key))
+        return future
+
+    def _finish(self, key):
+        with self._lock:
+            self._running.discard(key)
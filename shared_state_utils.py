@@ -0,0 +1,137 @@
+import sys
+import threading
+import weakref
+
+RECORD_KEYS = ["transactions", "realized_pnl", "cash_ledger"]  # 레코드를 세션끼리 공유하는 추가 전용 기록
+COPIED_KEYS = ["stocks", "target_settings", "best_worst_trades", "stock_memos"]  # 세션마다 컨테이너를 복사하는 섹션
+SIZE_SAMPLE = 64  # 큰 컨테이너는 이만큼만 재서 비례 추정
+SIZE_DEPTH = 12   # 이보다 깊은 객체는 자기 크기만 셈
+
+def copy_portfolio_sections(data):
+    """
+    저장 데이터(또는 같은 키의 dict)의 컨테이너만 새로 만든 사본. 기록 레코드는 바꾸지 않고 뒤에 추가만 하므로
+    공유하고, 세션이 직접 고치는 보유 종목/목표 설정/메모 목록/최고·최악 거래는 복사 (쓰기 시 복사 단위)
+    """
+    copied = dict(data)
+    for key in RECORD_KEYS:
+        if key in data:
+            copied[key] = list(data[key])
+    if "stocks" in data:
+        copied["stocks"] = [dict(stock) for stock in data["stocks"]]
+    for key in ["target_settings", "best_worst_trades"]:
+        if key in data:
+            copied[key] = dict(data[key])
+    if "stock_memos" in data:
+        copied["stock_memos"] = {symbol: list(memos) for symbol, memos in data["stock_memos"].items()}
+    return copied
+
+class SharedPortfolio:
+    """
+    여러 세션이 함께 읽는 포트폴리오 한 버전의 저장 데이터 (읽기 전용).
+    세션은 acquire()로 받은 참조만 세션 상태에 두고 수정할 데이터는 copy_portfolio_sections 사본으로 가짐
+    """
+
+    def __init__(self, data, version):
+        self.data = data
+        self.version = version
+        self._lock = threading.Lock()
+        self._refs = weakref.WeakSet()
+        self._size = None
+        self._record_ids = None
+
+    def acquire(self):
+        ref = PortfolioRef(self)
+        with self._lock:
+            self._refs.add(ref)
+        return ref
+
+    @property
+    def sessions(self):
+        """이 버전을 참조하는 세션 수 (세션이 끝나거나 새 버전으로 바꾸면 줄어듦)"""
+        with self._lock:
+            return len(self._refs)
+
+    def size(self):
+        """공유 데이터의 대략의 바이트 (한 번만 계산)"""
+        if self._size is None:
+            self._size = estimate_size(self.data)
+        return self._size
+
+    def record_ids(self):
+        """공유 레코드의 id 집합 (세션 메모리 계산에서 공유분을 빼는 데 사용)"""
+        if self._record_ids is None:
+            self._record_ids = frozenset(id(record) for key in RECORD_KEYS for record in self.data.get(key, ()))
+        return self._record_ids
+
+class PortfolioRef:
+    """세션 상태에 두는 공유 데이터 참조 (참조가 사라지면 SharedPortfolio의 세션 수에서 빠짐)"""
+    __slots__ = ("shared", "__weakref__")
+
+    def __init__(self, shared):
+        self.shared = shared
+
+    @property
+    def data(self):
+        return self.shared.data
+
+    @property
+    def version(self):
+        return self.shared.version
+
+def _sample(items):
+    if len(items) <= SIZE_SAMPLE:
+        return items, 1.0
+    step = len(items) / SIZE_SAMPLE
+    return [items[int(index * step)] for index in range(SIZE_SAMPLE)], step
+
+def estimate_size(value, shared_ids=frozenset(), seen=None, depth=0, leaves=True):
+    """
+    value가 차지하는 대략의 바이트 (sys.getsizeof 기준). shared_ids에 속한 객체와 dict 키(레코드끼리 공유)는
+    세지 않고, SIZE_SAMPLE보다 큰 컨테이너는 고르게 뽑은 원소 크기의 평균으로 추정. leaves=False면 컨테이너만 셈
+    """
+    if seen is None:
+        seen = set()
+    if id(value) in shared_ids or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        children, scale = _sample(list(value.values()))
+    elif isinstance(value, (list, tuple)):
+        children, scale = _sample(value)
+    elif isinstance(value, (set, frozenset)):
+        children, scale = _sample(list(value))
+    elif isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return size if leaves else 0
+    elif depth >= SIZE_DEPTH:
+        return size
+    elif hasattr(value, "__dict__"):
+        children, scale = [vars(value)], 1.0
+    elif hasattr(type(value), "__slots__"):
+        children = [getattr(value, name) for name in type(value).__slots__
+                    if name != "__weakref__" and hasattr(value, name)]
+        scale = 1.0
+    else:
+        return size
+    return size + int(sum(estimate_size(child, shared_ids, seen, depth + 1, leaves) for child in children) * scale)
+
+def session_memory(state_items, ref):
+    """
+    세션 상태 [(키, 값)]의 메모리 계정: {"세션": 세션만 가진 바이트, "공유": 참조하는 공유 데이터 바이트,
+    "공유 세션 수": 같은 버전을 참조하는 세션 수}. 공유 레코드를 앞부분 그대로 가진 기록 목록은 목록 자체와
+    뒤에 추가한 레코드만, 복사한 섹션은 값(공유 데이터와 같은 객체)을 빼고 컨테이너만 셈
+    """
+    shared = ref.shared if ref is not None else None
+    shared_ids = shared.record_ids() if shared is not None else frozenset()
+    seen = set()
+    owned = 0
+    for key, value in state_items:
+        if isinstance(value, PortfolioRef):
+            continue
+        base = shared.data.get(key) if shared is not None and key in RECORD_KEYS else None
+        if base and isinstance(value, list) and len(value) >= len(base) and value[len(base) - 1] is base[-1]:
+            owned += sys.getsizeof(value) + estimate_size(value[len(base):], shared_ids, seen)
+        else:
+            owned += estimate_size(value, shared_ids, seen, leaves=shared is None or key not in COPIED_KEYS)
+    return {"세션": owned, "공유": shared.size() if shared is not None else 0,
+            "공유 세션 수": shared.sessions if shared is not None else 0}
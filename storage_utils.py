@@ -0,0 +1,519 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from currency_utils import DEFAULT_FX_RATES, SCHEMA_VERSION, migrate_holdings, record_currency
+from json_stream_utils import load_portfolio_stream, read_stream_header
+from ledger_utils import opening_ledger
+from money_utils import add_money, round_money
+from record_utils import record_to_dict
+
+DEFAULT_EXCHANGE_RATE = DEFAULT_FX_RATES["KRW"]
+EMPTY_BEST_WORST = {"best": None, "worst": None}
+
+DEFAULT_PORTFOLIO_ID = "default"
+PORTFOLIOS_DIR_NAME = "portfolios"
+PORTFOLIO_CACHE_SIZE = 256  # 메모리에 유지하는 포트폴리오 수 (LRU)
+LOCK_FILE_NAME = ".portfolio.lock"
+VERSION_FILE_NAME = "portfolio_data.version"
+LOCK_TIMEOUT = 10.0  # 파일 잠금 대기 최대 시간 (초)
+BACKUP_TIME_PATTERN = re.compile(r"portfolio_backup_(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})\.json$")
+CHECKSUMS_KEY = "checksums"
+META_KEYS = ["backup_timestamp", "last_updated", "version"]  # 저장 파일 맨 앞에 기록 (체크섬과 함께 헤더)
+
+class LockTimeoutError(Exception):
+    """다른 프로세스가 잠금을 오래 잡고 있어 저장하지 못함"""
+
+class SaveConflictError(Exception):
+    """다른 세션의 변경과 자동 병합할 수 없는 충돌"""
+
+# st.session_state 키 -> 저장 파일 키
+STATE_TO_DATA_KEYS = {
+    "stocks": "stocks",
+    "cash_amount": "cash",
+    "transactions": "transactions",
+    "target_settings": "target_settings",
+    "realized_pnl": "realized_pnl",
+    "stock_memos": "stock_memos",
+    "total_commission": "total_commission",
+    "best_worst_trades": "best_worst_trades",
+    "currency_mode": "currency_mode",
+    "exchange_rate": "exchange_rate",
+    "cash_ledger": "cash_ledger",
+}
+
+def build_portfolio_payload(state, last_updated, backup_timestamp, version=None):
+    """세션 상태(또는 같은 키를 가진 dict)에서 저장용 데이터 생성"""
+    data = {data_key: state[state_key] for state_key, data_key in STATE_TO_DATA_KEYS.items()}
+    data["schema_version"] = SCHEMA_VERSION
+    data["last_updated"] = last_updated
+    data["backup_timestamp"] = backup_timestamp
+    if version is not None:
+        data["version"] = version
+    return data
+
+def data_to_state(data):
+    """저장 데이터 dict -> 세션 상태 키 dict"""
+    return {state_key: data[data_key] for state_key, data_key in STATE_TO_DATA_KEYS.items()}
+
+def section_text(value):
+    """섹션 하나의 저장 형식 문자열 (체크섬 계산 기준, CompactRecord는 dict와 같은 형식)"""
+    return json.dumps(value, indent=2, ensure_ascii=False, default=record_to_dict)
+
+def section_checksum(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def serialize_portfolio(data):
+    """
+    저장 파일과 동일한 형식의 JSON 문자열로 변환 (json.dumps(indent=2)와 같은 형식).
+    메타 정보와 섹션별 체크섬을 맨 앞에 두어 헤더만 읽고도 백업 시각/섹션 내용을 비교할 수 있음
+    """
+    texts = {key: section_text(value) for key, value in data.items() if key != CHECKSUMS_KEY}
+    keys = [key for key in META_KEYS if key in texts] + [key for key in texts if key not in META_KEYS]
+    texts[CHECKSUMS_KEY] = section_text({key: section_checksum(texts[key]) for key in keys})
+    return join_sections(texts)
+
+def join_sections(texts):
+    """{섹션: section_text} -> 저장 파일 형식 문자열 (메타 정보, 체크섬, 나머지 섹션 순)"""
+    keys = [key for key in META_KEYS + [CHECKSUMS_KEY] if key in texts]
+    keys += [key for key in texts if key not in keys]
+    # 최상위 값은 한 단계 들여쓰기 안쪽이므로 줄마다 두 칸을 더함
+    return "{\n" + ",\n".join(f"  {json.dumps(key, ensure_ascii=False)}: {texts[key].replace(chr(10), chr(10) + '  ')}"
+                              for key in keys) + "\n}"
+
+def split_sections(json_text, keys=None):
+    """
+    serialize_portfolio 형식 문자열 -> {섹션: section_text} (다시 직렬화하지 않고 원문을 잘라냄, keys가 있으면 그 섹션만).
+    최상위 키만 두 칸 들여쓰기로 줄을 시작하므로 그 경계로 나눔 (형식이 다르면 빈 dict)
+    """
+    if not (json_text.startswith('{\n  "') and json_text.endswith("\n}")):
+        return {}
+    texts = {}
+    start = 5
+    try:
+        while start:
+            end = json_text.find(',\n  "', start)
+            key, value_start = json.decoder.scanstring(json_text, start)
+            if json_text[value_start:value_start + 2] != ": ":
+                return {}
+            if keys is None or key in keys:
+                texts[key] = json_text[value_start + 2:end if end >= 0 else -2].replace("\n  ", "\n")
+            start = end + 5 if end >= 0 else 0
+    except ValueError:
+        return {}
+    return texts
+
+def damaged_sections(data, texts=None):
+    """
+    체크섬과 내용이 다른 섹션 목록 (체크섬이 없는 이전 형식 데이터는 빈 목록).
+    data를 읽은 원문의 섹션별 구간(split_sections)이 있으면 그 구간을 해시하고, 없는 섹션만 다시 직렬화해 비교
+    """
+    checksums = data.get(CHECKSUMS_KEY)
+    if not isinstance(checksums, dict):
+        return []
+    texts = texts or {}
+    return [key for key, checksum in checksums.items()
+            if key not in data or section_checksum(texts[key] if key in texts else section_text(data[key])) != checksum]
+
+def write_portfolio_files(json_data, file_paths):
+    """같은 JSON 문자열을 모든 복제 파일에 기록 (임시 파일 후 교체로 읽는 쪽이 중간 상태를 보지 않음)"""
+    for file_path in file_paths:
+        temp_file = file_path + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(json_data)
+        os.replace(temp_file, file_path)
+
+def save_portfolio_files(state, file_paths, last_updated, backup_timestamp, version=None):
+    """payload 생성 -> 직렬화 -> 복제 파일 기록, 기록한 JSON 문자열 반환"""
+    json_data = serialize_portfolio(build_portfolio_payload(state, last_updated, backup_timestamp, version))
+    write_portfolio_files(json_data, file_paths)
+    return json_data
+
+@contextmanager
+def file_lock(lock_path, timeout=LOCK_TIMEOUT):
+    """프로세스 간 배타적 advisory 잠금 (POSIX flock / Windows msvcrt)"""
+    with open(lock_path, "a+") as lock_file:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise LockTimeoutError(f"잠금 대기 시간 초과: {lock_path}")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def read_data_version(version_path, primary_file):
+    """저장된 데이터 버전 (버전 파일이 없으면 기본 파일의 version, 그것도 없으면 0)"""
+    try:
+        with open(version_path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        pass
+    try:
+        # 체크섬 헤더가 있는 파일은 앞부분만 읽음
+        header = read_stream_header(primary_file, META_KEYS + [CHECKSUMS_KEY])
+        if "version" in header:
+            return int(header["version"])
+        return int(read_portfolio_file(primary_file).get("version", 0))
+    except Exception:
+        return 0
+
+def write_data_version(version_path, version):
+    temp_file = version_path + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        f.write(str(version))
+    os.replace(temp_file, version_path)
+
+def save_portfolio_versioned(state, base_data, expected_version, file_paths, lock_path, version_path,
+                             last_updated, backup_timestamp):
+    """
+    버전 비교 후 저장 (compare-and-swap):
+    - 마지막으로 읽은/저장한 버전(expected_version) 그대로면 그대로 저장
+    - 그 사이 다른 작성자가 저장했다면 base_data(그 시점에 읽은/저장한 데이터, 읽기만 함) 기준 3-way 병합 후 저장
+    - 병합할 수 없으면 SaveConflictError (아무것도 기록하지 않음)
+    반환: (저장한 데이터 dict - 세션 상태의 컨테이너를 그대로 참조, 새 버전, 병합된 세션 상태 dict 또는 None)
+    """
+    with file_lock(lock_path):
+        current_version = read_data_version(version_path, file_paths[0])
+        merged_state = None
+        source = state
+        if expected_version is not None and current_version != expected_version:
+            if base_data is None:
+                raise SaveConflictError("병합 기준 데이터가 없습니다")
+            theirs = read_portfolio_file(file_paths[0])
+            ours = build_portfolio_payload(state, last_updated, backup_timestamp)
+            merged_state = source = data_to_state(merge_portfolio_changes(base_data, ours, theirs))
+
+        new_version = current_version + 1
+        data = build_portfolio_payload(source, last_updated, backup_timestamp, new_version)
+        write_portfolio_files(serialize_portfolio(data), file_paths)
+        write_data_version(version_path, new_version)
+    return data, new_version, merged_state
+
+def restore_portfolio_state(state, file_paths, lock_path, version_path, last_updated, backup_timestamp):
+    """
+    복원한 상태를 새 버전/백업 시각으로 모든 복제 파일에 기록 (복구 시 가장 최신 데이터로 선택되도록).
+    다른 세션의 변경과 병합하지 않고 덮어씀, (저장한 데이터 dict, 새 버전) 반환
+    """
+    with file_lock(lock_path):
+        version = read_data_version(version_path, file_paths[0]) + 1
+        data = build_portfolio_payload(state, last_updated, backup_timestamp, version)
+        write_portfolio_files(serialize_portfolio(data), file_paths)
+        write_data_version(version_path, version)
+    return data, version
+
+def _merge_append_only(base, ours, theirs, label):
+    # 기록은 뒤에 추가만 되므로, 이 세션이 기존 항목을 바꾸지 않았다면 새로 추가한 항목만 이어 붙임
+    if ours[:len(base)] != base:
+        raise SaveConflictError(f"{label}: 기존 기록이 수정되어 자동 병합할 수 없습니다")
+    return theirs + ours[len(base):]
+
+def _with_profit(stock):
+    profit = (stock["현재가"] - stock["매수단가"]) * stock["수량"]
+    stock["수익"] = round_money(profit, record_currency(stock))
+    stock["수익률(%)"] = round(profit / (stock["매수단가"] * stock["수량"]) * 100, 2) if stock["매수단가"] else 0.0
+    return stock
+
+def _merge_holdings(base, ours, theirs):
+    base_by, ours_by, theirs_by = ({s["종목"]: s for s in stocks} for stocks in (base, ours, theirs))
+    symbols = list(theirs_by) + [symbol for symbol in ours_by if symbol not in theirs_by]
+    merged = []
+    for symbol in symbols:
+        b, o, t = base_by.get(symbol), ours_by.get(symbol), theirs_by.get(symbol)
+        if o == b:
+            result = t
+        elif t == b:
+            result = o
+        else:
+            # 양쪽 모두 변경: 수량과 매수원가의 변화량을 합산하여 평균단가 재계산
+            def position(stock):
+                return (stock["수량"], stock["수량"] * stock["매수단가"]) if stock else (0, 0.0)
+            (bq, bc), (oq, oc), (tq, tc) = position(b), position(o), position(t)
+            quantity, cost = tq + (oq - bq), tc + (oc - bc)
+            result = None
+            if quantity > 0:
+                latest = o or t
+                result = _with_profit({**latest, "수량": quantity,
+                                       "매수단가": round_money(cost / quantity, record_currency(latest))})
+        if result is not None:
+            merged.append(result)
+    return merged
+
+def merge_portfolio_changes(base, ours, theirs):
+    """base(이 세션이 마지막으로 본 데이터) 이후 이 세션의 변경(ours)을 다른 작성자의 저장본(theirs)에 반영"""
+    merged = dict(theirs)
+    merged["transactions"] = _merge_append_only(
+        base.get("transactions", []), ours["transactions"], theirs.get("transactions", []), "거래 내역")
+    merged["realized_pnl"] = _merge_append_only(
+        base.get("realized_pnl", []), ours["realized_pnl"], theirs.get("realized_pnl", []), "실현손익")
+    merged["cash_ledger"] = _merge_append_only(
+        cash_ledger_from_data(base), ours["cash_ledger"], cash_ledger_from_data(theirs), "현금 원장")
+
+    memos = dict(theirs.get("stock_memos", {}))
+    base_memos = base.get("stock_memos", {})
+    for symbol, entries in ours["stock_memos"].items():
+        memos[symbol] = _merge_append_only(base_memos.get(symbol, []), entries, memos.get(symbol, []), f"{symbol} 메모")
+    merged["stock_memos"] = memos
+
+    # 금액은 이 세션의 증감분만 반영 (센트 정수로 계산)
+    for key in ["cash", "total_commission"]:
+        merged[key] = add_money(theirs.get(key, 0.0), ours[key], -base.get(key, 0.0))
+
+    # 이전 스키마로 저장된 쪽도 거래 통화를 채운 뒤 비교 (통화 필드만 다른 종목을 변경으로 보지 않음)
+    merged["stocks"] = _merge_holdings(migrate_holdings(base.get("stocks", []), base.get("schema_version", 1)),
+                                       ours["stocks"],
+                                       migrate_holdings(theirs.get("stocks", []), theirs.get("schema_version", 1)))
+
+    targets = dict(theirs.get("target_settings", {}))
+    base_targets = base.get("target_settings", {})
+    targets.update({key: value for key, value in ours["target_settings"].items() if base_targets.get(key) != value})
+    merged["target_settings"] = targets
+
+    candidates = [trades for trades in (ours["best_worst_trades"], theirs.get("best_worst_trades")) if trades]
+    bests = [trades["best"] for trades in candidates if trades.get("best")]
+    worsts = [trades["worst"] for trades in candidates if trades.get("worst")]
+    merged["best_worst_trades"] = {
+        "best": max(bests, key=lambda record: record["수익률(%)"]) if bests else None,
+        "worst": min(worsts, key=lambda record: record["수익률(%)"]) if worsts else None,
+    }
+
+    merged["currency_mode"] = ours["currency_mode"]
+    merged["exchange_rate"] = ours["exchange_rate"]
+    return merged
+
+def read_portfolio_file(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def read_portfolio_text(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def read_portfolio_checked(file_path):
+    """
+    복제 파일을 스트리밍으로 구조 검사하며 읽어 (데이터, 원본 JSON 문자열) 반환 - 손상되면 CorruptDataError.
+    원문은 같은 파일 핸들에서 다시 읽어 그 사이 다른 프로세스가 파일을 교체해도 데이터와 일치
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = load_portfolio_stream(f)
+        f.seek(0)
+        return data, f.read()
+
+def validate_data_integrity(data):
+    """데이터가 올바른 구조를 가지고 있는지 검사"""
+    required_keys = ["stocks", "cash", "transactions"]
+
+    if not isinstance(data, dict):
+        return False
+
+    for key in required_keys:
+        if key not in data:
+            return False
+
+    # stocks가 리스트인지 확인
+    if not isinstance(data["stocks"], list):
+        return False
+
+    # cash가 숫자인지 확인
+    if not isinstance(data["cash"], (int, float)):
+        return False
+
+    return True
+
+def cash_ledger_from_data(data):
+    """저장 데이터의 현금 원장 (원장 도입 전 데이터는 현재 현금을 기초잔액으로 기록)"""
+    if "cash_ledger" in data:
+        return data["cash_ledger"]
+    return opening_ledger(data.get("cash", 0.0), data.get("last_updated", ""),
+                          data.get("exchange_rate", DEFAULT_EXCHANGE_RATE))
+
+def unpack_portfolio_data(data):
+    """
+    저장 데이터를 세션 상태 순서의 튜플로 변환 (기존 데이터 호환성 기본값 포함, 누적 금액은 센트 단위로 맞춤).
+    USD만 쓰던 이전 스키마의 보유 종목은 거래 통화(USD)를 채움
+    """
+    return (migrate_holdings(data.get("stocks", []), data.get("schema_version", 1)),
+            round_money(data.get("cash", 0.0)),
+            data.get("transactions", []),
+            data.get("target_settings", {}),
+            data.get("realized_pnl", []),
+            data.get("stock_memos", {}),
+            round_money(data.get("total_commission", 0.0)),
+            data.get("best_worst_trades", dict(EMPTY_BEST_WORST)),
+            data.get("currency_mode", "USD"),
+            data.get("exchange_rate", DEFAULT_EXCHANGE_RATE),
+            cash_ledger_from_data(data))
+
+def empty_portfolio_data():
+    return [], 0.0, [], {}, [], {}, 0.0, dict(EMPTY_BEST_WORST), "USD", DEFAULT_EXCHANGE_RATE, []
+
+def list_timestamped_backups(backup_dir):
+    return [f for f in os.listdir(backup_dir) if f.startswith("portfolio_backup_")]
+
+def snapshot_times(backup_dir):
+    """타임스탬프 백업 -> [(백업 시각 'YYYY-MM-DD HH:MM:SS', 경로)] 최신순 (파일 이름에서 읽음)"""
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in list_timestamped_backups(backup_dir):
+        match = BACKUP_TIME_PATTERN.fullmatch(name)
+        if match:
+            day, hour, minute, second = match.groups()
+            snapshots.append((f"{day} {hour}:{minute}:{second}", os.path.join(backup_dir, name)))
+    return sorted(snapshots, reverse=True)
+
+def copy_timestamped_backup(primary_file, backup_dir, timestamp, keep=None):
+    """타임스탬프 백업 파일을 만들고 keep이 주어지면 최근 keep개만 남김 (없으면 보존 정책이 정리)"""
+    timestamped_file = os.path.join(backup_dir, f"portfolio_backup_{timestamp}.json")
+    shutil.copy2(primary_file, timestamped_file)
+
+    # 오래된 백업 파일 정리
+    backup_files = list_timestamped_backups(backup_dir)
+    if keep is not None and len(backup_files) > keep:
+        backup_files.sort()
+        for old_file in backup_files[:-keep]:
+            os.remove(os.path.join(backup_dir, old_file))
+    return timestamped_file
+
+def compute_daily_snapshot(stocks, cash, exchange_rate, net_deposits=None, fx=None):
+    """
+    보유 종목과 현금으로 일별 스냅샷 한 건 계산 (net_deposits: 현금 원장 기준 누적 순입금액).
+    fx(FxMatrix)를 주면 거래 통화가 다른 종목의 투자/평가 금액을 USD로 환산해 합산
+    """
+    amounts = [(stock["수량"] * stock["매수단가"], stock["수량"] * stock["현재가"]) for stock in stocks]
+    if fx is not None and amounts:
+        amounts = fx.convert(amounts, [record_currency(stock) for stock in stocks], "USD")
+    total_investment = float(sum(investment for investment, _ in amounts))
+    total_value = float(sum(value for _, value in amounts))
+    total_profit = total_value - total_investment
+    total_return_rate = (total_profit / total_investment * 100) if total_investment > 0 else 0
+    total_assets = total_value + cash
+
+    # 히스토리 파일이 커지지 않도록 금액은 센트, 비율은 소수 넷째 자리까지만 기록
+    snapshot = {
+        "total_investment": round_money(total_investment),
+        "total_value": round_money(total_value),
+        "total_profit": round_money(total_profit),
+        "total_return_rate": round(total_return_rate, 4),
+        "total_assets": round_money(total_assets),
+        "cash": round_money(cash),
+        "stock_count": len(stocks),
+        "exchange_rate": round(exchange_rate, 4)
+    }
+    if net_deposits is not None:
+        snapshot["net_deposits"] = round_money(net_deposits)
+    return snapshot
+
+def load_daily_history(history_file):
+    """일별 히스토리 로드 (없거나 손상되면 빈 dict)"""
+    if os.path.exists(history_file):
+        try:
+            with open(history_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except:
+            return {}
+    return {}
+
+def write_daily_history(history_file, daily_history):
+    """임시 파일에 먼저 쓰고 원본으로 이동 (실패 시 임시 파일 정리 후 예외 전달)"""
+    temp_file = history_file + ".tmp"
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(daily_history, f, indent=2, ensure_ascii=False)
+        shutil.move(temp_file, history_file)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def update_daily_history(history_file, today, snapshot):
+    """기존 히스토리에 오늘 스냅샷을 반영하여 저장 (읽기-수정-쓰기 전체를 파일 잠금으로 보호)"""
+    with file_lock(history_file + ".lock"):
+        daily_history = load_daily_history(history_file)
+        daily_history[today] = snapshot
+        write_daily_history(history_file, daily_history)
+    return daily_history
+
+def normalize_portfolio_id(value):
+    """포트폴리오 이름을 폴더명으로 안전한 형태로 정리 (문자/숫자/-/_ 만 허용)"""
+    portfolio_id = re.sub(r"[^\w-]", "", str(value or ""))[:64]
+    return portfolio_id or DEFAULT_PORTFOLIO_ID
+
+def portfolio_dirs(portfolio_id, primary_dir, backup_dir, secondary_dir):
+    """포트폴리오별 저장 폴더 (기본 포트폴리오는 기존 경로 그대로 사용)"""
+    if portfolio_id == DEFAULT_PORTFOLIO_ID:
+        return primary_dir, backup_dir, secondary_dir
+    return tuple(os.path.join(folder, PORTFOLIOS_DIR_NAME, portfolio_id)
+                 for folder in (primary_dir, backup_dir, secondary_dir))
+
+def list_portfolio_ids(primary_dir):
+    portfolios_dir = os.path.join(primary_dir, PORTFOLIOS_DIR_NAME)
+    ids = []
+    if os.path.isdir(portfolios_dir):
+        ids = sorted(name for name in os.listdir(portfolios_dir)
+                     if os.path.isdir(os.path.join(portfolios_dir, name)))
+    return [DEFAULT_PORTFOLIO_ID] + [portfolio_id for portfolio_id in ids if portfolio_id != DEFAULT_PORTFOLIO_ID]
+
+class PortfolioStore:
+    """프로세스 전역 포트폴리오 캐시 - 최근 사용한 포트폴리오의 최신 공유 데이터(SharedPortfolio)를 LRU로 보관하고
+    포트폴리오별 쓰기 잠금을 제공 (세션 시작 시 디스크 대신 메모리에서 로드)"""
+
+    def __init__(self, capacity=PORTFOLIO_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # portfolio_id -> 최신 버전의 공유 데이터
+        self._write_locks = {}
+
+    def write_lock(self, portfolio_id):
+        with self._lock:
+            lock = self._write_locks.get(portfolio_id)
+            if lock is None:
+                lock = self._write_locks[portfolio_id] = threading.RLock()
+            return lock
+
+    def get(self, portfolio_id):
+        with self._lock:
+            shared = self._entries.get(portfolio_id)
+            if shared is not None:
+                self._entries.move_to_end(portfolio_id)
+            return shared
+
+    def put(self, portfolio_id, shared):
+        with self._lock:
+            self._entries[portfolio_id] = shared
+            self._entries.move_to_end(portfolio_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def evict(self, portfolio_id):
+        with self._lock:
+            self._entries.pop(portfolio_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)